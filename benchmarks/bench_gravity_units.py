@@ -0,0 +1,63 @@
+"""
+Genomströmning för gravity_units på listor, samt kontroll av att
+konverteringarna går runt (slumpade värden, största felet skrivs ut).
+
+    python3 benchmarks/bench_gravity_units.py -n 1000000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import gravity_units as gu  # noqa: E402
+from gravity_calculator import GravityCalculator  # noqa: E402
+
+
+def timed(label: str, n: int, func):
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<32} {elapsed * 1000:8.1f} ms  {n / elapsed / 1e6:8.2f} M values/s")
+
+
+def max_error(a: list[float], b: list[float]) -> float:
+    return max(abs(x - y) for x, y in zip(a, b))
+
+
+def check_round_trips(n: int, seed: int):
+    rng = random.Random(seed)
+    plato = [rng.uniform(0.0, 35.0) for _ in range(n)]
+    og_brix = [rng.uniform(8.0, 30.0) for _ in range(n)]
+    final_brix = [o * rng.uniform(0.35, 0.7) for o in og_brix]
+
+    checks = {
+        "plato -> sg -> plato": max_error(plato, gu.sg_to_plato(gu.plato_to_sg(plato))),
+        "plato -> brix -> plato": max_error(plato, gu.brix_to_plato(gu.plato_to_brix(plato))),
+        "plato -> sg (asbc) -> plato": max_error(plato, gu.sg_to_plato_asbc(gu.plato_to_sg_asbc(plato))),
+        "final brix -> fg -> final brix": max_error(
+            final_brix, gu.expected_final_brix(og_brix, gu.corrected_fg(og_brix, final_brix))),
+    }
+    for label, err in checks.items():
+        print(f"{label:<32} max error {err:.2e}")
+        if err > 1e-9:
+            raise SystemExit(f"round trip failed: {label}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    check_round_trips(min(args.n, 100_000), args.seed)
+
+    plato = [i * 35.0 / args.n for i in range(args.n)]
+    sg = gu.plato_to_sg(plato)
+    timed("GravityCalculator, per call", args.n, lambda: [GravityCalculator.plato_to_og(p) for p in plato])
+    timed("plato_to_sg, list", args.n, lambda: gu.plato_to_sg(plato))
+    timed("sg_to_plato, list", args.n, lambda: gu.sg_to_plato(sg))
+    timed("plato_to_sg_asbc (Newton), list", args.n, lambda: gu.plato_to_sg_asbc(plato))
+    timed("brix_to_sg, list", args.n, lambda: gu.brix_to_sg(plato))
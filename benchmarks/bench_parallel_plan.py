@@ -0,0 +1,73 @@
+"""
+Genomströmning för PlanExecutor med olika antal trådar, samt kontroll av
+att planerna blir identiska med en sekventiell körning. Speedup mot antal
+kärnor syns bara på free-threaded CPython (python3.13t); med GIL blir den ~1.
+
+    python3 benchmarks/bench_parallel_plan.py -n 2000
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import system_profile as sp  # noqa: E402
+from recipe_loader import RecipeLoader  # noqa: E402
+from plan_executor import PlanExecutor, PlanTask, gil_enabled  # noqa: E402
+
+
+def make_tasks(n: int, recipe_dir: str) -> list[PlanTask]:
+    names = sorted(f for f in os.listdir(recipe_dir) if f.endswith((".yaml", ".yml")))
+    recipes = [RecipeLoader(name).data for name in names]
+    systems = [sp.get_system_profile(name) for name in sp.SYSTEM_PROFILES]
+    tasks = []
+    for i in range(n):
+        recipe = recipes[i % len(recipes)]
+        system = systems[(i // len(recipes)) % len(systems)]
+        tasks.append(PlanTask(recipe, system, batch_size_l=8.0 + (i % 13)))
+    return tasks
+
+
+def thread_counts(max_threads: int) -> list[int]:
+    counts, n = [], 1
+    while n < max_threads:
+        counts.append(n)
+        n *= 2
+    return counts + [max_threads]
+
+
+def fingerprint(plans) -> list[tuple]:
+    return [(p.total_grain_kg, p.volumes.get_total_pre_boil(), p.color["ebc"],
+             tuple(h["weight"] for h in p.hops_additions)) for p in plans]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", type=int, default=2000)
+    parser.add_argument("--max_threads", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunksize", type=int, default=8)
+    parser.add_argument("--recipes", default="recipes")
+    args = parser.parse_args()
+
+    # Loggning per plan skulle dominera tiden
+    logging.disable(logging.INFO)
+    tasks = make_tasks(args.n, args.recipes)
+    print(f"Python {sys.version.split()[0]}, GIL {'enabled' if gil_enabled() else 'disabled'}, "
+          f"{os.cpu_count()} CPU(s), {len(tasks)} plans")
+
+    reference = None
+    baseline = None
+    for threads in thread_counts(args.max_threads):
+        executor = PlanExecutor(workers=threads, chunksize=args.chunksize)
+        start = time.perf_counter()
+        plans = executor.map(tasks)
+        elapsed = time.perf_counter() - start
+        result = fingerprint(plans)
+        if reference is None:
+            reference, baseline = result, elapsed
+        elif result != reference:
+            sys.exit(f"{threads} threads: plans differ from the sequential run")
+        print(f"{threads:>3} thread(s) {elapsed * 1000:9.1f} ms  {len(tasks) / elapsed:9.0f} plans/s  "
+              f"speedup {baseline / elapsed:5.2f}x")
@@ -0,0 +1,51 @@
+"""
+Jämför validering av recept via Recipe/TypeAdapter mot den gamla
+dict-baserade valideringen (manuella loopar över procentsatser).
+
+    python3 benchmarks/bench_recipe_loader.py -n 5000
+"""
+import argparse
+import copy
+import os
+import sys
+import time
+
+import yaml
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from recipe import RECIPE_ADAPTER, RECIPES_ADAPTER  # noqa: E402
+
+
+def validate_dict(data: dict):
+    # Samma kontroller som RecipeLoader gjorde före Recipe-modellen
+    mash = data.get("mash_fermentables", [])
+    ferm = data.get("fermentor_fermentables", []) or []
+    total = sum(m.get("percent", 0) for m in mash) + sum(f.get("percent", 0) for f in ferm)
+    if abs(total - 100) > 0.01:
+        raise ValueError(total)
+    hops = data.get("boil_hops", [])
+    if abs(sum(h.get("percent", 0) for h in hops) - 100) > 0.01:
+        raise ValueError(hops)
+
+
+def timed(label: str, n: int, func):
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<32} {elapsed * 1000:8.1f} ms  {n / elapsed:12.0f} recipes/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", type=int, default=5000)
+    parser.add_argument("--recipe", default="recipes/black_ipa.yaml")
+    args = parser.parse_args()
+
+    with open(args.recipe, "r", encoding="utf-8") as f:
+        base = yaml.safe_load(f)
+    recipes = [copy.deepcopy(base) for _ in range(args.n)]
+
+    timed("dict (manual loops)", args.n, lambda: [validate_dict(r) for r in recipes])
+    timed("Recipe, one at a time", args.n, lambda: [RECIPE_ADAPTER.validate_python(r) for r in recipes])
+    timed("Recipe, list[Recipe] in one call", args.n, lambda: RECIPES_ADAPTER.validate_python(recipes))
@@ -1,22 +1,27 @@
 import math
 from typing import Dict, List
 import logging
-import copy
 from hops_db import get_hop
 from system_profile import PhysicalConstants
 from gravity_calculator import GravityCalculator
+from boil_model import BoilModel
 
 # Module logger
 logger = logging.getLogger(__name__)
 
 
 class BitternessCalculator:
+    # Under denna utnyttjandegrad blir vikten orimlig (division med nästan noll)
+    MIN_UTILIZATION = 0.01
 
     def __init__(self):
         pass
 
-    def calc_hops_additions(self, plato: float, volume: float, target_ibu: float, hops: list[Dict]) -> list[Dict]:
-        # Calculate hop additions based on malt percentages and volume
+    def calc_hops_additions(self, plato: float, volume: float, target_ibu: float, hops: list[Dict],
+                            boil: BoilModel | None = None) -> list[Dict]:
+        # Calculate hop additions based on malt percentages and volume.
+        # With a boil model each addition is integrated over its own part of the
+        # gravity trajectory instead of using a single plato for all hops.
 
         hops_additions = []
         for hop in hops:
@@ -38,7 +43,8 @@ class BitternessCalculator:
                 raise ValueError(f"'boil_time_min' saknas för humlesort i receptet: {hop['name']}")
 
             logger.debug("Hop IBU contribution in percent: %s, target_ibu %s, alpha_acid %s, boil time %s", hop['percent'],  target_ibu, alpha_acid, boil_time)
-            grams = self.hop_weight_grams((hop['percent']/100) * target_ibu, volume, plato, boil_time, alpha_acid)
+            utilization = boil.utilization(boil_time) if boil is not None else None
+            grams = self.hop_weight_grams((hop['percent']/100) * target_ibu, volume, plato, boil_time, alpha_acid, utilization)
 
             logger.debug(
                 "Hop calc: name=%s percent=%s boil_time_min=%s alpha_acid=%.3f grams=%.2f",
@@ -46,7 +52,7 @@ class BitternessCalculator:
             )
             
             # Use hops_db as base and add weight from calulation and and boil time from receipe
-            hops_addition = copy.deepcopy(hop_info)
+            hops_addition = dict(hop_info)
             hops_addition['name'] = hop['name'] 
             hops_addition['weight'] = grams
             hops_addition['boil_time_min'] = hop['boil_time_min']
@@ -66,8 +72,15 @@ class BitternessCalculator:
 
     def hop_weight_grams(self, target_ibu: float, volume_l: float,
                      plato: float, boil_time_min: float,
-                     alpha_acid: float) -> float:
-        U = self.tinseth_utilization(plato, boil_time_min)
+                     alpha_acid: float, utilization: float | None = None) -> float:
+        U = utilization if utilization is not None else self.tinseth_utilization(plato, boil_time_min)
+        if target_ibu <= 0:
+            return 0.0
+        if U < self.MIN_UTILIZATION:
+            msg = (f"Utnyttjandegrad {U:.4f} vid {boil_time_min} min är för låg för att ge {target_ibu:.1f} IBU, "
+                   f"sätt percent: 0 för aromgivor eller ange hop_stand_min")
+            logger.error(msg)
+            raise ValueError(msg)
         ibu = (target_ibu * volume_l) / (1000 * alpha_acid * U)
         logger.debug("Calculated hop weight grams: target_ibu=%.1f, volume_l=%.1f, plato=%.1f, boil_time_min=%.1f, alpha_acid=%.3f => grams=%.2f",
                      target_ibu, volume_l, plato, boil_time_min, alpha_acid, ibu)
@@ -0,0 +1,144 @@
+import bisect
+import logging
+import math
+
+from gravity_calculator import GravityCalculator
+from system_profile import PHYSICAL_CONSTANTS, SystemProfile
+
+# Module logger
+logger = logging.getLogger(__name__)
+
+
+class HopStand:
+    """
+    Isomerisering efter kokets slut.
+
+    Under humlevilan svalnar vörten fritt mot omgivningen med systemets
+    `cooling_tau_min`, därefter kyls den med `chiller_tau_min`. Isomeriseringens
+    hastighet relativt kokning följer en Arrhenius-anpassning
+    (2.39e11 * exp(-9773 / T), = 1 vid 100 °C). Kurvan stegas fram en gång och
+    summeras till "effektiva kokminuter" som alla givor delar.
+    """
+    BOIL_TEMP_C = 100.0
+    MIN_TEMP_C = 60.0      # under detta är isomeriseringen försumbar
+    AMBIENT_MARGIN_C = 1.0 # vörten når aldrig omgivningen, stega bara hit ner
+
+    def __init__(self, stand_min: float, cooling_tau_min: float, chiller_tau_min: float,
+                 ambient_temp_c: float = 20.0, dt_min: float = 0.5):
+        self.stand_min = stand_min
+        self.times: list[float] = []
+        self.temps: list[float] = []
+
+        # Med varm omgivning (>= MIN_TEMP_C) skulle vörten aldrig nå MIN_TEMP_C
+        stop_temp = max(self.MIN_TEMP_C, ambient_temp_c + self.AMBIENT_MARGIN_C)
+        t = 0.0
+        temp = self.BOIL_TEMP_C
+        effective = 0.0
+        while temp > stop_temp:
+            self.times.append(t)
+            self.temps.append(temp)
+            effective += self.relative_rate(temp) * dt_min
+            tau = cooling_tau_min if t < stand_min else chiller_tau_min
+            temp = ambient_temp_c + (temp - ambient_temp_c) * math.exp(-dt_min / tau)
+            t += dt_min
+        self.effective_min = effective
+        logger.debug("hop stand: %.0f min stand, %.1f min to %.0f °C, %.1f effective boil minutes",
+                     stand_min, t, stop_temp, effective)
+
+    @classmethod
+    def for_system(cls, system: SystemProfile, stand_min: float, ambient_temp_c: float = 20.0) -> "HopStand":
+        return cls(stand_min, system.cooling_tau_min, system.chiller_tau_min, ambient_temp_c)
+
+    @staticmethod
+    def relative_rate(temp_c: float) -> float:
+        return 2.39e11 * math.exp(-9773.0 / (temp_c + 273.15))
+
+
+class BoilModel:
+    """
+    Volym och gravity som funktion av tiden under kok.
+
+    Volymen minskar linjärt med systemets kokförlust och extraktmängden
+    (plato * volym) är konstant, så gravityn stiger under koket.
+
+    Tinseths utnyttjandegrad för en humlegiva som tillsätts vid tiden t_in är
+
+        U = integral f_og(G(tau)) * d f_t(tau - t_in),   tau = t_in .. T
+
+    och eftersom d f_t = (0.04 / 4.15) * exp(-0.04 * (tau - t_in)) dtau kan
+    integralen skrivas som exp(0.04 * t_in) * S(t_in), där S är en
+    svansintegral som bara beror på koket. S beräknas en gång per kok och
+    varje humlegiva blir sedan en uppslagning.
+
+    Med en `HopStand` läggs isomeriseringen efter koket till, vid slutgravityn,
+    som om givan kokat `effective_min` minuter till. `for_system` skapar den
+    bara när receptet har en humlevila.
+    """
+    TINSETH_RATE = 0.04
+    TINSETH_MAX = 4.15
+
+    def __init__(self, pre_boil_plato: float, pre_boil_l: float, boil_off_l_per_hour: float,
+                 boil_time_min: float, dt_min: float = 1.0, stand: HopStand | None = None):
+        self.stand = stand
+        self.pre_boil_plato = pre_boil_plato
+        self.pre_boil_l = pre_boil_l
+        self.boil_off_l_per_min = boil_off_l_per_hour / PHYSICAL_CONSTANTS.minutes_per_h
+        self.boil_time_min = boil_time_min
+
+        steps = max(1, int(math.ceil(boil_time_min / dt_min)))
+        self.dt_min = boil_time_min / steps
+        self.times = [i * self.dt_min for i in range(steps + 1)]
+
+        # Svansintegralen S(t_i), trapetsregeln baklänges från kokets slut
+        k = self.TINSETH_RATE
+        weights = [self._f_og(self.plato_at(t)) * math.exp(-k * t) for t in self.times]
+        tail = [0.0] * len(self.times)
+        for i in range(steps - 1, -1, -1):
+            tail[i] = tail[i + 1] + 0.5 * (weights[i] + weights[i + 1]) * self.dt_min
+        self._tail = tail
+
+    @classmethod
+    def for_system(cls, system: SystemProfile, pre_boil_plato: float, pre_boil_l: float,
+                   boil_time_min: float, hop_stand_min: float = 0.0, dt_min: float = 1.0) -> "BoilModel":
+        # Tinseths kurva är anpassad med normal kylning, så utan humlevila läggs ingen eftertid till
+        stand = HopStand.for_system(system, hop_stand_min) if hop_stand_min > 0 else None
+        return cls(pre_boil_plato, pre_boil_l, system.boil_off_l_per_hour, boil_time_min, dt_min, stand)
+
+    @classmethod
+    def _f_t(cls, t_min: float) -> float:
+        return (1 - math.exp(-cls.TINSETH_RATE * t_min)) / cls.TINSETH_MAX
+
+    @staticmethod
+    def _f_og(plato: float) -> float:
+        return 1.65 * math.pow(0.000125, (GravityCalculator.plato_to_og(plato) - 1.0))
+
+    def volume_at(self, t_min: float) -> float:
+        return self.pre_boil_l - self.boil_off_l_per_min * t_min
+
+    def plato_at(self, t_min: float) -> float:
+        return self.pre_boil_plato * self.pre_boil_l / self.volume_at(t_min)
+
+    def sg_at(self, t_min: float) -> float:
+        return GravityCalculator.plato_to_og(self.plato_at(t_min))
+
+    def utilization(self, boil_time_min: float) -> float:
+        """
+        Utnyttjandegrad för en giva som kokar `boil_time_min` minuter (tillsätts T - boil_time_min).
+        """
+        boil_time_min = min(max(boil_time_min, 0.0), self.boil_time_min)
+        u = 0.0
+        if self.boil_time_min > 0:
+            t_in = self.boil_time_min - boil_time_min
+            # Linjär interpolation i svansintegralen
+            i = min(bisect.bisect_right(self.times, t_in) - 1, len(self.times) - 2)
+            frac = (t_in - self.times[i]) / self.dt_min
+            tail = self._tail[i] + (self._tail[i + 1] - self._tail[i]) * frac
+            u = (self.TINSETH_RATE / self.TINSETH_MAX) * math.exp(self.TINSETH_RATE * t_in) * tail
+        if self.stand is not None:
+            f_og = self._f_og(self.plato_at(self.boil_time_min))
+            u += f_og * (self._f_t(boil_time_min + self.stand.effective_min) - self._f_t(boil_time_min))
+        logger.debug("boil model utilization: boil_time_min=%.1f, utilization=%.3f", boil_time_min, u)
+        return u
+
+    def utilizations(self, boil_times_min: list[float]) -> list[float]:
+        return [self.utilization(t) for t in boil_times_min]
@@ -1,10 +1,90 @@
 import os
+import csv
 import logging
 import argparse
 import sys
+from itertools import islice
+from typing import Iterable, Iterator
 
 import system_profile as sp
 from system_profile import PhysicalConstants
+from gravity_calculator import GravityCalculator
+import gravity_units
+
+# Module logger
+logger = logging.getLogger(__name__)
+
+# Enhet in -> enhet ut
+UNIT_CONVERSIONS = {
+    "mm": "l",
+    "l": "mm",
+    "plato": "sg",
+    "sg": "plato",
+    "brix": "sg",
+}
+
+DEFAULT_CHUNK_SIZE = 10_000
+
+
+def convert_chunk(rows: list[list[str]], systems: dict) -> list[list]:
+    """
+    Konverterar en chunk med rader (system, value, unit).
+    Returnerar rader (system, value, unit, converted_value, converted_unit).
+    Systemprofiler cachas i `systems` mellan chunkar.
+    """
+    result = []
+    for row in rows:
+        if len(row) < 3:
+            raise ValueError(f"Ogiltig rad, förväntar system,value,unit: {row}")
+        system_name, value_str, unit = row[0].strip(), row[1].strip(), row[2].strip().lower()
+        value = float(value_str)
+
+        if unit == "mm" or unit == "l":
+            system = systems.get(system_name)
+            if system is None:
+                system = sp.get_system_profile(system_name)
+                systems[system_name] = system
+            converted = system.get_volume_l(value) if unit == "mm" else system.get_volume_in_mm(value)
+        elif unit == "plato":
+            converted = GravityCalculator.plato_to_og(value)
+        elif unit == "sg":
+            converted = GravityCalculator.og_to_plato(value)
+        elif unit == "brix":
+            converted = gravity_units.brix_to_sg(value)
+        else:
+            raise ValueError(f"Okänd enhet '{unit}', giltiga: {', '.join(UNIT_CONVERSIONS)}")
+
+        result.append([system_name, value, unit, converted, UNIT_CONVERSIONS[unit]])
+    return result
+
+
+def stream_conversions(lines: Iterable[str], out, chunk_size: int = DEFAULT_CHUNK_SIZE) -> int:
+    """
+    Läser rader (system, value, unit) och skriver konverterade rader chunkvis.
+    Minnesåtgången är begränsad till en chunk oavsett antal rader.
+    Returnerar antal konverterade rader.
+    """
+    rows: Iterator[list[str]] = (
+        row for row in csv.reader(lines)
+        if row and not row[0].startswith("#")
+    )
+    writer = csv.writer(out)
+    systems: dict = {}
+    total = 0
+
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        # Hoppa över header-rad
+        if total == 0 and len(chunk[0]) > 1 and chunk[0][1].strip().lower() == "value":
+            chunk = chunk[1:]
+        writer.writerows(convert_chunk(chunk, systems))
+        out.flush()
+        total += len(chunk)
+        logger.debug("Converted %d rows", total)
+
+    return total
 
 
 if __name__ == "__main__":
@@ -15,14 +95,17 @@ if __name__ == "__main__":
     parser.add_argument("-h", "--help", action="help", default=argparse.SUPPRESS, help="Visa hjälp")
     parser.add_argument("-m", "--mm_to_l", type=float, help="Convert MM to liters for the system, based on boiler diameter")
     parser.add_argument("-l", "--l_to_mm", type=float, help="Convert liters to MM for the system, based on boiler diameter")
-    parser.add_argument("--system", "-s", choices=["Braumeister20", "Braumeister20Short"], default="Braumeister20Short", help="Systemprofil att använda (Braumeister20 eller Braumeister20Short)")
+    parser.add_argument("--system", "-s", choices=list(sp.SYSTEM_PROFILES), default="Braumeister20Short", help="Systemprofil att använda")
+    parser.add_argument("--stream", "-i", metavar="CSV", help="Strömmande konvertering av rader (system,value,unit) från CSV-fil, '-' för stdin. Enheter: mm, l, plato, sg, brix")
+    parser.add_argument("--chunk_size", type=int, default=DEFAULT_CHUNK_SIZE, help="Antal rader per chunk vid strömmande konvertering")
 
     args = parser.parse_args()
 
     # Log level is always INFO, output to stdout only.
     log_level = "INFO"
 
-    stream_handler = logging.StreamHandler(sys.stdout)
+    # I strömmande läge går resultatet till stdout, loggning till stderr
+    stream_handler = logging.StreamHandler(sys.stderr if args.stream else sys.stdout)
     stream_handler.setLevel(logging.INFO)
     stream_handler.setFormatter(logging.Formatter(
         "%(asctime)s %(levelname)s %(name)s: %(message)s"
@@ -37,6 +120,15 @@ if __name__ == "__main__":
     # module logger for later debug output
     logger = logging.getLogger(__name__)
 
+    if args.stream:
+        if args.stream == "-":
+            count = stream_conversions(sys.stdin, sys.stdout, args.chunk_size)
+        else:
+            with open(args.stream, "r", encoding="utf-8", newline="") as f:
+                count = stream_conversions(f, sys.stdout, args.chunk_size)
+        logger.info("Converted %d rows", count)
+        sys.exit(0)
+
     # 2. Initiera system och kalkylatorer
     system = sp.get_system_profile(args.system)
     logger.info("Using system profile: %s", args.system)
@@ -0,0 +1,211 @@
+import contextlib
+import logging
+import argparse
+import os
+import sys
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Iterator
+
+import yaml
+from rich.console import Console
+from rich.table import Table
+
+import system_profile as sp
+from recipe_loader import RecipeLoader, clear_yaml_cache
+from planner import RecipePlan
+from result_cache import ResultCache, cached_plan_recipe, open_cache
+from result_store import ResultStore, ResultWriter
+from memory_profile import MemoryBudget, MemoryProfiler, current_rss_bytes, memory_stage
+
+# Module logger
+logger = logging.getLogger(__name__)
+
+console = Console()
+
+# Hur mycket RSS (andel av budgeten) som måste tillkomma innan cacharna töms igen
+FLUSH_GROWTH_FRACTION = 0.05
+
+
+@dataclass
+class PlanEntry:
+    recipe: str
+    system: str
+    count: int = 1
+
+
+@dataclass
+class IngredientDemand:
+    """
+    Summerat behov per ingrediens: malt i kg, humle i gram.
+    """
+    malts_kg: Dict[str, float] = field(default_factory=lambda: defaultdict(float))
+    hops_g: Dict[str, float] = field(default_factory=lambda: defaultdict(float))
+    batches: int = 0
+
+    def add_plan(self, plan: RecipePlan, count: int = 1):
+        for m in plan.mash_grain_bill:
+            self.malts_kg[m.name] += m.amount_kg * count
+        for m in plan.ferm_grain_bill:
+            self.malts_kg[m.name] += m.amount_kg * count
+        for h in plan.hops_additions + plan.dry_hop_additions:
+            self.hops_g[h["name"]] += h["weight"] * count
+        self.batches += count
+
+
+def load_plan_entries(path: str) -> list[PlanEntry]:
+    """
+    Läser en lista med (recipe, system, count) från YAML:
+    plan:
+      - recipe: black_ipa.yaml
+        system: GrainfatherG30
+        count: 4
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        data = yaml.safe_load(f)
+    return [PlanEntry(e["recipe"], e.get("system", "Braumeister20Short"), int(e.get("count", 1))) for e in data["plan"]]
+
+
+def load_inventory(path: str) -> Dict[str, Dict[str, float]]:
+    """
+    Läser lager från YAML:
+    malts:
+      Best a-xl: 25.0   # kg
+    hops:
+      Magnum: 100       # g
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        data = yaml.safe_load(f) or {}
+    return {
+        "malts": {k: float(v) for k, v in (data.get("malts") or {}).items()},
+        "hops": {k: float(v) for k, v in (data.get("hops") or {}).items()},
+    }
+
+
+def iter_plans(entries: Iterable[PlanEntry], cache: ResultCache | None = None,
+               budget: MemoryBudget | None = None) -> Iterator[tuple[RecipePlan, int]]:
+    """
+    Planerar varje post och ger (plan, count) en i taget.
+    Samma recept och system planeras bara en gång per körning,
+    och med `cache` återanvänds planer från tidigare körningar.
+    Med `budget` töms de sparade recepten och planerna när minnet närmar sig gränsen.
+    RSS sjunker sällan efter en tömning (och maxrss aldrig), så efter en tömning
+    töms de igen först när RSS har vuxit med FLUSH_GROWTH_FRACTION av gränsen.
+    """
+    recipes: Dict[str, Dict[str, Any]] = {}
+    plans: Dict[tuple[str, str], RecipePlan] = {}
+    flushed_at_rss = None
+    for entry in entries:
+        if budget is not None and plans:
+            rss = current_rss_bytes()
+            grown = flushed_at_rss is None or rss - flushed_at_rss >= budget.limit_bytes * FLUSH_GROWTH_FRACTION
+            if grown and budget.over_soft_limit(rss):
+                logger.info("Memory budget reached, flushing %d plans and %d recipes", len(plans), len(recipes))
+                plans.clear()
+                recipes.clear()
+                clear_yaml_cache()
+                flushed_at_rss = rss
+        key = (entry.recipe, entry.system)
+        plan = plans.get(key)
+        if plan is None:
+            recipe = recipes.get(entry.recipe)
+            if recipe is None:
+                with memory_stage("load"):
+                    recipe = RecipeLoader(entry.recipe).data
+                recipes[entry.recipe] = recipe
+            with memory_stage("plan"):
+                plan = cached_plan_recipe(recipe, sp.get_system_profile(entry.system), cache)
+            plans[key] = plan
+        yield plan, entry.count
+
+
+def aggregate_demand(entries: Iterable[PlanEntry], cache: ResultCache | None = None,
+                     budget: MemoryBudget | None = None, results: ResultWriter | None = None,
+                     scenario: str = "") -> IngredientDemand:
+    """
+    Summerar behovet för alla poster. Med `results` skrivs en rad per post
+    till resultatlagret, märkt med `scenario`.
+    """
+    demand = IngredientDemand()
+    for plan, count in iter_plans(entries, cache, budget):
+        with memory_stage("aggregate"):
+            demand.add_plan(plan, count)
+        if results is not None:
+            results.add_plan(plan, scenario)
+    return demand
+
+
+def find_shortages(demand: IngredientDemand, inventory: Dict[str, Dict[str, float]]) -> list[tuple[str, str, float, float]]:
+    """
+    Returnerar (typ, namn, behov, i lager) för ingredienser där lagret inte räcker.
+    """
+    shortages = []
+    for kind, needed in (("malts", demand.malts_kg), ("hops", demand.hops_g)):
+        stock = inventory.get(kind, {})
+        for name, amount in sorted(needed.items()):
+            available = stock.get(name, 0.0)
+            if amount > available:
+                shortages.append((kind, name, amount, available))
+    return shortages
+
+
+def print_demand(demand: IngredientDemand, inventory: Dict[str, Dict[str, float]] | None):
+    for kind, title, unit, needed in (("malts", "Malt demand", "kg", demand.malts_kg), ("hops", "Hop demand", "g", demand.hops_g)):
+        table = Table(title=title, show_lines=True)
+        table.add_column("Name", style="bold")
+        table.add_column(f"Needed [{unit}]", justify="right")
+        if inventory is not None:
+            table.add_column(f"In stock [{unit}]", justify="right")
+            table.add_column(f"Short [{unit}]", justify="right")
+        for name, amount in sorted(needed.items()):
+            row = [name, f"{amount:.2f}"]
+            if inventory is not None:
+                available = inventory[kind].get(name, 0.0)
+                short = amount - available
+                row += [f"{available:.2f}", f"[red]{short:.2f}[/red]" if short > 0 else ""]
+            table.add_row(*row)
+        console.print(table)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Brewcalc ingrediensbehov", add_help=False, formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("-h", "--help", action="help", default=argparse.SUPPRESS, help="Visa hjälp")
+    parser.add_argument("--plan", "-p", required=True, help="YAML-fil med (recipe, system, count)")
+    parser.add_argument("--inventory", "-i", help="YAML-fil med lager (malts i kg, hops i g)")
+    parser.add_argument("--no_cache", action="store_true", help="Använd inte resultatcachen")
+    parser.add_argument("--cache_stats", action="store_true", help="Skriv ut statistik för resultatcachen")
+    parser.add_argument("--memory_profile", action="store_true", help="Mät minne per steg med tracemalloc")
+    parser.add_argument("--memory_budget_mb", type=float, help="Töm interna cachar när processen närmar sig denna minnesgräns (MiB)")
+    parser.add_argument("--results", help="Lägg till planerna i ett kolumnbaserat resultatlager (katalog)")
+    parser.add_argument("--scenario", help="Scenarionamn för raderna i resultatlagret (default: planfilens namn)")
+    args = parser.parse_args()
+
+    cache = open_cache(args.no_cache)
+    budget = MemoryBudget(args.memory_budget_mb) if args.memory_budget_mb else None
+    profiler = MemoryProfiler() if args.memory_profile else None
+    store = ResultStore(args.results) if args.results else None
+    results = ResultWriter(store) if store is not None else None
+    scenario = args.scenario or os.path.splitext(os.path.basename(args.plan))[0]
+    with profiler or contextlib.nullcontext():
+        demand = aggregate_demand(load_plan_entries(args.plan), cache, budget, results, scenario)
+    if results is not None:
+        results.flush()
+        console.print(f"Result store {args.results}: {len(store)} row(s)")
+        store.close()
+    if cache is not None:
+        cache.evict()
+        if args.cache_stats:
+            console.print(cache.stats())
+        cache.close()
+    inventory = load_inventory(args.inventory) if args.inventory else None
+    console.print(f"Planned batches: {demand.batches}")
+    print_demand(demand, inventory)
+    if profiler is not None:
+        profiler.print_report(console=console)
+
+    if inventory is not None:
+        shortages = find_shortages(demand, inventory)
+        if shortages:
+            console.print(f"[red]{len(shortages)} ingredient(s) short[/red]")
+            sys.exit(1)
+        console.print("Inventory covers the plan")
@@ -0,0 +1,116 @@
+import logging
+import math
+from dataclasses import dataclass
+from typing import Any, Dict
+
+from hops_db import get_hop
+
+# Module logger
+logger = logging.getLogger(__name__)
+
+# Alfasyra för torrhumle som saknas i humledatabasen
+DEFAULT_DRY_HOP_ALPHA = 0.10
+DEFAULT_CONTACT_DAYS = 3.0
+
+# Förlust av iso-alfasyror vid torrhumling (SMPH-modellen, Hosom):
+# LF = 0.5 * exp(-b * torrhumle_ppm) + 0.5, b = SLOPE * IAA_ppm + OFFSET (>= 0)
+IAA_LOSS_SLOPE = 0.0000035294117647058825
+IAA_LOSS_OFFSET = -0.000056470588235294126
+
+# IBU = 5/7 * (IAA + OAA_BITTERNESS * oAA + PP_BITTERNESS * PP), alla i ppm
+IBU_PER_PPM = 5.0 / 7.0
+OAA_BITTERNESS = 0.70
+PP_BITTERNESS = 0.015
+
+OAA_FRACTION_OF_ALPHA = 0.05    # oxiderade alfasyror i humlen, andel av alfasyran
+POLYPHENOL_FRACTION = 0.04      # polyfenoler, andel av humlens vikt
+DRY_HOP_EXTRACTION = 0.5        # andel av oAA och polyfenoler som löses ut i ölet
+EXTRACTION_TAU_DAYS = 0.5       # tidskonstant för urlakningen
+
+
+@dataclass
+class DryHopBitterness:
+    """
+    Beska i färdigt öl: IBU från koket efter torrhumlingens IAA-förlust
+    plus tillskott från oxiderade alfasyror och polyfenoler i torrhumlen.
+    """
+    boil_ibu: float
+    iaa_loss_factor: float = 1.0
+    oaa_ibu: float = 0.0
+    polyphenol_ibu: float = 0.0
+
+    @property
+    def final_ibu(self) -> float:
+        return self.boil_ibu * self.iaa_loss_factor + self.oaa_ibu + self.polyphenol_ibu
+
+
+def plan_dry_hops(dry_hops: list[Dict[str, Any]], volume_l: float) -> list[Dict[str, Any]]:
+    """
+    Torrhumlegivor i gram för jäskärlets volym. Receptet anger g/L.
+    """
+    additions = []
+    for hop in dry_hops:
+        try:
+            alpha_acid = get_hop(hop["name"])["alpha_acid"]
+        except ValueError:
+            logger.debug("Dry hop %s not in hop database, assuming alpha %.2f", hop["name"], DEFAULT_DRY_HOP_ALPHA)
+            alpha_acid = DEFAULT_DRY_HOP_ALPHA
+        contact_days = hop.get("contact_time_days")
+        additions.append({
+            "name": hop["name"],
+            "weight": hop["amount_g_per_l"] * volume_l,
+            "amount_g_per_l": hop["amount_g_per_l"],
+            "contact_time_days": DEFAULT_CONTACT_DAYS if contact_days is None else contact_days,
+            "alpha_acid": alpha_acid,
+        })
+    return additions
+
+
+def _extraction(contact_days: float) -> float:
+    return DRY_HOP_EXTRACTION * (1.0 - math.exp(-contact_days / EXTRACTION_TAU_DAYS))
+
+
+def dry_hop_loads(additions: list[Dict[str, Any]], volume_l: float) -> tuple[float, float, float]:
+    """
+    (torrhumle ppm, utlöst oAA ppm, utlösta polyfenoler ppm) för givorna i `volume_l`.
+    """
+    hop_ppm = oaa_ppm = pp_ppm = 0.0
+    for a in additions:
+        ppm = a["weight"] * 1000.0 / volume_l
+        extraction = _extraction(a["contact_time_days"])
+        hop_ppm += ppm
+        oaa_ppm += ppm * a["alpha_acid"] * OAA_FRACTION_OF_ALPHA * extraction
+        pp_ppm += ppm * POLYPHENOL_FRACTION * extraction
+    return hop_ppm, oaa_ppm, pp_ppm
+
+
+def iaa_loss_factors(boil_ibus: list[float], hop_ppms: list[float]) -> list[float]:
+    """
+    IAA-förlustfaktor per batch. Kokets IBU räknas om till IAA ppm med IBU_PER_PPM.
+    """
+    factors = []
+    for ibu, hop_ppm in zip(boil_ibus, hop_ppms):
+        if hop_ppm <= 0.0:
+            factors.append(1.0)
+            continue
+        b = max(IAA_LOSS_SLOPE * ibu / IBU_PER_PPM + IAA_LOSS_OFFSET, 0.0)
+        factors.append(0.5 * math.exp(-b * hop_ppm) + 0.5)
+    return factors
+
+
+def estimate_bitterness_many(boil_ibus: list[float], hop_ppms: list[float], oaa_ppms: list[float],
+                             pp_ppms: list[float]) -> list[DryHopBitterness]:
+    """
+    Beska efter torrhumling för många batcher på en gång, kolumnvis.
+    """
+    factors = iaa_loss_factors(boil_ibus, hop_ppms)
+    return [DryHopBitterness(ibu, lf, IBU_PER_PPM * OAA_BITTERNESS * oaa, IBU_PER_PPM * PP_BITTERNESS * pp)
+            for ibu, lf, oaa, pp in zip(boil_ibus, factors, oaa_ppms, pp_ppms)]
+
+
+def estimate_bitterness(boil_ibu: float, additions: list[Dict[str, Any]], volume_l: float) -> DryHopBitterness:
+    hop_ppm, oaa_ppm, pp_ppm = dry_hop_loads(additions, volume_l)
+    bitterness = estimate_bitterness_many([boil_ibu], [hop_ppm], [oaa_ppm], [pp_ppm])[0]
+    logger.debug("Dry hop bitterness: %.0f ppm hops, IAA loss factor %.3f, oAA %.1f IBU, polyphenols %.1f IBU",
+                 hop_ppm, bitterness.iaa_loss_factor, bitterness.oaa_ibu, bitterness.polyphenol_ibu)
+    return bitterness
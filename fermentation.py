@@ -0,0 +1,155 @@
+import logging
+import argparse
+import math
+from dataclasses import dataclass
+from typing import Any, Dict
+
+from rich.console import Console
+from rich.table import Table
+
+from gravity_calculator import GravityCalculator
+from recipe_loader import RecipeLoader
+
+# Module logger
+logger = logging.getLogger(__name__)
+
+console = Console()
+
+
+@dataclass
+class FermentationResult:
+    og_plato: float
+    fg_plato: float
+    apparent_attenuation: float
+    abv: float
+    days_to_terminal: float | None   # None om jäsningen inte når slutgravity inom simuleringen
+
+
+class FermentationSimulator:
+    """
+    Enkel kinetisk jäsningsmodell.
+
+    Skenbart extrakt E (°P) går mot gränsen E_lim = OG * (1 - AA):
+
+        dE/dt = -k(T) * min(1, t / lag(T)) * (E - E_lim)
+
+    där k(T) följer en Q10-modell kring 20 °C. AA bestäms av jästens
+    förjäsningsgrad, mäsktemperaturen och andelen socker i jäskärlet.
+    Alla simuleringar i en batch stegas tillsammans med samma tidssteg.
+    """
+    K20_PER_H = 0.035          # hastighetskonstant vid 20 °C
+    LAG_20_H = 12.0            # lag-fas vid 20 °C
+    Q10 = 2.0
+    REFERENCE_MASH_TEMP_C = 65.0
+    TERMINAL_MARGIN_PLATO = 0.2
+
+    def __init__(self, dt_h: float = 1.0, max_days: float = 30.0):
+        self.dt_h = dt_h
+        self.max_days = max_days
+
+    @classmethod
+    def apparent_attenuation(cls, yeast_attenuation: float, mash_temp_c: float, sugar_share: float = 0.0) -> float:
+        """
+        Skenbar förjäsningsgrad. Varmare mäsk ger mer dextriner, ca 1.5 % lägre
+        förjäsning per grad över referenstemperaturen. Socker i jäskärlet jäser ut helt.
+        """
+        mash_factor = min(1.1, max(0.85, 1.0 + 0.015 * (cls.REFERENCE_MASH_TEMP_C - mash_temp_c)))
+        aa = (1.0 - sugar_share) * yeast_attenuation * mash_factor + sugar_share
+        return min(1.0, aa)
+
+    @staticmethod
+    def _temp_at(profile: list[tuple[float, float]], day: float) -> float:
+        temp = profile[0][1]
+        for start_day, temp_c in profile:
+            if start_day > day:
+                break
+            temp = temp_c
+        return temp
+
+    def simulate_batch(self, og_plato: list[float], attenuation: list[float],
+                       profiles: list[list[tuple[float, float]]]) -> list[FermentationResult]:
+        """
+        Simulerar många jäsningar samtidigt. `profiles` är (dag, temp_c), sorterade på dag.
+        """
+        n = len(og_plato)
+        if not (len(attenuation) == len(profiles) == n):
+            raise ValueError("og_plato, attenuation och profiles måste ha samma längd")
+
+        limit = [og * (1.0 - aa) for og, aa in zip(og_plato, attenuation)]
+        extract = list(og_plato)
+        terminal: list[float | None] = [None] * n
+        steps = int(self.max_days * 24 / self.dt_h)
+
+        for step in range(steps):
+            t_h = step * self.dt_h
+            day = t_h / 24.0
+            active = 0
+            for i in range(n):
+                if terminal[i] is not None:
+                    continue
+                active += 1
+                temp = self._temp_at(profiles[i], day)
+                q = self.Q10 ** ((temp - 20.0) / 10.0)
+                ramp = min(1.0, t_h * q / self.LAG_20_H)
+                # Exakt steg för den linjära ekvationen, stabilt för alla dt
+                extract[i] = limit[i] + (extract[i] - limit[i]) * math.exp(-self.K20_PER_H * q * ramp * self.dt_h)
+                if extract[i] - limit[i] < self.TERMINAL_MARGIN_PLATO:
+                    terminal[i] = (t_h + self.dt_h) / 24.0
+            if active == 0:
+                break
+
+        results = []
+        for og, fg, days in zip(og_plato, extract, terminal):
+            og_sg = GravityCalculator.plato_to_og(og)
+            fg_sg = GravityCalculator.plato_to_og(fg)
+            results.append(FermentationResult(
+                og_plato=og,
+                fg_plato=fg,
+                apparent_attenuation=(og - fg) / og if og > 0 else 0.0,
+                abv=(og_sg - fg_sg) * 131.25,
+                days_to_terminal=days,
+            ))
+        return results
+
+    @classmethod
+    def recipe_attenuation(cls, recipe: Dict[str, Any], mash_temp_c: float | None = None) -> float:
+        """
+        Förväntad skenbar förjäsningsgrad för ett recept (jäst, mäsktemperatur, socker).
+        """
+        yeast = recipe.get("yeast") or {}
+        sugar_share = sum(f["percent"] for f in recipe.get("fermentor_fermentables") or []) / 100.0
+        temp = mash_temp_c or recipe.get("mash_temp_c") or cls.REFERENCE_MASH_TEMP_C
+        return cls.apparent_attenuation(yeast.get("attenuation", 0.75), temp, sugar_share)
+
+    def simulate_recipes(self, recipes: list[Dict[str, Any]], mash_temp_c: float | None = None) -> list[FermentationResult]:
+        og, aa, profiles = [], [], []
+        for r in recipes:
+            og.append(float(r["target_og_plato"]))
+            aa.append(self.recipe_attenuation(r, mash_temp_c))
+            profile = [(s["day"], s["temp_c"]) for s in r.get("fermentation_profile") or []]
+            profiles.append(sorted(profile) or [(0.0, 20.0)])
+        return self.simulate_batch(og, aa, profiles)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Brewcalc jäsningssimulering", add_help=False, formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("-h", "--help", action="help", default=argparse.SUPPRESS, help="Visa hjälp")
+    parser.add_argument("--recipe", "-r", required=True, action="append", help="Receptfil (YAML), kan anges flera gånger")
+    parser.add_argument("--mash_temp", type=float, help="Mäsktemperatur (°C), skriver över receptet")
+    args = parser.parse_args()
+
+    recipes = [RecipeLoader(path).data for path in args.recipe]
+    results = FermentationSimulator().simulate_recipes(recipes, args.mash_temp)
+
+    table = Table(title="Fermentation", show_lines=True)
+    table.add_column("Recipe", style="bold")
+    table.add_column("OG", justify="right")
+    table.add_column("FG", justify="right")
+    table.add_column("AA", justify="right")
+    table.add_column("ABV", justify="right")
+    table.add_column("Days", justify="right")
+    for r, res in zip(recipes, results):
+        days = f"{res.days_to_terminal:.1f}" if res.days_to_terminal is not None else "-"
+        table.add_row(r["name"], f"{res.og_plato:.1f} °P", f"{res.fg_plato:.1f} °P",
+                      f"{res.apparent_attenuation * 100:.0f} %", f"{res.abv:.1f} %", days)
+    console.print(table)
@@ -1,14 +1,10 @@
 from dataclasses import dataclass
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Gravities:
     """
-    Representerar volymerna före och efter kok.
+    Gravity före och efter kok (°P).
     """
-    pre_boil: float  # Volym innan kok (L)
-    post_boil: float  # Volym efter kok (L)
-
-    def __init__(self, post_boil: float):
-        self.post_boil = post_boil
-
+    post_boil: float  # Gravity efter kok
+    pre_boil: float = 0.0  # Gravity innan kok
@@ -1,8 +1,8 @@
 from typing import Dict, List
 import logging
+import gravity_units
 from malts_db import get_malt
-from system_profile import Braumeister20Short, PhysicalConstants
-import copy
+from system_profile import SystemProfile
 from malt import Malt
 
 # Module logger
@@ -17,21 +17,22 @@ class GravityCalculator:
     - total maltmängd
     """
 
-    def __init__(self, sys: Braumeister20Short):
+    def __init__(self, sys: SystemProfile):
         self.sys = sys
 
-    @staticmethod
-    def plato_to_og(plato: float) -> float:
-        og = 1 + (plato / (258.6 - ((plato / 258.2) * 227.1)))
-        logger.debug("Converted plato %.2f to og %.3f", plato, og)
-        return og
+    # Anropas i inre loopar (kokmodell, jäsning), därför ingen loggning här.
+    # Listor och andra enheter finns i gravity_units.
+    plato_to_og = staticmethod(gravity_units._plato_to_sg)
+
+    # Exakt invers till plato_to_og
+    og_to_plato = staticmethod(gravity_units._sg_to_plato)
 
     def get_volume_loss_from_grain(self, total_grain_kg: float) -> float:
         """
         Returnerar volymförlust (L) baserat på maltmängd (kg)
         """
         # Volymförlust beräknas som maltmängd gånger absorption per kg
-        return float(total_grain_kg) * float(PhysicalConstants().grain_obsortion_l_kg)
+        return float(total_grain_kg) * self.sys.absorption_l_per_kg
 
     def calc_total_grain_kg(self, grain_bill: list[Malt]) -> float:
         return sum(m.amount_kg for m in grain_bill) 
@@ -50,17 +51,11 @@ class GravityCalculator:
         target_plato: float,
         batch_size_l: float,
         grain_bill: list[Malt]
-    ):
+    ) -> list[Malt]:
         """
-        Returnerar en lista med:
-        - name
-        - percent
-        - extract_percent
-        - amount_kg
+        Returnerar en ny maltnota där varje malt har fått sin amount_kg.
+        Indata ändras inte, så notan kan delas mellan trådar.
         """
-
-        
-
         logger.debug(
             "calc_grain_bill: target_plato=%.1f, batch_size_l=%.1f, malts_count=%d",
             target_plato,
@@ -71,11 +66,13 @@ class GravityCalculator:
         # Total extraktmängd i Plato-liter
         total_extract = target_plato * batch_size_l / 100.0
 
+        result = []
         for m in grain_bill:
             # Extrakt som denna malt ska bidra med
             extract = total_extract * m.percent
 
             # kg malt som krävs
-            m.amount_kg = extract / (m.extract * self.sys.mash_efficiency)
+            result.append(m.with_amount(extract / (m.extract * self.sys.mash_efficiency)))
 
-            logger.debug("Adding malt: %s", m.amount_kg)
\ No newline at end of file
+            logger.debug("Adding malt: %s", result[-1].amount_kg)
+        return result
@@ -0,0 +1,176 @@
+import bisect
+import logging
+from typing import Callable
+
+# Module logger
+logger = logging.getLogger(__name__)
+
+# Refraktometerns korrektionsfaktor för vört (Brix-avläsning / verklig Brix)
+DEFAULT_WORT_CORRECTION = 1.04
+
+# Newton-steg efter tabelluppslagning, räcker för full float-precision
+NEWTON_ITERATIONS = 2
+
+
+def _apply(func: Callable[[float], float], value):
+    """
+    Kör `func` på ett tal eller på varje element i en sekvens (lista ut).
+    """
+    if isinstance(value, (int, float)):
+        return func(value)
+    return list(map(func, value))
+
+
+def _apply2(func: Callable[[float, float], float], a, b):
+    if isinstance(a, (int, float)) and isinstance(b, (int, float)):
+        return func(a, b)
+    if isinstance(a, (int, float)):
+        return [func(a, y) for y in b]
+    if isinstance(b, (int, float)):
+        return [func(x, b) for x in a]
+    return list(map(func, a, b))
+
+
+class _MonotoneInverse:
+    """
+    Invers till en strängt växande funktion på [lo, hi]: tabelluppslagning
+    ger startvärde (linjär interpolation) och Newton förfinar.
+    """
+
+    def __init__(self, func: Callable[[float], float], derivative: Callable[[float], float],
+                 lo: float, hi: float, points: int = 256):
+        self.func = func
+        self.derivative = derivative
+        step = (hi - lo) / (points - 1)
+        self.xs = [lo + i * step for i in range(points)]
+        self.ys = [func(x) for x in self.xs]
+
+    def __call__(self, y: float) -> float:
+        xs, ys = self.xs, self.ys
+        i = min(max(bisect.bisect_right(ys, y) - 1, 0), len(xs) - 2)
+        x = xs[i] + (xs[i + 1] - xs[i]) * (y - ys[i]) / (ys[i + 1] - ys[i])
+        for _ in range(NEWTON_ITERATIONS):
+            x -= (self.func(x) - y) / self.derivative(x)
+        return x
+
+
+# --- Plato <-> SG, samma formel som GravityCalculator ---
+
+def _plato_to_sg(plato: float) -> float:
+    return 1 + (plato / (258.6 - ((plato / 258.2) * 227.1)))
+
+
+def _sg_to_plato(sg: float) -> float:
+    x = sg - 1
+    return 258.6 * x / (1 + (227.1 / 258.2) * x)
+
+
+def plato_to_sg(plato):
+    return _apply(_plato_to_sg, plato)
+
+
+def sg_to_plato(sg):
+    return _apply(_sg_to_plato, sg)
+
+
+# --- ASBC-polynomet, SG -> Plato, invers med tabell + Newton ---
+
+def _sg_to_plato_asbc(sg: float) -> float:
+    return -616.868 + sg * (1111.14 + sg * (-630.272 + sg * 135.997))
+
+
+def _sg_to_plato_asbc_derivative(sg: float) -> float:
+    return 1111.14 + sg * (-1260.544 + sg * 407.991)
+
+
+_plato_to_sg_asbc = _MonotoneInverse(_sg_to_plato_asbc, _sg_to_plato_asbc_derivative, 0.99, 1.20)
+
+
+def sg_to_plato_asbc(sg):
+    return _apply(_sg_to_plato_asbc, sg)
+
+
+def plato_to_sg_asbc(plato):
+    return _apply(_plato_to_sg_asbc, plato)
+
+
+# --- Brix (refraktometer) ---
+
+def brix_to_plato(brix, wort_correction: float = DEFAULT_WORT_CORRECTION):
+    """
+    Refraktometeravläsning i ojäst vört till Plato. Brix och Plato är
+    i praktiken samma skala för sockerlösningar, skillnaden är korrektionsfaktorn.
+    """
+    return _apply(lambda b: b / wort_correction, brix)
+
+
+def plato_to_brix(plato, wort_correction: float = DEFAULT_WORT_CORRECTION):
+    return _apply(lambda p: p * wort_correction, plato)
+
+
+def brix_to_sg(brix, wort_correction: float = DEFAULT_WORT_CORRECTION):
+    return _apply(lambda b: _plato_to_sg(b / wort_correction), brix)
+
+
+def sg_to_brix(sg, wort_correction: float = DEFAULT_WORT_CORRECTION):
+    return _apply(lambda s: _sg_to_plato(s) * wort_correction, sg)
+
+
+# --- Alkoholkorrigerad refraktometeravläsning (Terrill, kubisk) ---
+
+def _fg_terms(final_brix: float) -> float:
+    return final_brix * (0.011774 + final_brix * (-0.0012717 + final_brix * 0.000063293))
+
+
+def _fg_terms_derivative(final_brix: float) -> float:
+    return 0.011774 + final_brix * (-0.0025434 + final_brix * 0.000189879)
+
+
+def _og_terms(og_brix: float) -> float:
+    return 1 + og_brix * (-0.0044993 + og_brix * (0.00027581 - og_brix * 0.0000072800))
+
+
+# Termen i slut-Brix är strängt växande (derivatan saknar reella nollställen)
+_final_brix_from_terms = _MonotoneInverse(_fg_terms, _fg_terms_derivative, -5.0, 40.0)
+
+
+def _corrected_fg(og_brix: float, final_brix: float, wort_correction: float) -> float:
+    return _og_terms(og_brix / wort_correction) + _fg_terms(final_brix / wort_correction)
+
+
+def _expected_final_brix(og_brix: float, fg: float, wort_correction: float) -> float:
+    return _final_brix_from_terms(fg - _og_terms(og_brix / wort_correction)) * wort_correction
+
+
+def corrected_fg(og_brix, final_brix, wort_correction: float = DEFAULT_WORT_CORRECTION):
+    """
+    Verklig slutgravity (SG) från refraktometeravläsningar före och efter jäsning.
+    Alkoholen höjer brytningsindex, så slutavläsningen kan inte läsas av direkt.
+    """
+    return _apply2(lambda o, f: _corrected_fg(o, f, wort_correction), og_brix, final_brix)
+
+
+def expected_final_brix(og_brix, fg, wort_correction: float = DEFAULT_WORT_CORRECTION):
+    """
+    Invers till corrected_fg: vilken refraktometeravläsning en given slutgravity ger.
+    """
+    return _apply2(lambda o, g: _expected_final_brix(o, g, wort_correction), og_brix, fg)
+
+
+# (enhet in, enhet ut) -> funktion
+CONVERSIONS: dict[tuple[str, str], Callable] = {
+    ("plato", "sg"): plato_to_sg,
+    ("sg", "plato"): sg_to_plato,
+    ("brix", "plato"): brix_to_plato,
+    ("plato", "brix"): plato_to_brix,
+    ("brix", "sg"): brix_to_sg,
+    ("sg", "brix"): sg_to_brix,
+}
+
+
+def convert(value, from_unit: str, to_unit: str):
+    try:
+        func = CONVERSIONS[(from_unit.lower(), to_unit.lower())]
+    except KeyError:
+        raise ValueError(f"Okänd konvertering {from_unit} -> {to_unit}") from None
+    return func(value)
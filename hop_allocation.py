@@ -0,0 +1,218 @@
+import logging
+import argparse
+import sys
+from dataclasses import dataclass, field
+
+import yaml
+from rich.console import Console
+from rich.table import Table
+
+from demand import load_plan_entries, iter_plans
+from result_cache import ResultCache, open_cache
+
+# Module logger
+logger = logging.getLogger(__name__)
+
+console = Console()
+
+# Givor som kokar minst så här länge är beska och kan tas från vilken sort som helst
+BITTERING_MIN_BOIL_MIN = 30.0
+
+
+@dataclass
+class HopLot:
+    lot: str
+    name: str
+    alpha_acid: float
+    grams: float
+    opened: bool = False
+
+    @property
+    def alpha_g(self) -> float:
+        return self.grams * self.alpha_acid
+
+
+@dataclass
+class HopDemand:
+    """
+    En humlegiva i ett recept. `alpha_g` är mängden alfasyra som ger givans IBU.
+    """
+    batch: int
+    recipe: str
+    name: str
+    boil_time_min: float
+    alpha_g: float
+    allocations: list[tuple[str, float]] = field(default_factory=list)   # (lot, gram)
+    missing_alpha_g: float = 0.0
+
+    @property
+    def bittering(self) -> bool:
+        return self.boil_time_min >= BITTERING_MIN_BOIL_MIN
+
+
+def load_lots(path: str) -> list[HopLot]:
+    """
+    Läser humlelager per lot från YAML:
+    lots:
+      - lot: M-2025-01
+        name: Magnum
+        alpha_acid: 0.145
+        grams: 500
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        data = yaml.safe_load(f)
+    lots = [HopLot(str(l["lot"]), l["name"], float(l["alpha_acid"]), float(l["grams"])) for l in data["lots"]]
+    for lot in lots:
+        if lot.alpha_acid <= 0:
+            raise ValueError(f"Lot {lot.lot} ({lot.name}): alpha_acid måste vara större än 0, fick {lot.alpha_acid}")
+        if lot.grams < 0:
+            raise ValueError(f"Lot {lot.lot} ({lot.name}): grams får inte vara negativt, fick {lot.grams}")
+    return lots
+
+
+class HopAllocator:
+    """
+    Fördelar humlelotter på givor i många recept så att varje givas alfasyra
+    (och därmed target_ibu) uppfylls, med så få öppnade lotter som möjligt.
+
+    Girig med reparation:
+    1. Aromgivor först, de måste ha sin egen sort. Största behovet först.
+    2. Beska givor tar i första hand sin egen sort, annars valfri lot.
+    3. Inom en kandidatmängd används redan öppnade lotter först, sedan den
+       minsta lot som täcker hela behovet, annars den största.
+    4. Reparation: om en aromgiva inte kunde fyllas flyttas beska givor som
+       använder den sorten till andra lotter och aromgivan försöker igen.
+    """
+
+    def __init__(self, lots: list[HopLot]):
+        self.lots = lots
+
+    @staticmethod
+    def _pick(candidates: list[HopLot], need_alpha_g: float) -> HopLot | None:
+        available = [l for l in candidates if l.grams > 1e-9]
+        if not available:
+            return None
+        opened = [l for l in available if l.opened]
+        if opened:
+            return max(opened, key=lambda l: l.alpha_g)
+        covering = [l for l in available if l.alpha_g >= need_alpha_g]
+        if covering:
+            return min(covering, key=lambda l: l.alpha_g)
+        return max(available, key=lambda l: l.alpha_g)
+
+    def _fill(self, demand: HopDemand, candidates: list[HopLot]):
+        need = demand.alpha_g - sum(g * self._lot(lot).alpha_acid for lot, g in demand.allocations)
+        while need > 1e-9:
+            lot = self._pick(candidates, need)
+            if lot is None:
+                break
+            grams = min(lot.grams, need / lot.alpha_acid)
+            lot.grams -= grams
+            lot.opened = True
+            demand.allocations.append((lot.lot, grams))
+            need -= grams * lot.alpha_acid
+        demand.missing_alpha_g = max(0.0, need)
+
+    def _lot(self, lot_id: str) -> HopLot:
+        return self._lots_by_id[lot_id]
+
+    def _release(self, demand: HopDemand, variety: str):
+        kept = []
+        for lot_id, grams in demand.allocations:
+            lot = self._lot(lot_id)
+            if lot.name == variety:
+                lot.grams += grams
+            else:
+                kept.append((lot_id, grams))
+        demand.allocations = kept
+
+    def allocate(self, demands: list[HopDemand]) -> list[HopDemand]:
+        self._lots_by_id = {l.lot: l for l in self.lots}
+        by_variety: dict[str, list[HopLot]] = {}
+        for l in self.lots:
+            by_variety.setdefault(l.name, []).append(l)
+
+        aroma = sorted((d for d in demands if not d.bittering), key=lambda d: -d.alpha_g)
+        bittering = sorted((d for d in demands if d.bittering), key=lambda d: -d.alpha_g)
+
+        for d in aroma:
+            self._fill(d, by_variety.get(d.name, []))
+        for d in bittering:
+            self._fill(d, by_variety.get(d.name, []))
+        for d in bittering:
+            if d.missing_alpha_g > 0:
+                self._fill(d, self.lots)
+
+        # Reparation: frigör aromsorter från beska givor
+        for d in aroma:
+            if d.missing_alpha_g <= 0:
+                continue
+            for b in bittering:
+                if any(self._lot(lot_id).name == d.name for lot_id, _ in b.allocations):
+                    self._release(b, d.name)
+                    self._fill(d, by_variety.get(d.name, []))
+                    self._fill(b, [l for l in self.lots if l.name != d.name])
+                    if d.missing_alpha_g <= 0:
+                        break
+        return demands
+
+    def leftovers(self) -> list[HopLot]:
+        return [l for l in self.lots if l.grams > 1e-6]
+
+
+def demands_from_plans(entries, cache: ResultCache | None = None) -> list[HopDemand]:
+    demands = []
+    batch = 0
+    for plan, count in iter_plans(entries, cache):
+        for _ in range(count):
+            batch += 1
+            for h in plan.hops_additions:
+                demands.append(HopDemand(batch, plan.recipe["name"], h["name"], float(h["boil_time_min"]),
+                                         h["weight"] * h["alpha_acid"]))
+    return demands
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Brewcalc fördelning av humlelotter", add_help=False, formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("-h", "--help", action="help", default=argparse.SUPPRESS, help="Visa hjälp")
+    parser.add_argument("--plan", "-p", required=True, help="YAML-fil med (recipe, system, count)")
+    parser.add_argument("--lots", "-l", required=True, help="YAML-fil med humlelotter (lot, name, alpha_acid, grams)")
+    parser.add_argument("--no_cache", action="store_true", help="Använd inte resultatcachen")
+    args = parser.parse_args()
+
+    try:
+        lots = load_lots(args.lots)
+    except ValueError as exc:
+        print(exc, file=sys.stderr)
+        sys.exit(1)
+    cache = open_cache(args.no_cache)
+    demands = demands_from_plans(load_plan_entries(args.plan), cache)
+    allocator = HopAllocator(lots)
+    allocator.allocate(demands)
+
+    table = Table(title="Hop allocation", show_lines=True)
+    table.add_column("Batch", justify="right")
+    table.add_column("Recipe", style="bold")
+    table.add_column("Hop")
+    table.add_column("Time", justify="right")
+    table.add_column("Lots [g]")
+    table.add_column("Missing α [g]", justify="right")
+    for d in demands:
+        lots = ", ".join(f"{lot}: {g:.1f}" for lot, g in d.allocations)
+        missing = f"[red]{d.missing_alpha_g:.2f}[/red]" if d.missing_alpha_g > 0 else ""
+        table.add_row(str(d.batch), d.recipe, d.name, f"{d.boil_time_min:g} min", lots, missing)
+    console.print(table)
+
+    left = Table(title="Leftovers", show_lines=True)
+    left.add_column("Lot", style="bold")
+    left.add_column("Hop")
+    left.add_column("Grams", justify="right")
+    left.add_column("Opened")
+    for l in allocator.leftovers():
+        left.add_row(l.lot, l.name, f"{l.grams:.1f}", "yes" if l.opened else "")
+    console.print(left)
+
+    if cache is not None:
+        cache.evict()
+        cache.close()
+    sys.exit(1 if any(d.missing_alpha_g > 0 for d in demands) else 0)
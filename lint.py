@@ -0,0 +1,178 @@
+import contextlib
+import logging
+import argparse
+import os
+import sys
+from dataclasses import dataclass
+from itertools import islice
+from multiprocessing import Pool
+from typing import Iterator
+
+from pydantic import ValidationError
+
+import system_profile as sp
+from recipe import RECIPE_ADAPTER
+from recipe_loader import load_recipe_yaml
+from planner import plan_recipe
+from turbid_mash import TurbidMashCalculator
+from memory_profile import MemoryBudget, MemoryProfiler, current_rss_bytes, memory_stage
+
+# Module logger
+logger = logging.getLogger(__name__)
+
+RECIPE_SUFFIXES = (".yaml", ".yml")
+MAX_WATER_TEMP_C = 100.0
+
+@dataclass
+class Diagnostic:
+    path: str
+    severity: str   # "error" eller "warning"
+    message: str
+
+    def __str__(self) -> str:
+        return f"{self.path}: {self.severity}: {self.message}"
+
+
+def find_recipes(root: str) -> Iterator[str]:
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if filename.endswith(RECIPE_SUFFIXES):
+                yield os.path.join(dirpath, filename)
+
+
+def _check_turbid(path: str, recipe: dict, system_name: str) -> list[Diagnostic]:
+    """
+    Kontrollerar att turbid-schemat går att genomföra: tillsatt vatten
+    måste vara varmare än steget och får inte behöva vara över kokpunkten.
+    """
+    system = sp.get_system_profile(system_name)
+    with memory_stage("plan"):
+        plan = plan_recipe(recipe, system)
+    steps = TurbidMashCalculator(system, recipe.get("mash_schedule")).calculate(
+        total_grain_kg=plan.total_grain_kg,
+        mash_in_l=plan.volumes.get_total_pre_boil(),
+        ambient_temp_c=8.0)
+
+    diagnostics = []
+    for i, step in enumerate(steps, start=1):
+        if step.water_l <= 0:
+            continue
+        if step.water_temp_c > MAX_WATER_TEMP_C:
+            diagnostics.append(Diagnostic(path, "warning",
+                f"turbid step {i}: infusion water {step.water_temp_c:.1f} °C exceeds {MAX_WATER_TEMP_C:.0f} °C on {system_name}"))
+        elif step.water_temp_c < step.target_temp_c:
+            diagnostics.append(Diagnostic(path, "warning",
+                f"turbid step {i}: infusion water {step.water_temp_c:.1f} °C is below target {step.target_temp_c:.1f} °C"))
+    return diagnostics
+
+
+def lint_file(path: str, system_name: str = "Braumeister20Short", turbid: bool = True) -> list[Diagnostic]:
+    try:
+        with memory_stage("load"):
+            raw = load_recipe_yaml(path)
+    except Exception as exc:
+        return [Diagnostic(path, "error", f"cannot read recipe: {exc}")]
+    if not isinstance(raw, dict):
+        return [Diagnostic(path, "error", "recipe is not a YAML mapping")]
+
+    try:
+        with memory_stage("validate"):
+            recipe = RECIPE_ADAPTER.validate_python(raw).model_dump(exclude_none=True)
+    except ValidationError as exc:
+        diagnostics = []
+        for err in exc.errors():
+            loc = ".".join(str(part) for part in err["loc"]) or "recipe"
+            diagnostics.append(Diagnostic(path, "error", f"{loc}: {err['msg']}"))
+        return diagnostics
+
+    if not turbid:
+        return []
+    try:
+        return _check_turbid(path, recipe, system_name)
+    except Exception as exc:
+        # Ett fel i planeringen gäller bara den här filen och får inte stoppa hela körningen
+        return [Diagnostic(path, "error", f"cannot plan recipe: {exc}")]
+
+
+def _lint_worker(task: tuple[str, str, bool]) -> tuple[str, list[Diagnostic], int]:
+    path, system_name, turbid = task
+    return path, lint_file(path, system_name, turbid), current_rss_bytes()
+
+
+def lint_tree(root: str, system_name: str, turbid: bool = True, jobs: int | None = None,
+              chunksize: int = 16, budget: MemoryBudget | None = None) -> Iterator[tuple[str, list[Diagnostic]]]:
+    """
+    Lintar alla recept under `root` i parallella processer och ger
+    (path, diagnostics) i den ordning de blir klara.
+
+    Med `budget` körs filerna i omgångar. Om någon arbetsprocess passerat
+    budgetens mjuka gräns efter en omgång ersätts alla processer med nya.
+    """
+    tasks = ((path, system_name, turbid) for path in find_recipes(root))
+    if jobs == 1:
+        for path, diagnostics, _ in map(_lint_worker, tasks):
+            yield path, diagnostics
+        return
+    if budget is None:
+        with Pool(processes=jobs) as pool:
+            for path, diagnostics, _ in pool.imap_unordered(_lint_worker, tasks, chunksize=chunksize):
+                yield path, diagnostics
+        return
+
+    wave_size = (jobs or os.cpu_count() or 1) * chunksize * 4
+    pool = Pool(processes=jobs)
+    try:
+        while True:
+            wave = list(islice(tasks, wave_size))
+            if not wave:
+                break
+            max_rss = 0
+            for path, diagnostics, rss in pool.imap_unordered(_lint_worker, wave, chunksize=chunksize):
+                max_rss = max(max_rss, rss)
+                yield path, diagnostics
+            if budget.over_soft_limit(max_rss):
+                logger.info("Worker RSS %.1f MiB over memory budget, recycling workers", max_rss / 2**20)
+                pool.close()
+                pool.join()
+                pool = Pool(processes=jobs)
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Brewcalc lint av receptarkiv", add_help=False, formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("-h", "--help", action="help", default=argparse.SUPPRESS, help="Visa hjälp")
+    parser.add_argument("paths", nargs="*", default=["recipes"], help="Kataloger eller filer att linta")
+    parser.add_argument("--system", "-s", choices=list(sp.SYSTEM_PROFILES), default="Braumeister20Short", help="Systemprofil för turbid-kontrollen")
+    parser.add_argument("--no_turbid", action="store_true", help="Hoppa över kontroll av turbid-schemat")
+    parser.add_argument("--jobs", "-j", type=int, default=None, help="Antal processer (default: antal kärnor)")
+    parser.add_argument("--memory_budget_mb", type=float, help="Byt ut arbetsprocesser som närmar sig denna minnesgräns (MiB)")
+    parser.add_argument("--memory_profile", action="store_true", help="Mät minne per steg med tracemalloc (kör i en process)")
+    args = parser.parse_args()
+    budget = MemoryBudget(args.memory_budget_mb) if args.memory_budget_mb else None
+    profiler = MemoryProfiler() if args.memory_profile else None
+    if profiler is not None:
+        args.jobs = 1
+
+    files = errors = warnings = 0
+    with profiler or contextlib.nullcontext():
+        for root in args.paths:
+            if os.path.isfile(root):
+                results = iter([(root, lint_file(root, args.system, not args.no_turbid))])
+            else:
+                results = lint_tree(root, args.system, not args.no_turbid, args.jobs, budget=budget)
+            for path, diagnostics in results:
+                files += 1
+                for d in diagnostics:
+                    print(d, flush=True)
+                    if d.severity == "error":
+                        errors += 1
+                    else:
+                        warnings += 1
+
+    print(f"{files} recipe(s) checked, {errors} error(s), {warnings} warning(s)")
+    if profiler is not None:
+        profiler.print_report()
+    sys.exit(1 if errors else 0)
@@ -6,7 +6,6 @@ from turbid_mash import TurbidMashCalculator, TurbidMashStep
 from malt import Malt
 from gravities import Gravities
 from volumes import Volumes
-from malts_db import get_malt
 
 try:
     from tabulate import tabulate
@@ -20,6 +19,10 @@ import system_profile as sp
 from system_profile import PhysicalConstants
 from recipe_loader import RecipeLoader
 from color_calculator import ColorCalculator
+from result_cache import cached_plan_recipe, open_cache
+from mash_calculator import MashSplit
+from mash_ph import MashPhCalculator
+import water_treatment as wt
 
 
 from rich.console import Console
@@ -32,7 +35,7 @@ console = Console()
 def print_recipe(recipe, color: float):
     # Titelpanel
     console.print(Panel(
-        f'{recipe["name"]}, {recipe["batch_size_l"]} L, {recipe["target_og_plato"]} °P, Boil time: {recipe["boil_time_min"]} min, rev: {recipe["version"]}',
+        f'{recipe["name"]}, {recipe["batch_size_l"]} L, {recipe["target_og_plato"]:g} °P, Boil time: {recipe["boil_time_min"]:g} min, rev: {recipe["version"]}',
         style="bold cyan",
         expand=False
     ))
@@ -41,6 +44,12 @@ def print_recipe(recipe, color: float):
         expand=False,
     ))
 
+def print_mash_ph(mash_ph: dict, target_ph: float | None, water: str = "distilled water"):
+    text = f'Estimated mash pH ({water}): {mash_ph["ph"]:.2f}'
+    if target_ph:
+        text += f', target {target_ph:.2f}: {mash_ph["lactic_acid_ml"]:.1f} ml lactic acid 88%'
+    console.print(Panel(text, expand=False))
+
 def print_volumes_gravities(volumes: Volumes, gravities: Gravities, system):
     vol = Table(title="Volumes", show_lines=True)
     vol.add_column("Phase", style="bold")
@@ -64,11 +73,35 @@ def print_boil_hops(hop_additions):
         hops.add_row(
             h["name"],
             f'{h["weight"]:.1f}',
-            f"{h["boil_time_min"]} min"
+            f'{h["boil_time_min"]:g} min'
         )
 
     console.print(hops)
 
+def print_dry_hops(dry_hop_additions, bitterness):
+    if dry_hop_additions:
+        hops = Table(title="Dry hops", show_lines=True)
+        hops.add_column("Name")
+        hops.add_column("Amount \\[g]", justify="right")
+        hops.add_column("Rate \\[g/L]", justify="right")
+        hops.add_column("Contact \\[days]", justify="right")
+
+        for h in dry_hop_additions:
+            hops.add_row(
+                h["name"],
+                f'{h["weight"]:.1f}',
+                f'{h["amount_g_per_l"]:g}',
+                f'{h["contact_time_days"]:g}'
+            )
+        console.print(hops)
+
+    if dry_hop_additions and bitterness is not None:
+        console.print(Panel(
+            f'Estimated final IBU: {bitterness.final_ibu:.1f} (boil {bitterness.boil_ibu:.1f} x IAA loss {bitterness.iaa_loss_factor:.2f}, '
+            f'oxidized alpha +{bitterness.oaa_ibu:.1f}, polyphenols +{bitterness.polyphenol_ibu:.1f})',
+            expand=False,
+        ))
+
 def print_grain_bill(malt_bill: list[Malt], title: str, num_mashes: int = None):
 
     # Malt-tabell
@@ -90,6 +123,26 @@ def print_grain_bill(malt_bill: list[Malt], title: str, num_mashes: int = None):
         ))
 
 
+def print_mashes(mashes: list[MashSplit]):
+
+    table = Table(title="Mashes", show_lines=True)
+    table.add_column("Mash", style="bold")
+    table.add_column("Grain [kg]", justify="right")
+    table.add_column("Liquid at start [L]", justify="right")
+    table.add_column("Absorption [L]", justify="right")
+    table.add_column("Extract [kg]", justify="right")
+
+    for i, m in enumerate(mashes, start=1):
+        table.add_row(
+            f'{i}',
+            f'{m.grain_kg:.2f} kg',
+            f'{m.water_l:.1f} L',
+            f'{m.absorption_l:.1f} L',
+            f'{m.extract_kg:.2f} kg',
+        )
+    console.print(table)
+
+
 def print_turbid_mash_schedule(turbid_mash_schedule: list[TurbidMashStep]):
 
     # Malt-tabell
@@ -105,6 +158,11 @@ def print_turbid_mash_schedule(turbid_mash_schedule: list[TurbidMashStep]):
             water_temp_c_str = f'{f.water_temp_c:.1f} °C'
             target_temp_c_str = f'{f.target_temp_c:.1f} °C'
             time_min_str = f'{f.time_min:.1f} min'
+        elif f.water_l == 0:
+            # Heat-only step, no infusion
+            water_temp_c_str = 'heat'
+            target_temp_c_str = f'{f.target_temp_c:.1f} °C'
+            time_min_str = f'{f.time_min:.1f} min'
         else:
             water_temp_c_str = 'N/A'
             target_temp_c_str = 'N/A'
@@ -137,9 +195,12 @@ if __name__ == "__main__":
     parser.add_argument("--hop_boil_calc", "-b", action="store_true", help="Aktivera humlekalkyl (kräver --plato/-p och --volume/-v)")
     parser.add_argument("--plato", "-p", type=float, help="Plato (°P) att använda vid humlekalkyl")
     parser.add_argument("--volume", "-v", type=float, help="Volym i liter (L) att använda vid humlekalkyl")
-    parser.add_argument("--system", "-s", choices=["Braumeister20", "Braumeister20Short", "GrainfatherG30"], default="Braumeister20Short", help="Systemprofil att använda (Braumeister20, Braumeister20Short or GrainfatherG30)")
+    parser.add_argument("--system", "-s", choices=list(sp.SYSTEM_PROFILES), default="Braumeister20Short", help="Systemprofil att använda")
     parser.add_argument("--recipe", "-r", required=True, help="Sökväg till receptfil (YAML) som ska användas")
     parser.add_argument("--turbid_mash", "-t", action="store_true", help="Sökväg till receptfil (YAML) som ska användas")
+    parser.add_argument("--water", "-w", choices=list(wt.profile_library()), default=wt.DEFAULT_SOURCE, help="Källvatten för saltberäkningen (receptets water_profile är målet)")
+    parser.add_argument("--no_cache", action="store_true", help="Använd inte resultatcachen")
+    parser.add_argument("--cache_stats", action="store_true", help="Skriv ut statistik för resultatcachen")
 
 
     args = parser.parse_args()
@@ -168,49 +229,20 @@ if __name__ == "__main__":
     system = sp.get_system_profile(args.system)
     logger.info("Using system profile: %s", args.system)
 
-    volumes = Volumes(trub_loss=system.trub_loss_l, post_boil=recipe.data["batch_size_l"])
-    logger.info(f"Volume preboil initially: {volumes.post_boil:.1f} L")
-    
-    gravity_calc = GravityCalculator(system)
-    gravities = Gravities(gravity_calc.get_pre_boil_plato(recipe.data["mash_fermentables"], recipe.data["target_og_plato"]))
-
-    volumes.boil_off = (recipe.data.get("boil_time_min") / PhysicalConstants().minutes_per_h) * system.boil_off_l_per_hour
-    volumes.post_boil = recipe.data["batch_size_l"] + system.trub_loss_l
-    logger.info(f"Volume post-boil: {volumes.post_boil:.1f} L, including trub loss {system.trub_loss_l:.1f} L")
-
-    volumes.pre_boil = volumes.post_boil + volumes.boil_off
-    logger.info(f"Volume preboil before mash compenation: {volumes.pre_boil:.1f} L, including boil off {volumes.boil_off:.1f} L")
-    gravities.pre_boil = (volumes.post_boil/volumes.pre_boil) * gravities.post_boil
-    logger.info(f"Estimated pre-boil gravity: {gravities.pre_boil:.1f} °P based on post-boil gravity {gravities.post_boil:.1f} °P and volumes reduction {(volumes.post_boil/volumes.pre_boil):.1f}")
-    volumes.mash_loss = 0
-
-    mash_grain_bill = []
-    for malt_recipe in recipe.data["mash_fermentables"]:
-        malt_info_db = get_malt(malt_recipe["name"])
-        malt = Malt(malt_recipe["name"], malt_info_db["extract_percent"], malt_recipe["percent"] / 100.0, malt_info_db["color_ebc"])
-        mash_grain_bill.append(malt)
-
-    max_iter = 5
-    gravity_calc = GravityCalculator(system)
-    grain_bill_change = 1000.0
-    total_grain_kg = 0.0
-    while grain_bill_change > 0.1 :
-        gravity_calc.calc_grain_bill(
-            target_plato=gravities.pre_boil,
-            batch_size_l=volumes.get_total_pre_boil(),
-            grain_bill=mash_grain_bill,
-        )
-        new_total_grain_kg = gravity_calc.calc_total_grain_kg(mash_grain_bill)
-        grain_bill_change = abs(total_grain_kg - new_total_grain_kg)
-        total_grain_kg = new_total_grain_kg
-        volumes.mash_loss = gravity_calc.get_volume_loss_from_grain(total_grain_kg)
-        logger.info(f"Volume loss from grain: {volumes.mash_loss:.1f} L, total grain bill: {total_grain_kg:.1f} kg")
-
-
+    cache = open_cache(args.no_cache)
+    source_water = wt.get_water_profile(args.water)
+    plan = cached_plan_recipe(recipe.data, system, cache, water=source_water.to_water_profile())
+    if cache is not None:
+        cache.evict()
+        if args.cache_stats:
+            console.print(cache.stats())
+        cache.close()
+    volumes = plan.volumes
+    gravities = plan.gravities
+    mash_grain_bill = plan.mash_grain_bill
+    total_grain_kg = plan.total_grain_kg
 
-    logger.info(f"Volume preboil, final: { volumes.get_total_pre_boil():.1f} L")
     # Log results
-    logger = logging.getLogger(__name__)
     logger.info("=== Final mash grain bill ===")
     logger.info(f"Mash-in volume needed: { volumes.get_total_pre_boil():.1f} L, {system.get_volume_in_mm( volumes.get_total_pre_boil()):.1f} mm from bottom")
     logger.info("Malts:")
@@ -218,31 +250,32 @@ if __name__ == "__main__":
         logger.info(f"  {item.name}: {item.amount_kg:.1f} kg")
     logger.info(f"Total grain: {total_grain_kg:.1f} kg")
 
-#    get_num_mashes = system.get_num_mashes(total_grain_kg)
-#    logger.info(f"Number of mashes required: {get_num_mashes}")
-
-
-    color = ColorCalculator.calculate(
-        malts=mash_grain_bill,          # grain_bill innehåller amount_kg och color_ebc
-        volume_l=recipe.batch_size_l
-    )
-
-    logger.info("EBC (Morey): %s", color["ebc"])
-
-    print_recipe(recipe.data, color["ebc"])
+    print_recipe(recipe.data, plan.color["ebc"])
     print_volumes_gravities(volumes, gravities, system)
-    print_grain_bill(mash_grain_bill, title="Mash grain bill", num_mashes=system.get_num_mashes(total_grain_kg))
+    print_mash_ph(plan.mash_ph, recipe.data.get("mash_ph"), water=f"{source_water.name} water")
+    if recipe.data.get("water_profile"):
+        # Volymmodellen är fullvolymsmäskning: allt vatten tillsätts vid inmäskning,
+        # inget lakvatten. Lakning med separat vatten räknas med water_treatment.py.
+        treatment = wt.solve(source_water, wt.get_water_profile(recipe.data["water_profile"]),
+                             mash_l=volumes.get_total_pre_boil())
+        wt.print_treatment(treatment, console)
+        treated_ph = MashPhCalculator.calculate(mash_grain_bill, volumes.get_total_pre_boil(),
+                                                recipe.data.get("mash_ph"), treatment.result.to_water_profile())
+        print_mash_ph(treated_ph, recipe.data.get("mash_ph"), water="treated water")
+    print_grain_bill(mash_grain_bill, title="Mash grain bill", num_mashes=plan.num_mashes)
+    if plan.num_mashes > 1:
+        print_mashes(plan.mashes)
 
     if args.turbid_mash:  
-        turbid_steps = TurbidMashCalculator(system).calculate(
+        turbid_steps = TurbidMashCalculator(system, recipe.data.get("mash_schedule")).calculate(
             total_grain_kg=total_grain_kg,
             mash_in_l=volumes.get_total_pre_boil(),
             ambient_temp_c=8.0) 
 
         print_turbid_mash_schedule(turbid_steps)
 
-    hops_additions = []
-    # Om hop_boil_calc anges, kör kalkyl och avsluta
+    hops_additions = plan.hops_additions
+    # Om hop_boil_calc anges, kör kalkyl med angiven plato och volym
     if args.hop_boil_calc:
         # Validera att båda obligatoriska argumenten finns
         if args.plato is None or args.volume is None:
@@ -257,40 +290,17 @@ if __name__ == "__main__":
             target_ibu=recipe.data.get("target_ibu", 0),
             hops=recipe.data.get("boil_hops", []),
         )
-    else:
-        bitterness_calc = BitternessCalculator()
-        hops_additions = bitterness_calc.calc_hops_additions(
-            plato=(gravities.pre_boil + gravities.post_boil) / 2,
-            volume=volumes.pre_boil,
-            target_ibu=recipe.data["target_ibu"],
-            hops=recipe.data["boil_hops"],
-        )
 
     print_boil_hops(hops_additions)
+    print_dry_hops(plan.dry_hop_additions, plan.bitterness)
 
-
-    ferm_grain_bill = []
-    if not recipe.data["fermentor_fermentables"]:
-        logger.debug("No fermentor fermentables defined")
-    else:
-        logger.debug("Calulating fermetor fermentables:")
-        for malt_recipe in recipe.data["fermentor_fermentables"]:
-            malt_info_db = get_malt(malt_recipe["name"])
-            malt = Malt(malt_recipe["name"], malt_info_db["extract_percent"], malt_recipe["percent"] / 100.0, malt_info_db["color_ebc"])
-        ferm_grain_bill.append(malt)
-
-        gravity_calc.calc_grain_bill(
-            target_plato=recipe.data["target_og_plato"],
-            batch_size_l=recipe.data["batch_size_l"],
-            grain_bill=ferm_grain_bill,
-        )
+    ferm_grain_bill = plan.ferm_grain_bill
+    if ferm_grain_bill:
         print_grain_bill(ferm_grain_bill, title="Fermentor grain bill")
 
     # Skriv ut fermentor-ingredienser och total vikt
     logger.info("Fermentor fermentables:")
-    total_fermentor_kg = gravity_calc.calc_total_grain_kg(ferm_grain_bill)
+    total_fermentor_kg = GravityCalculator(system).calc_total_grain_kg(ferm_grain_bill)
     for item in ferm_grain_bill:
         logger.info(f"  {item.name}: {item.amount_kg:.1f} kg")
     logger.info(f"Total fermentor grain: {total_fermentor_kg:.1f} kg")
-
-
@@ -1,24 +1,17 @@
-from dataclasses import dataclass
-import string
-from rich.console import Console
-from rich.table import Table
-from rich.panel import Panel
+from dataclasses import dataclass, replace
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Malt:
     """
-    Representerar volymerna före och efter kok.
+    En malt i maltnotan. Oföränderlig: en beräknad mängd ger en ny Malt
+    (`with_amount`), så samma nota kan delas mellan trådar.
     """
-    name: string
-    amount_kg: float  # Volym innan kok (L)
-    percent: float  # Volym innan kok (L)
-    color_ecb: float  # Volym efter kok (L)
-    extract: float  # Volymförlust i mäskning (L)
+    name: str
+    extract: float      # extraktandel (0-1)
+    percent: float      # andel av notan (0-1)
+    color_ecb: float    # färg i EBC
+    amount_kg: float = 0.0
 
-    def __init__(self, name: string, extract: float, percent: float, color_ecb: float):
-        self.color_ecb = color_ecb
-        self.percent = percent
-        self.extract = extract
-        self.name = name
-        self.amount_kg = 0.0
\ No newline at end of file
+    def with_amount(self, amount_kg: float) -> "Malt":
+        return replace(self, amount_kg=amount_kg)
@@ -1,39 +1,57 @@
 MALTS_DB = {
     "Pale Ale Malt": {
         "extract_percent": 0.80,
-        "color_ebc": 6
+        "color_ebc": 6,
+        "di_ph": 5.7,
+        "buffer_meq_kg_ph": 40
     },
     "Best a-xl": {
         "extract_percent": 0.80,
-        "color_ebc": 3
+        "color_ebc": 3,
+        "di_ph": 5.75,
+        "buffer_meq_kg_ph": 38
     },
     "Caramunich 3": {
         "extract_percent": 0.73,
-        "color_ebc": 150
+        "color_ebc": 150,
+        "di_ph": 4.75,
+        "buffer_meq_kg_ph": 55
     },
     "Carapils": {
         "extract_percent": 0.72,
-        "color_ebc": 4
+        "color_ebc": 4,
+        "di_ph": 5.6,
+        "buffer_meq_kg_ph": 40
     },
     "Munich I": {
         "extract_percent": 0.78,
-        "color_ebc": 15
+        "color_ebc": 15,
+        "di_ph": 5.55,
+        "buffer_meq_kg_ph": 45
     },
     "Munich II": {
         "extract_percent": 0.78,
-        "color_ebc": 22
+        "color_ebc": 22,
+        "di_ph": 5.45,
+        "buffer_meq_kg_ph": 50
     },
     "Carafa special 2": {
         "extract_percent": 0.72,
-        "color_ebc": 1150
+        "color_ebc": 1150,
+        "di_ph": 4.7,
+        "buffer_meq_kg_ph": 55
     },
     "Unmalted wheat": {
         "extract_percent": 0.73,
-        "color_ebc": 3
+        "color_ebc": 3,
+        "di_ph": 6.0,
+        "buffer_meq_kg_ph": 35
     },    
     "Socker": {
         "extract_percent": 1.0,
-        "color_ebc": 0
+        "color_ebc": 0,
+        "di_ph": None,
+        "buffer_meq_kg_ph": 0
     }
 }
 
@@ -1,23 +1,73 @@
+from dataclasses import dataclass
 from typing import Tuple, Dict
-from system_profile import Braumeister20Short
-from system_profile import PhysicalConstants
+from malt import Malt
+from system_profile import PHYSICAL_CONSTANTS, SystemProfile
+
+
+@dataclass
+class MashSplit:
+    """
+    En mäskning i en flermäskning.
+    """
+    grain_kg: float         # malt i denna mäskning
+    grain_bill: list[Malt]  # maltnota för denna mäskning
+    absorption_l: float     # vätska som maltet i denna mäskning suger upp
+    water_l: float          # vätska i kärlet när mäskningen startar
+    extract_kg: float       # förväntat extrakt från denna mäskning
 
 
 class MashCalculator:
     """
     Hanterar:
-    - enkel- och dubbelmäskning
+    - enkel- och flermäskning
     - vätskeförluster
     - total vattenmängd som ska tillsättas vid start
     """
 
-    def __init__(self, system: Braumeister20Short):
+    def __init__(self, system: SystemProfile):
         self.sys = system
 
     # -----------------------------
     #   Interna hjälpfunktioner
     # -----------------------------
 
+    def _absorption_l(self, grain_kg: float) -> float:
+        return grain_kg * self.sys.absorption_l_per_kg
+
+    def split_grain_bill(self, grain_bill: list[Malt], total_water_l: float) -> list[MashSplit]:
+        """
+        Delar maltnotan i lika stora mäskningar under `max_grain_per_mash_kg`.
+        Varje mäskning får samma procentuella sammansättning som hela notan.
+        Allt vatten tillsätts vid start, så varje efterföljande mäskning
+        startar med vätskan minus det som tidigare mäskningar sugit upp.
+        """
+        total_grain_kg = sum(m.amount_kg for m in grain_bill)
+        num_mashes = max(1, self.sys.get_num_mashes(total_grain_kg))
+        share = 1.0 / num_mashes
+
+        mashes = []
+        water_l = total_water_l
+        for _ in range(num_mashes):
+            bill = []
+            extract_kg = 0.0
+            for m in grain_bill:
+                part = m.with_amount(m.amount_kg * share)
+                extract_kg += part.amount_kg * m.extract * self.sys.mash_efficiency
+                bill.append(part)
+            grain_kg = total_grain_kg * share
+            absorption_l = self._absorption_l(grain_kg)
+            mashes.append(MashSplit(grain_kg, bill, absorption_l, water_l, extract_kg))
+            water_l -= absorption_l
+
+        return mashes
+
+    def split_grain_bills(self, grain_bills: list[list[Malt]], total_water_l: list[float]) -> list[list[MashSplit]]:
+        """
+        Delar upp flera maltnotor på en gång, t.ex. alla recept i en batch.
+        """
+        if len(grain_bills) != len(total_water_l):
+            raise ValueError("grain_bills och total_water_l måste ha samma längd")
+        return [self.split_grain_bill(bill, water) for bill, water in zip(grain_bills, total_water_l)]
 
     def total_water_needed(
         self,
@@ -28,7 +78,7 @@ class MashCalculator:
         """
         Allt vatten tillsätts vid start.
         Beräknar:
-        - mäskförluster (enkel/dubbel)
+        - mäskförluster (en eller flera mäskningar)
         - kokförlust
         - trubförlust
         - total vattenmängd som ska tillsättas
@@ -36,8 +86,10 @@ class MashCalculator:
         if total_grain_kg <= 0:
             raise ValueError("Total maltmängd måste vara > 0 kg.")
 
-        boil_off = (boil_time_min / PhysicalConstants().minutes_per_h) * self.sys.boil_off_l_per_hour
-        first, second, mash_losses = self.double_mash_losses(total_grain_kg)
+        boil_loss = (boil_time_min / PHYSICAL_CONSTANTS.minutes_per_h) * self.sys.boil_off_l_per_hour
+        num_mashes = self.sys.get_num_mashes(total_grain_kg)
+        mash_grain_kg = total_grain_kg / num_mashes
+        mash_losses = self._absorption_l(total_grain_kg)
 
         total_water = batch_size_l + boil_loss + self.sys.trub_loss_l + mash_losses
 
@@ -50,8 +102,8 @@ class MashCalculator:
 
         return {
             "grain_total_kg": total_grain_kg,
-            "first_mash_grain_kg": first,
-            "second_mash_grain_kg": second,
+            "num_mashes": num_mashes,
+            "mash_grain_kg": mash_grain_kg,
             "mash_losses_l": mash_losses,
             "boil_loss_l": boil_loss,
             "trub_loss_l": self.sys.trub_loss_l,
@@ -60,11 +112,10 @@ class MashCalculator:
 
     @staticmethod
     def pretty(plan: Dict[str, float]) -> None:
-        print("=== Dubbelmäskningsplan (BM20 kort maltpipa) ===")
+        print(f"=== Mäskningsplan ({plan['num_mashes']} mäskningar) ===")
         print(f"Total malt:           {plan['grain_total_kg']:.2f} kg")
-        print(f"Första mäskningen:    {plan['first_mash_grain_kg']:.2f} kg")
-        print(f"Andra mäskningen:     {plan['second_mash_grain_kg']:.2f} kg")
+        print(f"Malt per mäskning:    {plan['mash_grain_kg']:.2f} kg")
         print(f"Mäskförluster:        {plan['mash_losses_l']:.2f} L")
         print(f"Kokförlust:           {plan['boil_loss_l']:.2f} L")
         print(f"Trubförlust:          {plan['trub_loss_l']:.2f} L")
-        print(f"Total vattenmängd in: {plan['total_water_l']:.2f} L")
\ No newline at end of file
+        print(f"Total vattenmängd in: {plan['total_water_l']:.2f} L")
@@ -0,0 +1,108 @@
+import logging
+from dataclasses import dataclass
+from typing import Dict
+
+from malt import Malt
+from malts_db import get_malt
+
+# Module logger
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class WaterProfile:
+    """
+    Vattnets joner som påverkar mäsk-pH (ppm).
+    """
+    alkalinity_ppm_caco3: float = 0.0
+    calcium_ppm: float = 0.0
+    magnesium_ppm: float = 0.0
+
+    def residual_alkalinity_meq_l(self) -> float:
+        """
+        Kolbachs restalkalinitet i mEq/L.
+        """
+        ra_ppm = self.alkalinity_ppm_caco3 - self.calcium_ppm / 1.4 - self.magnesium_ppm / 1.7
+        return ra_ppm / 50.0
+
+
+DISTILLED_WATER = WaterProfile()
+
+
+class MashPhCalculator:
+    """
+    Förutsäger mäsk-pH med en laddningsbalans:
+    varje malt har pH i destillerat vatten (di_ph) och buffertkapacitet
+    (mEq per kg och pH-enhet). Vattnets restalkalinitet höjer pH och
+    syratillsatser sänker det:
+
+        sum(kg * B * (pH - di_ph)) = RA * volym - syra
+
+    Sambandet är linjärt i pH, så både pH och syramängd har slutna uttryck.
+    """
+    LACTIC_ACID_88_MEQ_PER_ML = 11.8
+
+    @staticmethod
+    def _grist_terms(malts: list[Malt]) -> tuple[float, float]:
+        """
+        Returnerar (sum kg*B, sum kg*B*di_ph). Malter utan di_ph (t.ex. socker) påverkar inte pH.
+        """
+        buffer_total = 0.0
+        weighted_ph = 0.0
+        for m in malts:
+            info = get_malt(m.name)
+            di_ph = info.get("di_ph")
+            if di_ph is None:
+                continue
+            b = m.amount_kg * info.get("buffer_meq_kg_ph", 0.0)
+            buffer_total += b
+            weighted_ph += b * di_ph
+        return buffer_total, weighted_ph
+
+    @staticmethod
+    def predict(malts: list[Malt], water_l: float, water: WaterProfile = DISTILLED_WATER, acid_meq: float = 0.0) -> float:
+        buffer_total, weighted_ph = MashPhCalculator._grist_terms(malts)
+        if buffer_total <= 0:
+            raise ValueError("Maltnotan saknar buffertkapacitet, kan inte beräkna mäsk-pH")
+        alkalinity_meq = water.residual_alkalinity_meq_l() * water_l
+        ph = (weighted_ph + alkalinity_meq - acid_meq) / buffer_total
+        logger.debug("Mash pH: %.2f (RA %.1f mEq, acid %.1f mEq)", ph, alkalinity_meq, acid_meq)
+        return ph
+
+    @staticmethod
+    def acid_needed_meq(malts: list[Malt], water_l: float, target_ph: float, water: WaterProfile = DISTILLED_WATER) -> float:
+        """
+        Syra (mEq) som behövs för att nå target_ph. Negativt värde betyder att
+        mäsken redan ligger under målet och behöver bas i stället.
+        """
+        buffer_total, weighted_ph = MashPhCalculator._grist_terms(malts)
+        return weighted_ph + water.residual_alkalinity_meq_l() * water_l - target_ph * buffer_total
+
+    @staticmethod
+    def lactic_acid_ml(acid_meq: float) -> float:
+        return max(0.0, acid_meq) / MashPhCalculator.LACTIC_ACID_88_MEQ_PER_ML
+
+    @staticmethod
+    def predict_batch(grain_bills: list[list[Malt]], water_l: list[float],
+                      waters: list[WaterProfile] | None = None, acid_meq: list[float] | None = None) -> list[float]:
+        """
+        mäsk-pH för många maltnotor på en gång.
+        """
+        n = len(grain_bills)
+        waters = waters or [DISTILLED_WATER] * n
+        acid_meq = acid_meq or [0.0] * n
+        return [MashPhCalculator.predict(bill, vol, w, a) for bill, vol, w, a in zip(grain_bills, water_l, waters, acid_meq)]
+
+    @staticmethod
+    def calculate(malts: list[Malt], water_l: float, target_ph: float | None = None,
+                  water: WaterProfile = DISTILLED_WATER) -> Dict[str, float]:
+        """
+        Returnerar förutsagt pH utan syra och, om target_ph anges,
+        syra i mEq och ml mjölksyra 88 % för att nå målet.
+        """
+        result = {"ph": MashPhCalculator.predict(malts, water_l, water)}
+        if target_ph:
+            acid_meq = MashPhCalculator.acid_needed_meq(malts, water_l, target_ph, water)
+            result["acid_meq"] = acid_meq
+            result["lactic_acid_ml"] = MashPhCalculator.lactic_acid_ml(acid_meq)
+        return result
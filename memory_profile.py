@@ -0,0 +1,171 @@
+import contextlib
+import gc
+import logging
+import os
+import sys
+import tracemalloc
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, Iterator
+
+from rich.console import Console
+from rich.table import Table
+
+# Module logger
+logger = logging.getLogger(__name__)
+
+_REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+# Profilern som memory_stage rapporterar till, None när profilering är avstängd
+_active: "MemoryProfiler | None" = None
+
+
+def _module_of(filename: str) -> str:
+    """
+    Modulnamn för en fil: brewcalc-moduler med namn, tredjepartspaket
+    med paketnamn, övrigt (stdlib) med filnamn.
+    """
+    if filename.startswith(_REPO_DIR):
+        return os.path.splitext(os.path.relpath(filename, _REPO_DIR))[0].replace(os.sep, ".")
+    parts = filename.split(os.sep)
+    if "site-packages" in parts:
+        i = parts.index("site-packages")
+        if i + 1 < len(parts):
+            return os.path.splitext(parts[i + 1])[0]
+    name = os.path.splitext(os.path.basename(filename))[0]
+    if name == "__init__":
+        name = os.path.basename(os.path.dirname(filename))
+    return name
+
+
+@dataclass
+class StageMemory:
+    name: str
+    calls: int = 0
+    peak_bytes: int = 0          # högsta topp över ett anrop
+    retained_bytes: int = 0      # summa kvarvarande efter anropen
+    by_module: Dict[str, int] = field(default_factory=lambda: defaultdict(int))
+
+
+class MemoryProfiler:
+    """
+    Mäter minne per steg i pipelinen med tracemalloc. För varje steg sparas
+    topp (allokerat under steget) och kvarvarande allokeringar (inklusive skräp
+    som ännu inte samlats in). Fördelningen
+    per modul kräver snapshots, som blir dyra när många block lever, så den
+    tas bara för de `detail_calls` första anropen av varje steg.
+
+        with MemoryProfiler() as profiler:
+            ...                       # kod med memory_stage("plan") osv.
+        profiler.print_report()
+    """
+
+    def __init__(self, frames: int = 1, detail_calls: int = 5):
+        self.frames = frames
+        self.detail_calls = detail_calls
+        self.stages: Dict[str, StageMemory] = {}
+        self._started = False
+        self._filters = [
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ]
+
+    def __enter__(self):
+        global _active
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._started = True
+        _active = self
+        return self
+
+    def __exit__(self, *exc):
+        global _active
+        _active = None
+        if self._started:
+            tracemalloc.stop()
+            self._started = False
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        s = self.stages.get(name)
+        if s is None:
+            s = self.stages[name] = StageMemory(name)
+        detail = s.calls < self.detail_calls
+        before = None
+        if detail:
+            gc.collect()
+            before = tracemalloc.take_snapshot().filter_traces(self._filters)
+        start_current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        try:
+            yield
+        finally:
+            current, peak = tracemalloc.get_traced_memory()
+            s.calls += 1
+            s.peak_bytes = max(s.peak_bytes, peak - start_current)
+            s.retained_bytes += current - start_current
+            if detail:
+                # Cykliskt skräp räknas annars som kvarvarande
+                gc.collect()
+                after = tracemalloc.take_snapshot().filter_traces(self._filters)
+                for diff in after.compare_to(before, "filename"):
+                    if diff.size_diff:
+                        s.by_module[_module_of(diff.traceback[0].filename)] += diff.size_diff
+
+    def print_report(self, top: int = 5, console: Console | None = None):
+        console = console or Console()
+        table = Table(title="Memory by stage", show_lines=True)
+        table.add_column("Stage", style="bold")
+        table.add_column("Calls", justify="right")
+        table.add_column("Peak KiB", justify="right")
+        table.add_column("Retained KiB", justify="right")
+        table.add_column(f"Retained by module, first {self.detail_calls} calls (KiB)")
+        for s in self.stages.values():
+            modules = sorted(((m, b) for m, b in s.by_module.items() if abs(b) >= 64),
+                             key=lambda kv: -abs(kv[1]))[:top]
+            table.add_row(s.name, str(s.calls), f"{s.peak_bytes / 1024:.1f}", f"{s.retained_bytes / 1024:.1f}",
+                          ", ".join(f"{m}: {b / 1024:+.1f}" for m, b in modules))
+        console.print(table)
+
+
+def memory_stage(name: str):
+    """
+    Markerar ett steg i pipelinen. Utan aktiv profiler görs ingenting.
+    """
+    if _active is None:
+        return contextlib.nullcontext()
+    return _active.stage(name)
+
+
+def current_rss_bytes() -> int:
+    """
+    Processens nuvarande RSS. Utan /proc används högsta RSS hittills.
+    """
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except OSError:
+        import resource
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+class MemoryBudget:
+    """
+    Minnesbudget för batchkörningar. När RSS passerar `soft_fraction`
+    av gränsen ska anroparen tömma sina cachar eller byta ut arbetsprocesser
+    innan den hårda gränsen (t.ex. containerns) nås.
+    """
+
+    def __init__(self, limit_mb: float, soft_fraction: float = 0.8):
+        self.limit_bytes = int(limit_mb * 1024 * 1024)
+        self.soft_limit_bytes = int(self.limit_bytes * soft_fraction)
+
+    def over_soft_limit(self, rss_bytes: int | None = None) -> bool:
+        rss = current_rss_bytes() if rss_bytes is None else rss_bytes
+        if rss > self.soft_limit_bytes:
+            logger.debug("Memory budget: RSS %.1f MiB over soft limit %.1f MiB",
+                         rss / 2**20, self.soft_limit_bytes / 2**20)
+            return True
+        return False
@@ -0,0 +1,74 @@
+import logging
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable
+
+from planner import RecipePlan, plan_recipe
+from system_profile import SystemProfile
+
+# Module logger
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNKSIZE = 8
+
+
+def gil_enabled() -> bool:
+    """
+    False bara på en free-threaded CPython (3.13t och senare) där GIL är avstängt.
+    """
+    check = getattr(sys, "_is_gil_enabled", None)
+    return True if check is None else check()
+
+
+def default_workers() -> int:
+    """
+    Antal trådar som lönar sig: alla kärnor utan GIL, annars en
+    (beräkningarna är ren Python och trådar ger bara overhead med GIL).
+    """
+    if gil_enabled():
+        return 1
+    count = os.process_cpu_count() if hasattr(os, "process_cpu_count") else os.cpu_count()
+    return count or 1
+
+
+@dataclass(frozen=True)
+class PlanTask:
+    recipe: Dict[str, Any]
+    system: SystemProfile
+    batch_size_l: float | None = None
+
+
+def _run_chunk(tasks: list[PlanTask]) -> list[RecipePlan]:
+    return [plan_recipe(t.recipe, t.system, batch_size_l=t.batch_size_l) for t in tasks]
+
+
+class PlanExecutor:
+    """
+    Planerar många recept i en trådpool. Kalkylatorerna har inget delat
+    muterbart tillstånd (maltnotor, volymer och gravities är oföränderliga),
+    så planer kan räknas parallellt och skalar med kärnorna på free-threaded
+    CPython. Med GIL körs allt i anropande tråd om inte `workers` anges.
+
+    Arbetstrådarna skriver aldrig ut något; resultatet kommer i samma
+    ordning som uppgifterna och skrivs ut av anroparen.
+    """
+
+    def __init__(self, workers: int | None = None, chunksize: int = DEFAULT_CHUNKSIZE):
+        self.workers = default_workers() if workers is None else max(1, workers)
+        self.chunksize = max(1, chunksize)
+
+    def map(self, tasks: Iterable[PlanTask]) -> list[RecipePlan]:
+        tasks = list(tasks)
+        if self.workers == 1 or len(tasks) <= self.chunksize:
+            return _run_chunk(tasks)
+        if gil_enabled():
+            logger.debug("Planning %d tasks on %d threads with the GIL enabled, expect no speedup", len(tasks), self.workers)
+        chunks = [tasks[i:i + self.chunksize] for i in range(0, len(tasks), self.chunksize)]
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="plan") as pool:
+            return [plan for chunk in pool.map(_run_chunk, chunks) for plan in chunk]
+
+
+def plan_many(tasks: Iterable[PlanTask], workers: int | None = None) -> list[RecipePlan]:
+    return PlanExecutor(workers).map(tasks)
@@ -0,0 +1,151 @@
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict
+
+from malt import Malt
+from gravities import Gravities
+from volumes import Volumes
+from malts_db import get_malt
+from bitterness_calculator import BitternessCalculator
+from boil_model import BoilModel
+from gravity_calculator import GravityCalculator
+from color_calculator import ColorCalculator
+from mash_calculator import MashCalculator, MashSplit
+from mash_ph import MashPhCalculator, WaterProfile, DISTILLED_WATER
+from dry_hop import DryHopBitterness, estimate_bitterness, plan_dry_hops
+from system_profile import PHYSICAL_CONSTANTS, SystemProfile
+
+# Module logger
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class RecipePlan:
+    """
+    Resultatet av att planera ett recept mot en systemprofil. Planen och
+    dess delar (volymer, gravities, maltnotor) är oföränderliga.
+    """
+    recipe: Dict[str, Any]
+    system: SystemProfile
+    volumes: Volumes
+    gravities: Gravities
+    mash_grain_bill: list[Malt]
+    total_grain_kg: float
+    num_mashes: int
+    color: Dict[str, float]
+    hops_additions: list[Dict] = field(default_factory=list)
+    ferm_grain_bill: list[Malt] = field(default_factory=list)
+    mashes: list[MashSplit] = field(default_factory=list)
+    mash_ph: Dict[str, float] = field(default_factory=dict)
+    dry_hop_additions: list[Dict] = field(default_factory=list)
+    bitterness: DryHopBitterness | None = None
+
+
+def build_grain_bill(fermentables: list[Dict[str, Any]] | None) -> list[Malt]:
+    """
+    Bygger en lista med Malt från receptets fermentables och maltdatabasen.
+    """
+    grain_bill = []
+    for malt_recipe in fermentables or []:
+        malt_info_db = get_malt(malt_recipe["name"])
+        grain_bill.append(Malt(malt_recipe["name"], malt_info_db["extract_percent"], malt_recipe["percent"] / 100.0, malt_info_db["color_ebc"]))
+    return grain_bill
+
+
+def plan_recipe(recipe: Dict[str, Any], system: SystemProfile, batch_size_l: float | None = None,
+                water: WaterProfile = DISTILLED_WATER) -> RecipePlan:
+    """
+    Planerar volymer, gravity, maltnota, färg, mäsk-pH, humle- och torrhumlegivor för ett recept.
+    `batch_size_l` skriver över receptets batchstorlek om den anges.
+    """
+    if batch_size_l is not None:
+        recipe = dict(recipe, batch_size_l=batch_size_l)
+
+    gravity_calc = GravityCalculator(system)
+    post_boil_plato = gravity_calc.get_pre_boil_plato(recipe["mash_fermentables"], recipe["target_og_plato"])
+
+    boil_off = (recipe.get("boil_time_min") / PHYSICAL_CONSTANTS.minutes_per_h) * system.boil_off_l_per_hour
+    post_boil = recipe["batch_size_l"] + system.trub_loss_l
+    logger.info(f"Volume post-boil: {post_boil:.1f} L, including trub loss {system.trub_loss_l:.1f} L")
+
+    pre_boil = post_boil + boil_off
+    logger.info(f"Volume preboil before mash compenation: {pre_boil:.1f} L, including boil off {boil_off:.1f} L")
+    gravities = Gravities(post_boil=post_boil_plato, pre_boil=(post_boil/pre_boil) * post_boil_plato)
+    logger.info(f"Estimated pre-boil gravity: {gravities.pre_boil:.1f} °P based on post-boil gravity {gravities.post_boil:.1f} °P and volumes reduction {(post_boil/pre_boil):.1f}")
+
+    base_grain_bill = build_grain_bill(recipe["mash_fermentables"])
+    mash_grain_bill = base_grain_bill
+
+    # Maltmängden beror på mäskförlusten som beror på maltmängden, iterera tills den står still
+    mash_loss = 0.0
+    grain_bill_change = 1000.0
+    total_grain_kg = 0.0
+    while grain_bill_change > 0.1:
+        mash_grain_bill = gravity_calc.calc_grain_bill(
+            target_plato=gravities.pre_boil,
+            batch_size_l=pre_boil + mash_loss,
+            grain_bill=base_grain_bill,
+        )
+        new_total_grain_kg = gravity_calc.calc_total_grain_kg(mash_grain_bill)
+        grain_bill_change = abs(total_grain_kg - new_total_grain_kg)
+        total_grain_kg = new_total_grain_kg
+        mash_loss = gravity_calc.get_volume_loss_from_grain(total_grain_kg)
+        logger.info(f"Volume loss from grain: {mash_loss:.1f} L, total grain bill: {total_grain_kg:.1f} kg")
+
+    volumes = Volumes(trub_loss=system.trub_loss_l, post_boil=post_boil, pre_boil=pre_boil,
+                      mash_loss=mash_loss, boil_off=boil_off)
+    logger.info(f"Volume preboil, final: { volumes.get_total_pre_boil():.1f} L")
+
+    mashes = MashCalculator(system).split_grain_bill(mash_grain_bill, volumes.get_total_pre_boil())
+    logger.info("Number of mashes: %d", len(mashes))
+
+    mash_ph = MashPhCalculator.calculate(mash_grain_bill, volumes.get_total_pre_boil(), recipe.get("mash_ph"), water)
+    logger.info("Estimated mash pH: %.2f", mash_ph["ph"])
+
+    color = ColorCalculator.calculate(
+        malts=mash_grain_bill,          # grain_bill innehåller amount_kg och color_ebc
+        volume_l=float(recipe["batch_size_l"])
+    )
+    logger.info("EBC (Morey): %s", color["ebc"])
+
+    boil = BoilModel.for_system(system, gravities.pre_boil, volumes.pre_boil, float(recipe["boil_time_min"]),
+                                hop_stand_min=float(recipe.get("hop_stand_min", 0.0)))
+    hops_additions = BitternessCalculator().calc_hops_additions(
+        plato=(gravities.pre_boil + gravities.post_boil) / 2,
+        volume=volumes.pre_boil,
+        target_ibu=recipe["target_ibu"],
+        hops=recipe["boil_hops"],
+        boil=boil,
+    )
+
+    # Torrhumlen doseras på jäskärlets volym (batchstorleken)
+    dry_hop_additions = plan_dry_hops(recipe.get("dry_hops", []), float(recipe["batch_size_l"]))
+    bitterness = estimate_bitterness(float(recipe["target_ibu"]), dry_hop_additions, float(recipe["batch_size_l"]))
+    logger.info("Final IBU after dry hopping: %.1f", bitterness.final_ibu)
+
+    ferm_grain_bill = build_grain_bill(recipe.get("fermentor_fermentables"))
+    if ferm_grain_bill:
+        ferm_grain_bill = gravity_calc.calc_grain_bill(
+            target_plato=recipe["target_og_plato"],
+            batch_size_l=recipe["batch_size_l"],
+            grain_bill=ferm_grain_bill,
+        )
+    else:
+        logger.debug("No fermentor fermentables defined")
+
+    return RecipePlan(
+        recipe=recipe,
+        system=system,
+        volumes=volumes,
+        gravities=gravities,
+        mash_grain_bill=mash_grain_bill,
+        total_grain_kg=total_grain_kg,
+        num_mashes=len(mashes),
+        color=color,
+        hops_additions=hops_additions,
+        ferm_grain_bill=ferm_grain_bill,
+        mashes=mashes,
+        mash_ph=mash_ph,
+        dry_hop_additions=dry_hop_additions,
+        bitterness=bitterness,
+    )
@@ -1,53 +1,116 @@
-from pydantic import BaseModel
+from typing import Any
+
+from pydantic import BaseModel, TypeAdapter, field_validator, model_validator
+
+from hops_db import get_hop
+from malts_db import get_malt
+from turbid_mash import get_mash_schedule
+from water_treatment import get_water_profile
 
 
 class Fermentable(BaseModel):
     name: str
     percent: float
 
+    @field_validator("name")
+    @classmethod
+    def _known_malt(cls, name: str) -> str:
+        get_malt(name)
+        return name
+
 
 class Fining(BaseModel):
     name: str
-    amount_ml: float
+    amount_ml: float | None = None
+    amount_g: float | None = None
+
 
 class Hop(BaseModel):
     name: str
     percent: float
     boil_time_min: float
 
+    @field_validator("name")
+    @classmethod
+    def _known_hop(cls, name: str) -> str:
+        get_hop(name)
+        return name
+
+
+class DryHop(BaseModel):
+    # Torrhumling anges i g/L och behöver inte finnas i humledatabasen
+    name: str
+    amount_g_per_l: float
+    contact_time_days: float | None = None
+
+
+class Yeast(BaseModel):
+    name: str
+    attenuation: float = 0.75   # skenbar förjäsningsgrad på en normal vört (0-1)
+
+
+class FermentationStep(BaseModel):
+    day: float                  # dag då temperaturen börjar gälla
+    temp_c: float
+
 
 class Recipe(BaseModel):
     name: str
+    version: float | str = "Okänt recept"
     batch_size_l: float
-    fermentables: list[dict]
-    fining: list[dict] | None = None
-    fermentor_fermentables: list[dict] | None = None
-    boil_hops: list[dict] | None = None
-
-
-name: Black IPA
-version: 1.1
-batch_size_l: 10.0
-boil_time_min: 120
-target_og_plato: 12
-target_ibu: 5.0
-mash_ph: 5.2
-
-mash_fermentables:
-  - name: Best a-xl
-    percent: 40
-  - name: Unmalted wheat
-    percent: 60
-
-fining:
-  - name: Irish moss
-    amount_g: 5
-
-fermentor_fermentables:
-
-boil_hops:
-  - name: Magnum
-    percent: 100
-    boil_time_min: 60
-
-dry_hops:
+    boil_time_min: float
+    target_og_plato: float
+    target_ibu: float = 0.0
+    mash_ph: float | None = None
+    mash_fermentables: list[Fermentable]
+    fermentor_fermentables: list[Fermentable] = []
+    fining: list[Fining] = []
+    boil_hops: list[Hop] = []
+    dry_hops: list[DryHop] = []
+    hop_stand_min: float = 0.0          # humlevila efter kok innan kylning
+    mash_temp_c: float | None = None
+    mash_schedule: str | None = None    # namn i mash_schedules.yaml, annars turbid
+    water_profile: str | None = None    # målprofil i water_profiles.yaml för saltberäkningen
+    yeast: Yeast | None = None
+    fermentation_profile: list[FermentationStep] = []
+
+    @field_validator("mash_schedule")
+    @classmethod
+    def _known_schedule(cls, name: str | None) -> str | None:
+        if name is not None:
+            get_mash_schedule(name)
+        return name
+
+    @field_validator("water_profile")
+    @classmethod
+    def _known_water_profile(cls, name: str | None) -> str | None:
+        if name is not None:
+            get_water_profile(name)
+        return name
+
+    @field_validator("fermentor_fermentables", "fining", "boil_hops", "dry_hops", "fermentation_profile", mode="before")
+    @classmethod
+    def _empty_list(cls, value: Any) -> Any:
+        # Tomma YAML-nycklar blir None
+        return [] if value is None else value
+
+    @model_validator(mode="after")
+    def _validate_percent(self) -> "Recipe":
+        mash_sum = sum(m.percent for m in self.mash_fermentables)
+        ferm_sum = sum(f.percent for f in self.fermentor_fermentables)
+        total = mash_sum + ferm_sum
+        if abs(total - 100) > 0.01:
+            raise ValueError(
+                f"mash_fermentables + fermentor_fermentables måste summera till 100 %, "
+                f"men är {total:.2f} %."
+            )
+
+        hops_sum = sum(h.percent for h in self.boil_hops)
+        if abs(hops_sum - 100) > 0.01:
+            raise ValueError(f"boil_hops måste summera till 100 %, men är {hops_sum:.2f} %.")
+        return self
+
+
+# Adaptrarna byggs en gång per process, att skapa en TypeAdapter är dyrt
+RECIPE_ADAPTER = TypeAdapter(Recipe)
+RECIPES_ADAPTER = TypeAdapter(list[Recipe])
@@ -1,30 +1,75 @@
+import copy
+import functools
 import yaml
 import logging
 import os
 from typing import Dict, Any, List
 
+from pydantic import ValidationError
+
+from recipe import Recipe, RECIPE_ADAPTER, RECIPES_ADAPTER
+from recipe_pack import find_in_packs, open_pack, recipe_key
+
 # Module logger
 logger = logging.getLogger(__name__)
 
 
+@functools.lru_cache(maxsize=1024)
+def _load_yaml_cached(path: str, mtime_ns: int, size: int) -> Any:
+    with open(path, "r", encoding="utf-8") as f:
+        return yaml.safe_load(f)
+
+
+def clear_yaml_cache():
+    """
+    Tömmer cachen med inlästa receptfiler, t.ex. när en batchkörning når sin minnesbudget.
+    """
+    _load_yaml_cached.cache_clear()
+
+
+def load_recipe_yaml(path: str) -> Any:
+    """
+    Läser en receptfil. Resultatet cachas per process och läses om
+    när filens mtime eller storlek ändras. Anroparen får en egen kopia.
+    """
+    st = os.stat(path)
+    return copy.deepcopy(_load_yaml_cached(path, st.st_mtime_ns, st.st_size))
+
+
 class RecipeLoader:
     """
-    Läser in receptet och validerar:
+    Läser in receptet och validerar det till en `Recipe`:
     - mash_fermentables + fermentor_fermentables = 100 %
     - boil_hops = 100 %
+    - malter och kokhumle finns i databaserna
     - dry_hops i g/L (ingen procent)
+
+    `path` kan också vara "paket.bcpack#namn". Finns inte filen letas
+    receptet upp i paketen under recipes/.
     """
 
+    RECIPE_DIR = "recipes"
+
     def __init__(self, path: str):
-        self.path = "recipes/" + path
-        if not os.path.exists(self.path):
-            raise FileNotFoundError(f"Receptfil hittades inte: {self.path}")
-        self.data = self._load_yaml()
+        self.path = f"{self.RECIPE_DIR}/{path}"
+        pack_path, sep, name = path.partition("#")
+        if sep:
+            raw = open_pack(f"{self.RECIPE_DIR}/{pack_path}").get(name)
+        elif os.path.exists(self.path):
+            raw = self._load_yaml()
+        else:
+            raw = find_in_packs(self.RECIPE_DIR, recipe_key(path))
+            if raw is None:
+                raise FileNotFoundError(f"Receptfil hittades inte: {self.path}")
 
         logger.debug("Loaded recipe data from %s", self.path)
 
-        self._validate_mash_and_fermentor_percent()
-        self._validate_boil_hops_percent()
+        try:
+            self.recipe: Recipe = RECIPE_ADAPTER.validate_python(raw)
+        except ValidationError as exc:
+            logger.error("Ogiltigt recept %s: %s", self.path, exc)
+            raise
+        self.data = self.recipe.model_dump(exclude_none=True)
 
     # ---------------------------------------------------------
     # YAML loader
@@ -32,45 +77,21 @@ class RecipeLoader:
 
     def _load_yaml(self) -> Dict[str, Any]:
         logger.debug("Loading YAML from %s", self.path)
-        with open(self.path, "r", encoding="utf-8") as f:
-            data = yaml.safe_load(f)
+        data = load_recipe_yaml(self.path)
         logger.debug("YAML loaded: keys=%s", list(data.keys()) if isinstance(data, dict) else type(data))
         return data
 
     # ---------------------------------------------------------
-    # Validation
+    # Batch validation
     # ---------------------------------------------------------
 
-    def _validate_mash_and_fermentor_percent(self):
-        mash = self.data.get("mash_fermentables", [])
-        ferm = self.data.get("fermentor_fermentables", [])
-
-        mash_sum = sum(m.get("percent", 0) for m in mash)
-        if not ferm:
-            ferm_sum = 0
-        else:
-            ferm_sum = sum(f.get("percent", 0) for f in ferm)
-
-        total = mash_sum + ferm_sum
-        logger.debug("mash_fermentables sum: %.2f, fermentor_fermentables sum: %.2f", mash_sum, ferm_sum)
-        
-
-        if abs(total - 100) > 0.01:
-            msg = (
-                f"mash_fermentables + fermentor_fermentables måste summera till 100 %, "
-                f"men är {total:.2f} %."
-            )
-            logger.error(msg)
-            raise ValueError(msg)
-
-    def _validate_boil_hops_percent(self):
-        hops = self.data.get("boil_hops", [])
-        total = sum(h.get("percent", 0) for h in hops)
-
-        if abs(total - 100) > 0.01:
-            msg = f"boil_hops måste summera till 100 %, men är {total:.2f} %."
-            logger.error(msg)
-            raise ValueError(msg)
+    @staticmethod
+    def validate_many(recipes: list[Dict[str, Any]]) -> list[Recipe]:
+        """
+        Validerar många recept i ett anrop. Alla fel samlas i ett
+        ValidationError där `loc` börjar med receptets index i listan.
+        """
+        return RECIPES_ADAPTER.validate_python(recipes)
 
     # ---------------------------------------------------------
     # Properties
@@ -0,0 +1,287 @@
+import functools
+import hashlib
+import json
+import logging
+import argparse
+import mmap
+import os
+import struct
+import sys
+import zlib
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable
+
+import yaml
+from pydantic import ValidationError
+
+from recipe import RECIPE_ADAPTER
+
+# Module logger
+logger = logging.getLogger(__name__)
+
+PACK_SUFFIX = ".bcpack"
+
+# Filhuvud: magi, version, indexets offset och längd.
+# Posterna ligger direkt efter huvudet och indexet sist. Nya poster och ett
+# nytt index skrivs efter slutet av filen och huvudet skrivs om sist, så ett
+# avbrutet tillägg lämnar det gamla indexet orört.
+MAGIC = b"BCPACK\0\0"
+FORMAT_VERSION = 1
+_HEADER = struct.Struct("<8sIQQ")
+
+
+@dataclass(frozen=True)
+class PackEntry:
+    offset: int
+    length: int
+    sha256: str     # hash av den okomprimerade, normaliserade JSON-datan
+
+
+def _encode(data: Dict[str, Any]) -> tuple[bytes, str]:
+    raw = json.dumps(data, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return zlib.compress(raw, 6), hashlib.sha256(raw).hexdigest()
+
+
+def recipe_key(path: str) -> str:
+    """
+    Namnet ett recept får i ett paket: filnamnet utan ändelse.
+    """
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+class RecipePack:
+    """
+    Läser ett receptpaket via mmap. Bara huvud och index läses vid öppning;
+    ett recept hämtas genom att dekomprimera dess egen post.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f"Tomt receptpaket: {path}") from None
+        magic, version, index_offset, index_length = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"Inte ett receptpaket: {path}")
+        if version != FORMAT_VERSION:
+            self.close()
+            raise ValueError(f"Receptpaket {path} har version {version}, stöds: {FORMAT_VERSION}")
+        self.index_offset = index_offset
+        index = json.loads(self._mm[index_offset:index_offset + index_length])
+        self.index: Dict[str, PackEntry] = {name: PackEntry(*entry) for name, entry in index.items()}
+
+    def close(self):
+        if not self._mm.closed:
+            self._mm.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.index
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def names(self) -> list[str]:
+        return sorted(self.index)
+
+    def _raw(self, name: str) -> bytes:
+        try:
+            entry = self.index[name]
+        except KeyError:
+            raise KeyError(f"Receptet '{name}' finns inte i {self.path}") from None
+        return zlib.decompress(self._mm[entry.offset:entry.offset + entry.length])
+
+    def get(self, name: str) -> Dict[str, Any]:
+        return json.loads(self._raw(name))
+
+    def verify(self) -> list[str]:
+        """
+        Kontrollerar hash och validerar varje recept. Returnerar felmeddelanden.
+        """
+        errors = []
+        end = self.index_offset
+        for name, entry in sorted(self.index.items()):
+            if entry.offset < _HEADER.size or entry.offset + entry.length > end:
+                errors.append(f"{name}: post utanför paketets data")
+                continue
+            try:
+                raw = self._raw(name)
+            except zlib.error as exc:
+                errors.append(f"{name}: kan inte dekomprimeras ({exc})")
+                continue
+            if hashlib.sha256(raw).hexdigest() != entry.sha256:
+                errors.append(f"{name}: hash stämmer inte")
+                continue
+            try:
+                RECIPE_ADAPTER.validate_python(json.loads(raw))
+            except ValidationError as exc:
+                errors.append(f"{name}: ogiltigt recept ({exc.error_count()} fel)")
+        return errors
+
+    def dead_bytes(self) -> int:
+        """
+        Bytes som upptas av ersatta poster och gamla index.
+        """
+        return self.index_offset - _HEADER.size - sum(e.length for e in self.index.values())
+
+
+def _validated(recipes: Iterable[tuple[str, Dict[str, Any]]]) -> list[tuple[str, Dict[str, Any]]]:
+    result = []
+    for name, raw in recipes:
+        try:
+            recipe = RECIPE_ADAPTER.validate_python(raw)
+        except ValidationError as exc:
+            raise ValueError(f"Ogiltigt recept {name}: {exc}") from exc
+        result.append((name, recipe.model_dump(exclude_none=True)))
+    return result
+
+
+def _sync(f):
+    f.flush()
+    os.fsync(f.fileno())
+
+
+def _write_index(f, index: Dict[str, PackEntry], index_offset: int):
+    """
+    Skriver indexet vid `index_offset` och synkar det till disk innan huvudet
+    pekas om, så huvudet aldrig pekar på ett halvskrivet index.
+    """
+    blob = json.dumps({name: [e.offset, e.length, e.sha256] for name, e in sorted(index.items())},
+                      separators=(",", ":")).encode("utf-8")
+    f.seek(index_offset)
+    f.write(blob)
+    _sync(f)
+    f.seek(0)
+    f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, index_offset, len(blob)))
+    _sync(f)
+
+
+def write_pack(path: str, recipes: Iterable[tuple[str, Dict[str, Any]]]) -> int:
+    """
+    Skapar ett nytt paket av (namn, receptdata). Recepten valideras och
+    normaliseras först, så paketet innehåller bara giltiga recept.
+    """
+    recipes = _validated(recipes)
+    index: Dict[str, PackEntry] = {}
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, 0, 0))
+        for name, data in recipes:
+            blob, sha = _encode(data)
+            index[name] = PackEntry(f.tell(), len(blob), sha)
+            f.write(blob)
+        _write_index(f, index, f.tell())
+    os.replace(tmp, path)
+    return len(index)
+
+
+def append_pack(path: str, recipes: Iterable[tuple[str, Dict[str, Any]]]) -> int:
+    """
+    Lägger till recept i ett befintligt paket. Ett recept med samma namn
+    ersätts; den gamla posten och det gamla indexet blir kvar som död data.
+    """
+    recipes = _validated(recipes)
+    with RecipePack(path) as pack:
+        index = dict(pack.index)
+    with open(path, "r+b") as f:
+        f.seek(0, os.SEEK_END)
+        for name, data in recipes:
+            blob, sha = _encode(data)
+            index[name] = PackEntry(f.tell(), len(blob), sha)
+            f.write(blob)
+        _write_index(f, index, f.tell())
+    return len(recipes)
+
+
+@functools.lru_cache(maxsize=64)
+def _open_pack_cached(path: str, mtime_ns: int, size: int) -> RecipePack:
+    return RecipePack(path)
+
+
+def open_pack(path: str) -> RecipePack:
+    """
+    Öppnar ett paket. Öppna paket delas per process och öppnas om när filen ändras.
+    """
+    st = os.stat(path)
+    return _open_pack_cached(path, st.st_mtime_ns, st.st_size)
+
+
+def find_in_packs(directory: str, name: str) -> Dict[str, Any] | None:
+    """
+    Letar efter ett recept i alla paket i `directory` (i namnordning).
+    """
+    try:
+        packs = sorted(f for f in os.listdir(directory) if f.endswith(PACK_SUFFIX))
+    except FileNotFoundError:
+        return None
+    for filename in packs:
+        pack = open_pack(os.path.join(directory, filename))
+        if name in pack:
+            logger.debug("Found recipe %s in pack %s", name, filename)
+            return pack.get(name)
+    return None
+
+
+def _read_recipe_files(paths: list[str]) -> Iterable[tuple[str, Dict[str, Any]]]:
+    for path in paths:
+        if os.path.isdir(path):
+            for dirpath, dirnames, filenames in os.walk(path):
+                dirnames.sort()
+                yield from _read_recipe_files([os.path.join(dirpath, f) for f in sorted(filenames)
+                                               if f.endswith((".yaml", ".yml"))])
+            continue
+        with open(path, "r", encoding="utf-8") as f:
+            yield recipe_key(path), yaml.safe_load(f)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Brewcalc receptpaket", add_help=False, formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("-h", "--help", action="help", default=argparse.SUPPRESS, help="Visa hjälp")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    p_build = commands.add_parser("build", help="Skapa ett paket av receptfiler och kataloger")
+    p_build.add_argument("pack", help=f"Paketfil ({PACK_SUFFIX})")
+    p_build.add_argument("paths", nargs="+", help="Receptfiler (YAML) eller kataloger")
+
+    p_append = commands.add_parser("append", help="Lägg till eller ersätt recept i ett paket")
+    p_append.add_argument("pack", help=f"Paketfil ({PACK_SUFFIX})")
+    p_append.add_argument("paths", nargs="+", help="Receptfiler (YAML) eller kataloger")
+
+    p_verify = commands.add_parser("verify", help="Kontrollera hash och validera alla recept")
+    p_verify.add_argument("pack", help=f"Paketfil ({PACK_SUFFIX})")
+
+    p_list = commands.add_parser("list", help="Lista recepten i ett paket")
+    p_list.add_argument("pack", help=f"Paketfil ({PACK_SUFFIX})")
+    args = parser.parse_args()
+
+    try:
+        if args.command == "build":
+            count = write_pack(args.pack, _read_recipe_files(args.paths))
+            print(f"{args.pack}: {count} recipe(s)")
+        elif args.command == "append":
+            count = append_pack(args.pack, _read_recipe_files(args.paths))
+            print(f"{args.pack}: {count} recipe(s) added")
+        elif args.command == "verify":
+            with RecipePack(args.pack) as pack:
+                errors = pack.verify()
+                for e in errors:
+                    print(f"{args.pack}: {e}")
+                print(f"{len(pack)} recipe(s), {len(errors)} error(s), {pack.dead_bytes()} dead byte(s)")
+            sys.exit(1 if errors else 0)
+        elif args.command == "list":
+            with RecipePack(args.pack) as pack:
+                for name in pack.names():
+                    print(name)
+    except (ValueError, KeyError) as exc:
+        print(exc, file=sys.stderr)
+        sys.exit(1)
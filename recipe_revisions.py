@@ -0,0 +1,322 @@
+import hashlib
+import json
+import logging
+import argparse
+import os
+import sqlite3
+import sys
+import time
+import zlib
+from dataclasses import dataclass, field
+from typing import Any, Dict
+
+import yaml
+from rich.console import Console
+from rich.table import Table
+
+import system_profile as sp
+from demand import IngredientDemand
+from planner import RecipePlan
+from recipe_loader import RecipeLoader
+from result_cache import ResultCache, cached_plan_recipe, open_cache
+
+# Module logger
+logger = logging.getLogger(__name__)
+
+console = Console()
+
+DEFAULT_STORE_PATH = os.path.join(
+    os.environ.get("BREWCALC_DATA_DIR", os.path.join(os.path.expanduser("~"), ".local", "share", "brewcalc")),
+    "revisions.sqlite",
+)
+
+# Var N:te revision sparas hel, övriga som delta mot föregående.
+# En revision återskapas därför med högst N - 1 deltan.
+KEYFRAME_INTERVAL = 32
+
+
+def _canonical(data: Any) -> bytes:
+    return json.dumps(data, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def _pack(obj: Any) -> bytes:
+    return zlib.compress(_canonical(obj), 6)
+
+
+def _unpack(blob: bytes) -> Any:
+    return json.loads(zlib.decompress(blob))
+
+
+def diff_data(old: Any, new: Any, path: tuple = ()) -> list:
+    """
+    Delta från `old` till `new` som en lista operationer:
+    ["set", path, value] eller ["del", path]. Listor med samma längd
+    jämförs per element, annars ersätts hela listan.
+    """
+    if isinstance(old, dict) and isinstance(new, dict):
+        ops = []
+        for key in old:
+            if key not in new:
+                ops.append(["del", list(path + (key,))])
+        for key, value in new.items():
+            if key not in old:
+                ops.append(["set", list(path + (key,)), value])
+            else:
+                ops += diff_data(old[key], value, path + (key,))
+        return ops
+    if isinstance(old, list) and isinstance(new, list) and len(old) == len(new):
+        ops = []
+        for i, (a, b) in enumerate(zip(old, new)):
+            ops += diff_data(a, b, path + (i,))
+        return ops
+    if old == new and type(old) is type(new):
+        return []
+    return [["set", list(path), new]]
+
+
+def apply_delta(data: Any, ops: list) -> Any:
+    """
+    Applicerar en delta från diff_data. `data` ändras på plats och returneras.
+    """
+    for op in ops:
+        path = op[1]
+        if not path:
+            data = op[2]
+            continue
+        target = data
+        for key in path[:-1]:
+            target = target[key]
+        if op[0] == "del":
+            del target[path[-1]]
+        else:
+            target[path[-1]] = op[2]
+    return data
+
+
+@dataclass
+class RevisionInfo:
+    recipe: str
+    rev: int
+    version: str
+    created: float
+    message: str
+    kind: str       # "full" eller "delta"
+    size: int
+
+
+class RevisionStore:
+    """
+    Alla versioner av alla recept i SQLite. Receptdatan normaliseras
+    (samma form som RecipeLoader.data) och lagras komprimerad, som hel
+    kopia var KEYFRAME_INTERVAL:e revision och annars som delta.
+    Uppslagning sker via primärnyckeln (recipe, rev), så en revision
+    hämtas med ett indexsök plus ett begränsat antal deltan.
+    """
+
+    def __init__(self, path: str = DEFAULT_STORE_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30.0, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS revisions ("
+            " recipe TEXT NOT NULL, rev INTEGER NOT NULL, version TEXT NOT NULL,"
+            " created REAL NOT NULL, message TEXT NOT NULL, kind TEXT NOT NULL,"
+            " sha TEXT NOT NULL, payload BLOB NOT NULL,"
+            " PRIMARY KEY (recipe, rev)) WITHOUT ROWID"
+        )
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def latest_rev(self, recipe: str) -> int | None:
+        row = self._conn.execute("SELECT MAX(rev) FROM revisions WHERE recipe = ?", (recipe,)).fetchone()
+        return row[0]
+
+    def commit(self, recipe: str, data: Dict[str, Any], message: str = "") -> int:
+        """
+        Sparar en ny revision. Returnerar revisionsnumret, eller det
+        senaste om datan är oförändrad.
+        """
+        sha = hashlib.sha256(_canonical(data)).hexdigest()
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            latest = self._conn.execute(
+                "SELECT rev, sha FROM revisions WHERE recipe = ? ORDER BY rev DESC LIMIT 1", (recipe,)).fetchone()
+            if latest is not None and latest[1] == sha:
+                self._conn.execute("COMMIT")
+                return latest[0]
+            rev = 1 if latest is None else latest[0] + 1
+            if (rev - 1) % KEYFRAME_INTERVAL == 0:
+                kind, payload = "full", _pack(data)
+            else:
+                kind, payload = "delta", _pack(diff_data(self._get(recipe, rev - 1), data))
+            self._conn.execute(
+                "INSERT INTO revisions (recipe, rev, version, created, message, kind, sha, payload)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (recipe, rev, str(data.get("version", "")), time.time(), message, kind, sha, payload),
+            )
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        logger.debug("Stored %s rev %d (%s, %d bytes)", recipe, rev, kind, len(payload))
+        return rev
+
+    def _get(self, recipe: str, rev: int) -> Dict[str, Any]:
+        rows = self._conn.execute(
+            "SELECT rev, kind, payload FROM revisions WHERE recipe = ? AND rev <= ? AND rev >= ("
+            " SELECT MAX(rev) FROM revisions WHERE recipe = ? AND rev <= ? AND kind = 'full')"
+            " ORDER BY rev",
+            (recipe, rev, recipe, rev),
+        ).fetchall()
+        if not rows or rows[-1][0] != rev:
+            raise KeyError(f"Revision {rev} av '{recipe}' finns inte")
+        data = _unpack(rows[0][2])
+        for _, _, payload in rows[1:]:
+            data = apply_delta(data, _unpack(payload))
+        return data
+
+    def get(self, recipe: str, rev: int | None = None) -> Dict[str, Any]:
+        """
+        Returnerar receptdatan för en revision, senaste om `rev` saknas.
+        """
+        if rev is None:
+            rev = self.latest_rev(recipe)
+            if rev is None:
+                raise KeyError(f"Receptet '{recipe}' finns inte i revisionslagret")
+        return self._get(recipe, rev)
+
+    def revisions(self, recipe: str) -> list[RevisionInfo]:
+        return [RevisionInfo(*row) for row in self._conn.execute(
+            "SELECT recipe, rev, version, created, message, kind, LENGTH(payload) FROM revisions"
+            " WHERE recipe = ? ORDER BY rev", (recipe,))]
+
+    def recipes(self) -> list[str]:
+        return [row[0] for row in self._conn.execute("SELECT DISTINCT recipe FROM revisions ORDER BY recipe")]
+
+
+@dataclass
+class PlanDiff:
+    recipe: str
+    rev_a: int
+    rev_b: int
+    og_plato: tuple[float, float]
+    ibu: tuple[float, float]
+    final_ibu: tuple[float, float]
+    ebc: tuple[float, float]
+    total_grain_kg: tuple[float, float]
+    malts_kg: Dict[str, tuple[float, float]] = field(default_factory=dict)
+    hops_g: Dict[str, tuple[float, float]] = field(default_factory=dict)
+
+
+def _amounts(plan: RecipePlan) -> IngredientDemand:
+    demand = IngredientDemand()
+    demand.add_plan(plan)
+    return demand
+
+
+def _pairs(a: Dict[str, float], b: Dict[str, float]) -> Dict[str, tuple[float, float]]:
+    return {name: (a.get(name, 0.0), b.get(name, 0.0)) for name in sorted(set(a) | set(b))
+            if abs(a.get(name, 0.0) - b.get(name, 0.0)) > 1e-9}
+
+
+def plan_diff(store: RevisionStore, recipe: str, rev_a: int, rev_b: int, system,
+              cache: ResultCache | None = None) -> PlanDiff:
+    """
+    Planerar två revisioner (via resultatcachen) och jämför maltmängder,
+    humlegivor, OG, IBU (även efter torrhumling) och färg.
+    """
+    plan_a = cached_plan_recipe(store.get(recipe, rev_a), system, cache)
+    plan_b = cached_plan_recipe(store.get(recipe, rev_b), system, cache)
+    demand_a, demand_b = _amounts(plan_a), _amounts(plan_b)
+    return PlanDiff(
+        recipe=recipe,
+        rev_a=rev_a,
+        rev_b=rev_b,
+        og_plato=(float(plan_a.recipe["target_og_plato"]), float(plan_b.recipe["target_og_plato"])),
+        ibu=(float(plan_a.recipe.get("target_ibu", 0.0)), float(plan_b.recipe.get("target_ibu", 0.0))),
+        final_ibu=(plan_a.bitterness.final_ibu, plan_b.bitterness.final_ibu),
+        ebc=(plan_a.color["ebc"], plan_b.color["ebc"]),
+        total_grain_kg=(plan_a.total_grain_kg, plan_b.total_grain_kg),
+        malts_kg=_pairs(demand_a.malts_kg, demand_b.malts_kg),
+        hops_g=_pairs(demand_a.hops_g, demand_b.hops_g),
+    )
+
+
+def print_plan_diff(diff: PlanDiff):
+    table = Table(title=f"{diff.recipe}: rev {diff.rev_a} -> {diff.rev_b}", show_lines=True)
+    table.add_column("", style="bold")
+    table.add_column("Unit")
+    table.add_column(f"rev {diff.rev_a}", justify="right")
+    table.add_column(f"rev {diff.rev_b}", justify="right")
+    table.add_column("Change", justify="right")
+    rows = [("OG", "°P", diff.og_plato), ("IBU", "", diff.ibu), ("Final IBU", "", diff.final_ibu), ("EBC", "", diff.ebc), ("Grain", "kg", diff.total_grain_kg)]
+    rows += [(name, "kg", v) for name, v in diff.malts_kg.items()]
+    rows += [(name, "g", v) for name, v in diff.hops_g.items()]
+    for label, unit, (a, b) in rows:
+        change = b - a
+        table.add_row(label, unit, f"{a:.2f}", f"{b:.2f}", f"{change:+.2f}" if abs(change) > 1e-9 else "")
+    console.print(table)
+
+
+def _recipe_key(path: str) -> str:
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Brewcalc receptrevisioner", add_help=False, formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("-h", "--help", action="help", default=argparse.SUPPRESS, help="Visa hjälp")
+    parser.add_argument("--store", default=DEFAULT_STORE_PATH, help="Sökväg till revisionslagret")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    p_commit = commands.add_parser("commit", help="Spara receptfilen som ny revision")
+    p_commit.add_argument("recipe", help="Receptfil (YAML) under recipes/")
+    p_commit.add_argument("--message", "-m", default="", help="Kommentar till revisionen")
+
+    p_log = commands.add_parser("log", help="Lista revisioner för ett recept")
+    p_log.add_argument("recipe", help="Receptnamn (filnamn utan .yaml)")
+
+    p_show = commands.add_parser("show", help="Skriv ut en revision som YAML")
+    p_show.add_argument("recipe", help="Receptnamn (filnamn utan .yaml)")
+    p_show.add_argument("rev", type=int, nargs="?", help="Revision (default: senaste)")
+
+    p_diff = commands.add_parser("diff", help="Jämför planerna för två revisioner")
+    p_diff.add_argument("recipe", help="Receptnamn (filnamn utan .yaml)")
+    p_diff.add_argument("rev_a", type=int)
+    p_diff.add_argument("rev_b", type=int, nargs="?", help="Default: senaste")
+    p_diff.add_argument("--system", "-s", choices=list(sp.SYSTEM_PROFILES), default="Braumeister20Short", help="Systemprofil att använda")
+    p_diff.add_argument("--no_cache", action="store_true", help="Använd inte resultatcachen")
+    args = parser.parse_args()
+
+    with RevisionStore(args.store) as store:
+        try:
+            if args.command == "commit":
+                rev = store.commit(_recipe_key(args.recipe), RecipeLoader(args.recipe).data, args.message)
+                console.print(f"{_recipe_key(args.recipe)}: rev {rev}")
+            elif args.command == "log":
+                table = Table(title=args.recipe, show_lines=True)
+                for col in ("Rev", "Version", "Date", "Stored", "Message"):
+                    table.add_column(col)
+                for r in store.revisions(args.recipe):
+                    table.add_row(str(r.rev), r.version, time.strftime("%Y-%m-%d %H:%M", time.localtime(r.created)),
+                                  f"{r.kind}, {r.size} B", r.message)
+                console.print(table)
+            elif args.command == "show":
+                print(yaml.safe_dump(store.get(args.recipe, args.rev), allow_unicode=True, sort_keys=False), end="")
+            elif args.command == "diff":
+                cache = open_cache(args.no_cache)
+                rev_b = args.rev_b or store.latest_rev(args.recipe)
+                print_plan_diff(plan_diff(store, args.recipe, args.rev_a, rev_b,
+                                          sp.get_system_profile(args.system), cache))
+                if cache is not None:
+                    cache.close()
+        except KeyError as exc:
+            console.print(f"[red]{exc.args[0]}[/red]")
+            sys.exit(1)
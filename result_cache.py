@@ -0,0 +1,189 @@
+import hashlib
+import json
+import logging
+import os
+import pickle
+import sqlite3
+import sys
+import time
+from dataclasses import asdict
+from typing import Any, Dict
+
+from hops_db import HOPS_DB
+from malts_db import MALTS_DB
+from system_profile import PHYSICAL_CONSTANTS
+
+# Module logger
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = os.path.join(
+    os.environ.get("BREWCALC_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "brewcalc")),
+    "results.sqlite",
+)
+
+# Moduler vars källkod påverkar en plan. Ändras någon av dem blir gamla poster ogiltiga.
+CODE_MODULES = (
+    "planner", "gravity_calculator", "gravity_units", "bitterness_calculator", "boil_model", "color_calculator",
+    "mash_calculator", "mash_ph", "dry_hop", "system_profile", "malt", "volumes", "gravities",
+)
+
+_code_version: str | None = None
+
+
+def _hash(obj: Any) -> str:
+    return hashlib.sha256(json.dumps(obj, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def code_version() -> str:
+    global _code_version
+    if _code_version is None:
+        h = hashlib.sha256()
+        for name in CODE_MODULES:
+            module = sys.modules.get(name) or __import__(name)
+            with open(module.__file__, "rb") as f:
+                h.update(f.read())
+        _code_version = h.hexdigest()
+    return _code_version
+
+
+def catalog_version() -> str:
+    return _hash({"hops": HOPS_DB, "malts": MALTS_DB})
+
+
+def plan_key(recipe: Dict[str, Any], system: Any, **params: Any) -> str:
+    """
+    Nyckel för en plan: normaliserat recept, systemprofilens fält,
+    fysiska konstanter, katalogversion och kodversion.
+    """
+    return _hash({
+        "recipe": recipe,
+        "system": asdict(system),
+        "constants": asdict(PHYSICAL_CONSTANTS),
+        "params": params,
+        "catalog": catalog_version(),
+        "code": code_version(),
+    })
+
+
+class ResultCache:
+    """
+    Resultatcache på disk i SQLite. Flera processer kan läsa och skriva samtidigt
+    (WAL). Poster äldre än `max_age_days` tas bort och när cachen blir större än
+    `max_bytes` tas de minst nyligen använda bort först.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_bytes: int = 256 * 1024 * 1024,
+                 max_age_days: float = 30.0):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age_s = max_age_days * 24 * 3600
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30.0, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL,"
+            " created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS results_accessed ON results(accessed)")
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def get(self, key: str) -> Any | None:
+        row = self._conn.execute("SELECT value, created FROM results WHERE key = ?", (key,)).fetchone()
+        now = time.time()
+        if row is None or now - row[1] > self.max_age_s:
+            self.misses += 1
+            return None
+        self._conn.execute("UPDATE results SET accessed = ? WHERE key = ?", (now, key))
+        self.hits += 1
+        return pickle.loads(row[0])
+
+    def put(self, key: str, value: Any):
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        now = time.time()
+        self._conn.execute(
+            "INSERT OR REPLACE INTO results (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+            (key, blob, len(blob), now, now),
+        )
+
+    def evict(self) -> int:
+        """
+        Tar bort för gamla poster och sedan minst nyligen använda tills
+        cachen ryms i `max_bytes`. Returnerar antal borttagna poster.
+        """
+        removed = 0
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            removed += self._conn.execute("DELETE FROM results WHERE created < ?", (time.time() - self.max_age_s,)).rowcount
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+            if total > self.max_bytes:
+                to_free = total - self.max_bytes
+                keys = []
+                for key, size in self._conn.execute("SELECT key, size FROM results ORDER BY accessed"):
+                    if to_free <= 0:
+                        break
+                    keys.append((key,))
+                    to_free -= size
+                self._conn.executemany("DELETE FROM results WHERE key = ?", keys)
+                removed += len(keys)
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        if removed:
+            logger.debug("Evicted %d cached results", removed)
+        return removed
+
+    def clear(self):
+        self._conn.execute("DELETE FROM results")
+
+    def stats(self) -> Dict[str, Any]:
+        entries, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+        return {
+            "path": self.path,
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+def open_cache(disabled: bool = False, **kwargs: Any) -> ResultCache | None:
+    """
+    Öppnar resultatcachen. Går den inte att öppna (skrivskyddad katalog,
+    trasig databasfil) körs programmet vidare utan cache.
+    """
+    if disabled:
+        return None
+    try:
+        return ResultCache(**kwargs)
+    except (OSError, sqlite3.Error) as exc:
+        logger.warning("Result cache unavailable, continuing without it: %s", exc)
+        return None
+
+
+def cached_plan_recipe(recipe: Dict[str, Any], system: Any, cache: ResultCache | None, **kwargs: Any):
+    """
+    plan_recipe med cache. Utan cache planeras receptet som vanligt.
+    """
+    from planner import plan_recipe
+
+    if cache is None:
+        return plan_recipe(recipe, system, **kwargs)
+    key = plan_key(recipe, system, **kwargs)
+    plan = cache.get(key)
+    if plan is None:
+        plan = plan_recipe(recipe, system, **kwargs)
+        cache.put(key, plan)
+    return plan
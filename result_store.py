@@ -0,0 +1,355 @@
+import json
+import logging
+import argparse
+import mmap
+import os
+import sys
+from array import array
+from typing import Any, Callable, Dict, Iterable, Iterator
+
+from rich.console import Console
+from rich.table import Table
+
+from planner import RecipePlan
+
+# Module logger
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+SCHEMA_FILE = "schema.json"
+CHUNK_ROWS = 4096
+BLOCK_ROWS = 65536
+
+# Kolumntyper: array-typkod. Strängkolumner lagras som koder ("i") mot en ordlista i schemat.
+FLOAT, INT, STR = "float", "int", "str"
+_TYPECODES = {FLOAT: "d", INT: "i", STR: "i"}
+
+# Fasta kolumner. Ingredienser läggs till som "malt/<namn>" (kg), "hop/<namn>" och
+# "dry_hop/<namn>" (g) när de först dyker upp; äldre rader får 0.
+BASE_COLUMNS = {
+    "recipe": STR,
+    "system": STR,
+    "scenario": STR,
+    "batch_size_l": FLOAT,
+    "og_plato": FLOAT,
+    "pre_boil_l": FLOAT,
+    "post_boil_l": FLOAT,
+    "total_grain_kg": FLOAT,
+    "num_mashes": INT,
+    "ebc": FLOAT,
+    "ibu": FLOAT,
+    "final_ibu": FLOAT,
+}
+
+
+def plan_row(plan: RecipePlan, scenario: str = "", recipe: str | None = None) -> Dict[str, Any]:
+    """
+    En rad i resultatlagret för en plan. `recipe` är receptets nyckel
+    (t.ex. filnamnet), annars används receptets namn.
+    """
+    row: Dict[str, Any] = {
+        "recipe": recipe or plan.recipe.get("name", ""),
+        "system": plan.system.name,
+        "scenario": scenario,
+        "batch_size_l": float(plan.recipe["batch_size_l"]),
+        "og_plato": float(plan.recipe["target_og_plato"]),
+        "pre_boil_l": plan.volumes.pre_boil,
+        "post_boil_l": plan.volumes.post_boil,
+        "total_grain_kg": plan.total_grain_kg,
+        "num_mashes": plan.num_mashes,
+        "ebc": plan.color["ebc"],
+        "ibu": float(plan.recipe.get("target_ibu", 0)),
+        "final_ibu": plan.bitterness.final_ibu if plan.bitterness is not None else float(plan.recipe.get("target_ibu", 0)),
+    }
+    for m in plan.mash_grain_bill + plan.ferm_grain_bill:
+        key = f"malt/{m.name}"
+        row[key] = row.get(key, 0.0) + m.amount_kg
+    for h in plan.hops_additions:
+        key = f"hop/{h['name']}"
+        row[key] = row.get(key, 0.0) + h["weight"]
+    for h in plan.dry_hop_additions:
+        key = f"dry_hop/{h['name']}"
+        row[key] = row.get(key, 0.0) + h["weight"]
+    return row
+
+
+class ResultStore:
+    """
+    Kolumnbaserat lager för batchresultat i en katalog: en fil per kolumn
+    med värdena i följd (array-format) och schema.json med kolumner,
+    ordlistor för strängkolumner och antal rader.
+
+    Rader läggs till i block med `append`. Antalet rader i schemat är
+    commit-punkten: schemat skrivs sist, så ett avbrutet block syns inte
+    och skrivs över vid nästa append. Vid läsning mappas kolumnfilerna
+    med mmap och bara de kolumner en fråga använder läses.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._maps: Dict[str, memoryview] = {}
+        schema_path = os.path.join(path, SCHEMA_FILE)
+        if os.path.exists(schema_path):
+            with open(schema_path, "r", encoding="utf-8") as f:
+                schema = json.load(f)
+            if schema.get("version") != FORMAT_VERSION:
+                raise ValueError(f"Resultatlager {path} har version {schema.get('version')}, stöds: {FORMAT_VERSION}")
+            if schema["byteorder"] != sys.byteorder:
+                raise ValueError(f"Resultatlager {path} har byteordning {schema['byteorder']}")
+            self.rows: int = schema["rows"]
+            self.columns: Dict[str, Dict[str, Any]] = schema["columns"]
+        else:
+            self.rows = 0
+            self.columns = {}
+            for name, kind in BASE_COLUMNS.items():
+                self._add_column(name, kind)
+            self._write_schema()
+        self._codes = {name: {v: i for i, v in enumerate(c["values"])}
+                       for name, c in self.columns.items() if c["type"] == STR}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def close(self):
+        # Vyer som anroparen fortfarande håller kvar förblir giltiga;
+        # mappningen stängs när den sista släpps.
+        self._maps.clear()
+
+    # ---------------------------------------------------------
+    # Skrivning
+    # ---------------------------------------------------------
+
+    def _add_column(self, name: str, kind: str):
+        column = {"type": kind, "file": f"c{len(self.columns):05d}.col"}
+        if kind == STR:
+            # Kod 0 är "" så att nollutfyllda rader (tidigare block) betyder saknat värde
+            column["values"] = [""]
+        self.columns[name] = column
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, self.columns[name]["file"])
+
+    def _write_schema(self):
+        tmp = os.path.join(self.path, SCHEMA_FILE + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": FORMAT_VERSION, "byteorder": sys.byteorder,
+                       "rows": self.rows, "columns": self.columns}, f)
+        os.replace(tmp, os.path.join(self.path, SCHEMA_FILE))
+
+    def _encode(self, name: str, value: str) -> int:
+        codes = self._codes.setdefault(name, {"": 0})
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(codes)
+            self.columns[name]["values"].append(value)
+        return code
+
+    def append(self, rows: list[Dict[str, Any]]) -> int:
+        """
+        Lägger till ett block med rader. Nya ingredienskolumner skapas
+        och fylls med 0 för tidigare rader; saknade värden blir 0 ("" för strängar).
+        """
+        if not rows:
+            return 0
+        self.close()
+        for row in rows:
+            for name, value in row.items():
+                if name not in self.columns:
+                    self._add_column(name, STR if isinstance(value, str) else FLOAT)
+
+        for name, column in self.columns.items():
+            kind = column["type"]
+            if kind == STR:
+                values = array("i", (self._encode(name, row.get(name, "")) for row in rows))
+            else:
+                values = array(_TYPECODES[kind], (row.get(name, 0) for row in rows))
+            with open(self._file(name), "ab") as f:
+                # Kapar rester från ett avbrutet block; en ny kolumn fylls ut med nollor
+                f.truncate(self.rows * values.itemsize)
+                values.tofile(f)
+        self.rows += len(rows)
+        self._write_schema()
+        logger.debug("Appended %d rows to %s (%d total)", len(rows), self.path, self.rows)
+        return len(rows)
+
+    # ---------------------------------------------------------
+    # Läsning
+    # ---------------------------------------------------------
+
+    def column(self, name: str) -> memoryview:
+        """
+        Kolumnens värden som en memoryview över filen (strängkolumner som koder).
+        """
+        if name not in self.columns:
+            raise KeyError(f"Kolumnen '{name}' finns inte i {self.path}")
+        view = self._maps.get(name)
+        if view is not None:
+            return view
+        typecode = _TYPECODES[self.columns[name]["type"]]
+        if self.rows == 0:
+            return memoryview(array(typecode))
+        with open(self._file(name), "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        size = array(typecode).itemsize * self.rows
+        view = self._maps[name] = memoryview(mm)[:size].cast(typecode)
+        return view
+
+    def values(self, name: str) -> list[str]:
+        """
+        Ordlistan för en strängkolumn.
+        """
+        return self.columns[name]["values"]
+
+    def _predicate(self, name: str, cond: Any) -> Callable[[Any], bool]:
+        if name not in self.columns:
+            raise KeyError(f"Kolumnen '{name}' finns inte i {self.path}")
+        if self.columns[name]["type"] == STR:
+            wanted = [cond] if isinstance(cond, str) else list(cond)
+            codes = {self._codes[name][v] for v in wanted if v in self._codes[name]}
+            return codes.__contains__
+        if callable(cond):
+            return cond
+        if isinstance(cond, str):
+            cond = float(cond)
+        elif isinstance(cond, (set, frozenset, list)):
+            wanted = {float(v) for v in cond}
+            return wanted.__contains__
+        if isinstance(cond, tuple):
+            low, high = cond
+            low = float("-inf") if low is None else low
+            high = float("inf") if high is None else high
+            return lambda v: low <= v <= high
+        return lambda v: v == cond
+
+    def select(self, where: Dict[str, Any] | None = None) -> Iterator[int]:
+        """
+        Radnummer som uppfyller alla villkor, block för block. Ett villkor är
+        ett värde, ett intervall (låg, hög) där None är öppet, en mängd strängar
+        eller en funktion. Villkoren testas i tur och ordning på de rader som återstår.
+        """
+        predicates = [(self.column(name), self._predicate(name, cond)) for name, cond in (where or {}).items()]
+        for start in range(0, self.rows, BLOCK_ROWS):
+            stop = min(start + BLOCK_ROWS, self.rows)
+            if not predicates:
+                yield from range(start, stop)
+                continue
+            view, pred = predicates[0]
+            hits = [start + i for i, v in enumerate(view[start:stop].tolist()) if pred(v)]
+            for view, pred in predicates[1:]:
+                if not hits:
+                    break
+                hits = [i for i in hits if pred(view[i])]
+            yield from hits
+
+    def count(self, where: Dict[str, Any] | None = None) -> int:
+        return sum(1 for _ in self.select(where))
+
+    def query(self, where: Dict[str, Any] | None = None, columns: Iterable[str] | None = None,
+              limit: int | None = None) -> Iterator[Dict[str, Any]]:
+        """
+        Ger matchande rader som dictar med de valda kolumnerna (default: alla).
+        """
+        names = list(columns) if columns is not None else list(self.columns)
+        views = [(name, self.column(name), self.columns[name].get("values")) for name in names]
+        for n, i in enumerate(self.select(where)):
+            if limit is not None and n >= limit:
+                return
+            yield {name: values[view[i]] if values is not None else view[i] for name, view, values in views}
+
+
+class ResultWriter:
+    """
+    Samlar rader och skriver dem till lagret i block om `chunk_rows`.
+    """
+
+    def __init__(self, store: ResultStore, chunk_rows: int = CHUNK_ROWS):
+        self.store = store
+        self.chunk_rows = chunk_rows
+        self._pending: list[Dict[str, Any]] = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.flush()
+
+    def add(self, row: Dict[str, Any]):
+        self._pending.append(row)
+        if len(self._pending) >= self.chunk_rows:
+            self.flush()
+
+    def add_plan(self, plan: RecipePlan, scenario: str = "", recipe: str | None = None):
+        self.add(plan_row(plan, scenario, recipe))
+
+    def flush(self):
+        if self._pending:
+            self.store.append(self._pending)
+            self._pending = []
+
+
+def parse_condition(text: str) -> tuple[str, Any]:
+    """
+    Tolkar "kolumn=värde", "kolumn=låg:hög" (tom sida är öppen) eller "kolumn=a,b".
+    """
+    name, sep, value = text.partition("=")
+    if not sep:
+        raise ValueError(f"Ogiltigt villkor: {text} (väntade kolumn=värde)")
+    if ":" in value:
+        low, high = value.split(":", 1)
+        return name, (float(low) if low else None, float(high) if high else None)
+    if "," in value:
+        return name, set(value.split(","))
+    return name, value
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Brewcalc resultatlager", add_help=False, formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("-h", "--help", action="help", default=argparse.SUPPRESS, help="Visa hjälp")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    p_info = commands.add_parser("info", help="Visa kolumner och antal rader")
+    p_info.add_argument("store", help="Katalog med resultatlagret")
+
+    p_query = commands.add_parser("query", help="Filtrera rader")
+    p_query.add_argument("store", help="Katalog med resultatlagret")
+    p_query.add_argument("--where", "-w", action="append", default=[], help="Villkor, t.ex. og_plato=12:16 eller system=GrainfatherG30")
+    p_query.add_argument("--columns", "-c", default="recipe,system,scenario,og_plato,total_grain_kg,ebc,ibu", help="Kolumner att visa (kommaseparerade)")
+    p_query.add_argument("--limit", "-n", type=int, default=50, help="Max antal rader att visa")
+    p_query.add_argument("--count", action="store_true", help="Skriv bara ut antal matchande rader")
+    args = parser.parse_args()
+
+    console = Console()
+    try:
+        with ResultStore(args.store) as store:
+            if args.command == "info":
+                table = Table(title=f"{args.store}: {len(store)} row(s)", show_lines=False)
+                table.add_column("Column", style="bold")
+                table.add_column("Type")
+                table.add_column("Distinct", justify="right")
+                for name, column in store.columns.items():
+                    distinct = str(sum(1 for v in column["values"] if v)) if column["type"] == STR else ""
+                    table.add_row(name, column["type"], distinct)
+                console.print(table)
+            elif args.command == "query":
+                where = dict(parse_condition(c) for c in args.where)
+                if args.count:
+                    print(store.count(where))
+                else:
+                    names = args.columns.split(",")
+                    table = Table(show_lines=False)
+                    for name in names:
+                        table.add_column(name, justify="left" if store.columns.get(name, {}).get("type") == STR else "right")
+                    for row in store.query(where, names, args.limit):
+                        table.add_row(*(v if isinstance(v, str) else f"{v:.2f}" if isinstance(v, float) else str(v)
+                                        for v in row.values()))
+                    console.print(table)
+    except (ValueError, KeyError) as exc:
+        print(exc, file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,142 @@
+import logging
+import argparse
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Dict
+
+from rich.console import Console
+from rich.table import Table
+
+import system_profile as sp
+from system_profile import SystemProfile
+from recipe_loader import RecipeLoader
+from planner import RecipePlan, plan_recipe
+from plan_executor import PlanTask, plan_many
+
+# Module logger
+logger = logging.getLogger(__name__)
+
+console = Console()
+
+
+@dataclass
+class ScalingPoint:
+    """
+    Planens nyckeltal för en batchstorlek.
+    """
+    batch_size_l: float
+    total_grain_kg: float
+    mash_in_l: float
+    pre_boil_l: float
+    num_mashes: int
+    ebc: float
+    malts_kg: Dict[str, float] = field(default_factory=dict)
+    hops_g: Dict[str, float] = field(default_factory=dict)
+
+    def is_feasible(self, system: SystemProfile, max_mashes: int) -> bool:
+        return self.mash_in_l <= system.max_volume_l and self.num_mashes <= max_mashes
+
+
+def batch_sizes(min_l: float, max_l: float, step_l: float) -> list[float]:
+    if step_l <= 0 or max_l < min_l:
+        raise ValueError("Ogiltigt intervall för batchstorlek")
+    count = int(round((max_l - min_l) / step_l)) + 1
+    return [min_l + i * step_l for i in range(count)]
+
+
+def _point(plan: RecipePlan, batch_size_l: float) -> ScalingPoint:
+    # Samma ingrediens kan förekomma flera gånger (t.ex. två givor Magnum), summera som demand gör
+    malts_kg: Dict[str, float] = defaultdict(float)
+    for m in plan.mash_grain_bill + plan.ferm_grain_bill:
+        malts_kg[m.name] += m.amount_kg
+    hops_g: Dict[str, float] = defaultdict(float)
+    for h in plan.hops_additions + plan.dry_hop_additions:
+        hops_g[h["name"]] += h["weight"]
+    return ScalingPoint(
+        batch_size_l=batch_size_l,
+        total_grain_kg=plan.total_grain_kg,
+        mash_in_l=plan.volumes.get_total_pre_boil(),
+        pre_boil_l=plan.volumes.pre_boil,
+        num_mashes=plan.num_mashes,
+        ebc=plan.color["ebc"],
+        malts_kg=dict(malts_kg),
+        hops_g=dict(hops_g),
+    )
+
+
+def scale_point(recipe: Dict[str, Any], system: SystemProfile, batch_size_l: float) -> ScalingPoint:
+    return _point(plan_recipe(recipe, system, batch_size_l=batch_size_l), batch_size_l)
+
+
+def scaling_curve(recipe: Dict[str, Any], system: SystemProfile, sizes: list[float],
+                  workers: int | None = None) -> list[ScalingPoint]:
+    """
+    Planerar receptet för varje batchstorlek i `sizes`, i trådar när det lönar sig
+    (se plan_executor).
+    """
+    plans = plan_many([PlanTask(recipe, system, size) for size in sizes], workers)
+    return [_point(plan, size) for plan, size in zip(plans, sizes)]
+
+
+def max_feasible_batch(recipe: Dict[str, Any], system: SystemProfile, curve: list[ScalingPoint],
+                       max_mashes: int = 2, tolerance_l: float = 0.1) -> float | None:
+    """
+    Största batchstorlek som ryms i systemet (mäskvolym och antal mäskningar).
+    Kurvan ger ett intervall, sedan halveras intervallet ned till `tolerance_l`.
+    Returnerar None om inte ens minsta storleken ryms.
+    """
+    feasible = [p.is_feasible(system, max_mashes) for p in curve]
+    if not feasible or not feasible[0]:
+        return None
+    if all(feasible):
+        return curve[-1].batch_size_l
+
+    first_bad = feasible.index(False)
+    low, high = curve[first_bad - 1].batch_size_l, curve[first_bad].batch_size_l
+    while high - low > tolerance_l:
+        mid = (low + high) / 2
+        if scale_point(recipe, system, mid).is_feasible(system, max_mashes):
+            low = mid
+        else:
+            high = mid
+    return low
+
+
+def print_curve(curve: list[ScalingPoint], system_name: str):
+    table = Table(title=f"Scaling on {system_name}", show_lines=False)
+    table.add_column("Batch [L]", justify="right", style="bold")
+    table.add_column("Grain [kg]", justify="right")
+    table.add_column("Mash-in [L]", justify="right")
+    table.add_column("Pre-boil [L]", justify="right")
+    table.add_column("Mashes", justify="right")
+    table.add_column("Hops [g]", justify="right")
+    table.add_column("EBC", justify="right")
+    for p in curve:
+        table.add_row(f"{p.batch_size_l:.1f}", f"{p.total_grain_kg:.2f}", f"{p.mash_in_l:.1f}", f"{p.pre_boil_l:.1f}",
+                      str(p.num_mashes), f"{sum(p.hops_g.values()):.1f}", f"{p.ebc:.1f}")
+    console.print(table)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Brewcalc skalning av batchstorlek", add_help=False, formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("-h", "--help", action="help", default=argparse.SUPPRESS, help="Visa hjälp")
+    parser.add_argument("--recipe", "-r", required=True, help="Sökväg till receptfil (YAML) som ska användas")
+    parser.add_argument("--system", "-s", action="append", choices=list(sp.SYSTEM_PROFILES), help="Systemprofil, kan anges flera gånger (default: alla)")
+    parser.add_argument("--min", type=float, default=5.0, help="Minsta batchstorlek (L)")
+    parser.add_argument("--max", type=float, default=30.0, help="Största batchstorlek (L)")
+    parser.add_argument("--step", type=float, default=1.0, help="Steg (L)")
+    parser.add_argument("--max_mashes", type=int, default=2, help="Max antal mäskningar per bryggning")
+    parser.add_argument("--threads", type=int, help="Antal trådar (default: alla kärnor utan GIL, annars 1)")
+    args = parser.parse_args()
+
+    recipe = RecipeLoader(args.recipe).data
+    sizes = batch_sizes(args.min, args.max, args.step)
+    for system_name in args.system or list(sp.SYSTEM_PROFILES):
+        system = sp.get_system_profile(system_name)
+        curve = scaling_curve(recipe, system, sizes, args.threads)
+        print_curve(curve, system_name)
+        max_l = max_feasible_batch(recipe, system, curve, args.max_mashes)
+        if max_l is None:
+            console.print(f"{system_name}: no feasible batch size in range")
+        else:
+            console.print(f"{system_name}: max feasible batch {max_l:.1f} L")
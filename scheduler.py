@@ -0,0 +1,271 @@
+import logging
+import argparse
+import sys
+from dataclasses import dataclass, field
+from datetime import datetime, date, timedelta
+from typing import Any, Dict
+
+import yaml
+from rich.console import Console
+from rich.table import Table
+
+import system_profile as sp
+from recipe_loader import RecipeLoader
+from planner import plan_recipe
+from turbid_mash import get_mash_schedule
+
+# Module logger
+logger = logging.getLogger(__name__)
+
+console = Console()
+
+
+@dataclass
+class BrewDayConstants:
+    """
+    Tidsåtgång (min) för de delar av bryggdagen som inte beror på receptet.
+    """
+    setup_min: float = 30.0            # uppställning, värma mäskvatten
+    mash_time_min: float = 60.0        # mäsktid om receptet inte anger något
+    mash_overhead_min: float = 30.0    # uppvärmning och lakning per mäskning
+    heat_to_boil_min: float = 30.0
+    cooling_cleaning_min: float = 60.0
+    day_start_h: float = 7.0           # bryggningar startar tidigast
+    day_end_h: float = 22.0            # och ska vara klara senast
+
+
+@dataclass
+class Order:
+    recipe: str
+    volume_l: float
+    due: datetime
+
+
+@dataclass
+class ScheduledBrew:
+    order: Order
+    kettle: str
+    start: datetime
+    end: datetime
+    num_mashes: int
+
+    @property
+    def lateness_min(self) -> float:
+        return max(0.0, (self.end - self.order.due).total_seconds() / 60.0)
+
+
+@dataclass
+class Kettle:
+    name: str
+    system_name: str
+    free_at: datetime
+    brews: list[ScheduledBrew] = field(default_factory=list)
+
+
+def _to_datetime(value: Any) -> datetime:
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        # Bara datum: leverans vid dagens slut
+        return datetime(value.year, value.month, value.day, 23, 59)
+    return datetime.fromisoformat(str(value))
+
+
+def load_orders(path: str) -> list[Order]:
+    """
+    Läser ordrar från YAML:
+    orders:
+      - recipe: black_ipa.yaml
+        volume_l: 20
+        due: 2026-10-21T18:00
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        data = yaml.safe_load(f)
+    return [Order(o["recipe"], float(o["volume_l"]), _to_datetime(o["due"])) for o in data["orders"]]
+
+
+class DurationEstimator:
+    """
+    Uppskattar bryggtid (min) per recept, volym och system.
+    Planerna cachas så att samma recept bara planeras en gång per system och volym.
+    """
+
+    def __init__(self, constants: BrewDayConstants | None = None, turbid_mash: bool = False):
+        self.constants = constants or BrewDayConstants()
+        self.turbid_mash = turbid_mash
+        self._recipes: Dict[str, Dict[str, Any]] = {}
+        self._cache: Dict[tuple, tuple[float, int]] = {}
+
+    def _mash_time_min(self, recipe: Dict[str, Any], system) -> float:
+        if self.turbid_mash or recipe.get("mash_schedule"):
+            return get_mash_schedule(recipe.get("mash_schedule")).total_time_min
+        return float(recipe.get("mash_time_min", self.constants.mash_time_min))
+
+    def estimate(self, order: Order, system_name: str) -> tuple[float, int]:
+        """
+        Returnerar (tid i minuter, antal mäskningar).
+        """
+        key = (order.recipe, order.volume_l, system_name)
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+
+        recipe = self._recipes.get(order.recipe)
+        if recipe is None:
+            recipe = RecipeLoader(order.recipe).data
+            self._recipes[order.recipe] = recipe
+
+        system = sp.get_system_profile(system_name)
+        plan = plan_recipe(recipe, system, batch_size_l=order.volume_l)
+        c = self.constants
+        duration = (c.setup_min
+                    + plan.num_mashes * (self._mash_time_min(recipe, system) + c.mash_overhead_min)
+                    + c.heat_to_boil_min
+                    + float(recipe["boil_time_min"])
+                    + c.cooling_cleaning_min)
+        logger.debug("Estimated %s on %s: %.0f min, %d mashes", order.recipe, system_name, duration, plan.num_mashes)
+        self._cache[key] = (duration, plan.num_mashes)
+        return self._cache[key]
+
+
+class BrewScheduler:
+    """
+    Fördelar ordrar på kärl och tider under en bryggvecka.
+    - `schedule`: heuristik (tidigaste leveransdatum först, kärlet som blir klart först)
+    - `schedule_exact`: branch and bound som minimerar total försening, för få ordrar
+    """
+    MAX_EXACT_ORDERS = 6
+
+    def __init__(self, kettles: list[str], start: datetime, estimator: DurationEstimator | None = None):
+        if not kettles:
+            raise ValueError("Minst ett kärl måste anges")
+        self.kettle_systems = kettles
+        self.start = start
+        self.estimator = estimator or DurationEstimator()
+
+    def _kettles(self) -> list[Kettle]:
+        # Samma system kan finnas flera gånger, t.ex. två Braumeister20
+        kettles = []
+        for i, system_name in enumerate(self.kettle_systems):
+            name = system_name if self.kettle_systems.count(system_name) == 1 else f"{system_name}#{i + 1}"
+            kettles.append(Kettle(name, system_name, self.start))
+        return kettles
+
+    def _earliest_start(self, free_at: datetime, duration_min: float) -> datetime:
+        """
+        Första starttid efter `free_at` där bryggningen ryms inom en arbetsdag.
+        Bryggningar som är längre än en arbetsdag startar vid dagens början.
+        """
+        c = self.estimator.constants
+        day = datetime(free_at.year, free_at.month, free_at.day)
+        day_start = day + timedelta(hours=c.day_start_h)
+        day_end = day + timedelta(hours=c.day_end_h)
+        start = max(free_at, day_start)
+        if start + timedelta(minutes=duration_min) <= day_end:
+            return start
+        if start == day_start:
+            return start
+        return day_start + timedelta(days=1)
+
+    def _place(self, order: Order, kettle: Kettle) -> ScheduledBrew:
+        duration, num_mashes = self.estimator.estimate(order, kettle.system_name)
+        start = self._earliest_start(kettle.free_at, duration)
+        return ScheduledBrew(order, kettle.name, start, start + timedelta(minutes=duration), num_mashes)
+
+    def schedule(self, orders: list[Order]) -> list[ScheduledBrew]:
+        kettles = self._kettles()
+        result = []
+        for order in sorted(orders, key=lambda o: o.due):
+            best, best_kettle = None, None
+            for kettle in kettles:
+                brew = self._place(order, kettle)
+                if best is None or (brew.end, brew.lateness_min) < (best.end, best.lateness_min):
+                    best, best_kettle = brew, kettle
+            best_kettle.free_at = best.end
+            best_kettle.brews.append(best)
+            result.append(best)
+        return result
+
+    def schedule_exact(self, orders: list[Order]) -> list[ScheduledBrew]:
+        if len(orders) > self.MAX_EXACT_ORDERS:
+            raise ValueError(f"Exakt lösning stöds för högst {self.MAX_EXACT_ORDERS} ordrar, fick {len(orders)}")
+
+        best = self.schedule(orders)
+        best_cost = [self.total_lateness_min(best), max(b.end for b in best) if best else self.start]
+        kettles = self._kettles()
+        chosen: list[ScheduledBrew] = []
+
+        def search(remaining: list[Order], lateness: float, makespan: datetime):
+            nonlocal best
+            if not remaining:
+                if (lateness, makespan) < tuple(best_cost):
+                    best = list(chosen)
+                    best_cost[:] = [lateness, makespan]
+                return
+            for i, order in enumerate(remaining):
+                tried = set()
+                for kettle in kettles:
+                    # Likadana kärl som blir lediga samtidigt ger samma delträd
+                    if (kettle.system_name, kettle.free_at) in tried:
+                        continue
+                    tried.add((kettle.system_name, kettle.free_at))
+                    brew = self._place(order, kettle)
+                    cost = (lateness + brew.lateness_min, max(makespan, brew.end))
+                    # Både försening och makespan kan bara öka längre ned i trädet
+                    if cost >= tuple(best_cost):
+                        continue
+                    previous = kettle.free_at
+                    kettle.free_at = brew.end
+                    chosen.append(brew)
+                    search(remaining[:i] + remaining[i + 1:], *cost)
+                    chosen.pop()
+                    kettle.free_at = previous
+
+        search(list(orders), 0.0, self.start)
+        return sorted(best, key=lambda b: b.start)
+
+    @staticmethod
+    def total_lateness_min(brews: list[ScheduledBrew]) -> float:
+        return sum(b.lateness_min for b in brews)
+
+
+def print_schedule(brews: list[ScheduledBrew]):
+    table = Table(title="Brew schedule", show_lines=True)
+    table.add_column("Kettle", style="bold")
+    table.add_column("Recipe")
+    table.add_column("Volume", justify="right")
+    table.add_column("Mashes", justify="right")
+    table.add_column("Start")
+    table.add_column("End")
+    table.add_column("Due")
+    table.add_column("Late", justify="right")
+
+    for b in sorted(brews, key=lambda b: (b.kettle, b.start)):
+        late = f"{b.lateness_min:.0f} min" if b.lateness_min > 0 else ""
+        table.add_row(b.kettle, b.order.recipe, f"{b.order.volume_l:.1f} L", str(b.num_mashes),
+                      b.start.strftime("%a %Y-%m-%d %H:%M"), b.end.strftime("%H:%M"),
+                      b.order.due.strftime("%a %Y-%m-%d %H:%M"), late)
+    console.print(table)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Brewcalc produktionsplanering", add_help=False, formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("-h", "--help", action="help", default=argparse.SUPPRESS, help="Visa hjälp")
+    parser.add_argument("--orders", "-o", required=True, help="YAML-fil med ordrar (recipe, volume_l, due)")
+    parser.add_argument("--system", "-s", action="append", choices=list(sp.SYSTEM_PROFILES), help="Tillgängliga kärl, kan anges flera gånger (default: ett av varje)")
+    parser.add_argument("--start", help="Planeringens start (ISO-datum), default nu")
+    parser.add_argument("--turbid_mash", "-t", action="store_true", help="Använd mäskschemats tid även för recept utan mash_schedule (turbid)")
+    parser.add_argument("--exact", action="store_true", help=f"Exakt lösning (högst {BrewScheduler.MAX_EXACT_ORDERS} ordrar)")
+    args = parser.parse_args()
+
+    start = _to_datetime(args.start) if args.start else datetime.now().replace(second=0, microsecond=0)
+    scheduler = BrewScheduler(args.system or list(sp.SYSTEM_PROFILES), start, DurationEstimator(turbid_mash=args.turbid_mash))
+    orders = load_orders(args.orders)
+    try:
+        brews = scheduler.schedule_exact(orders) if args.exact else scheduler.schedule(orders)
+    except ValueError as exc:
+        parser.error(str(exc))
+
+    print_schedule(brews)
+    console.print(f"Total lateness: {BrewScheduler.total_lateness_min(brews):.0f} min")
+    sys.exit(0)
@@ -0,0 +1,309 @@
+import csv
+import json
+import logging
+import argparse
+import sys
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, TextIO
+
+from rich.console import Console
+from rich.table import Table
+
+import gravity_units
+from fermentation import FermentationSimulator
+from recipe_loader import RecipeLoader
+
+# Module logger
+logger = logging.getLogger(__name__)
+
+console = Console()
+
+DEFAULT_CHUNK_SIZE = 10_000
+DEFAULT_WINDOW = 12              # antal avläsningar i glidande medelvärde
+DEFAULT_STALL_HOURS = 24.0
+STALL_DROP_PLATO = 0.1           # minsta sänkning inom stall-fönstret för att räknas som aktiv
+TERMINAL_MARGIN_PLATO = 0.3      # så här nära förväntad FG räknas jäsningen som klar
+
+# Enhet -> funktion till Plato, tar listor. Brix under jäsning alkoholkorrigeras i to_plato.
+TO_PLATO = {
+    "plato": lambda values: values,
+    "sg": gravity_units.sg_to_plato,
+    "brix": gravity_units.brix_to_plato,
+}
+
+
+@dataclass
+class Reading:
+    fermentor: str
+    time_h: float          # timmar sedan epoch
+    gravity: float
+    unit: str
+    temp_c: float | None
+
+
+def _parse_time_h(value: Any) -> float:
+    if isinstance(value, (int, float)):
+        return float(value) / 3600.0
+    value = str(value).strip()
+    try:
+        return float(value) / 3600.0
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp() / 3600.0
+
+
+def _reading(row: Dict[str, Any]) -> Reading:
+    temp = row.get("temp_c")
+    return Reading(
+        fermentor=str(row["fermentor"]).strip(),
+        time_h=_parse_time_h(row["timestamp"]),
+        gravity=float(row["gravity"]),
+        unit=str(row.get("unit") or "sg").strip().lower(),
+        temp_c=float(temp) if temp not in (None, "") else None,
+    )
+
+
+def iter_readings(f: TextIO, fmt: str) -> Iterator[Reading]:
+    """
+    Läser avläsningar (fermentor, timestamp, gravity, unit, temp_c) rad för rad
+    från CSV med header eller JSONL. timestamp är ISO 8601 eller sekunder sedan epoch.
+    """
+    if fmt == "csv":
+        rows: Iterable[Dict[str, Any]] = csv.DictReader(line for line in f if not line.startswith("#"))
+    elif fmt == "jsonl":
+        rows = (json.loads(line) for line in f if line.strip())
+    else:
+        raise ValueError(f"Okänt format '{fmt}', giltiga: csv, jsonl")
+    for row in rows:
+        yield _reading(row)
+
+
+def _brix_to_plato(chunk: list[Reading], indices: list[int], og_brix: Dict[str, float]) -> list[float]:
+    """
+    Brix till Plato. Den högsta avläsningen hittills per jäskärl räknas som OG;
+    lägre avläsningar är tagna under jäsning och korrigeras för alkohol (Terrill).
+    Terrills polynom gäller inte nära OG, där den okorrigerade avläsningen är
+    lägre, så det minsta av de två värdena används.
+    """
+    og, final = [], []
+    for i in indices:
+        r = chunk[i]
+        og_brix[r.fermentor] = max(og_brix.get(r.fermentor, r.gravity), r.gravity)
+        og.append(og_brix[r.fermentor])
+        final.append(r.gravity)
+    plain = gravity_units.brix_to_plato(final)
+    corrected = gravity_units.sg_to_plato(gravity_units.corrected_fg(og, final))
+    return [p if f >= o else min(p, c) for p, c, o, f in zip(plain, corrected, og, final)]
+
+
+def to_plato(chunk: list[Reading], og_brix: Dict[str, float] | None = None) -> list[float]:
+    """
+    Konverterar en chunk till Plato, en listkonvertering per enhet.
+    `og_brix` håller högsta Brix per jäskärl mellan chunkar.
+    """
+    og_brix = {} if og_brix is None else og_brix
+    plato = [0.0] * len(chunk)
+    by_unit: Dict[str, list[int]] = {}
+    for i, r in enumerate(chunk):
+        by_unit.setdefault(r.unit, []).append(i)
+    for unit, indices in by_unit.items():
+        convert = TO_PLATO.get(unit)
+        if convert is None:
+            raise ValueError(f"Okänd enhet '{unit}', giltiga: {', '.join(TO_PLATO)}")
+        if unit == "brix":
+            values = _brix_to_plato(chunk, indices, og_brix)
+        else:
+            values = convert([chunk[i].gravity for i in indices])
+        for i, p in zip(indices, values):
+            plato[i] = p
+    return plato
+
+
+@dataclass
+class FermentorState:
+    """
+    Löpande tillstånd för ett jäskärl. Minnet är begränsat till `window` avläsningar.
+    """
+    name: str
+    window: int = DEFAULT_WINDOW
+    readings: int = 0
+    og_plato: float | None = None
+    smoothed_plato: float | None = None
+    temp_c: float | None = None
+    first_h: float | None = None
+    last_h: float | None = None
+    _values: deque = field(default_factory=deque)
+    _sum: float = 0.0
+    # Referenspunkt för stall-detektering: senaste gången gravityn föll STALL_DROP_PLATO
+    _ref_h: float | None = None
+    _ref_plato: float | None = None
+
+    def add(self, time_h: float, plato: float, temp_c: float | None):
+        if self.last_h is not None and time_h < self.last_h:
+            logger.warning("%s: reading out of order (%.2f h < %.2f h), skipped", self.name, time_h, self.last_h)
+            return
+        self.readings += 1
+        self._values.append(plato)
+        self._sum += plato
+        if len(self._values) > self.window:
+            self._sum -= self._values.popleft()
+        self.smoothed_plato = self._sum / len(self._values)
+        if temp_c is not None:
+            self.temp_c = temp_c
+
+        if self.first_h is None:
+            self.first_h = time_h
+        self.last_h = time_h
+        # OG är den högsta utjämnade gravityn, första avläsningarna kan vara före syresättning/omrörning
+        if self.og_plato is None or self.smoothed_plato > self.og_plato:
+            self.og_plato = self.smoothed_plato
+        if self._ref_plato is None or self.smoothed_plato <= self._ref_plato - STALL_DROP_PLATO:
+            self._ref_h = time_h
+            self._ref_plato = self.smoothed_plato
+
+    @property
+    def apparent_attenuation(self) -> float:
+        if not self.og_plato or self.smoothed_plato is None:
+            return 0.0
+        return (self.og_plato - self.smoothed_plato) / self.og_plato
+
+    @property
+    def hours(self) -> float:
+        return (self.last_h - self.first_h) if self.first_h is not None else 0.0
+
+    def is_plateau(self, stall_hours: float) -> bool:
+        """
+        Ingen sänkning på `stall_hours` timmar.
+        """
+        return self._ref_h is not None and self.last_h - self._ref_h >= stall_hours
+
+    def is_stalled(self, stall_hours: float, expected_fg_plato: float | None = None) -> bool:
+        """
+        Platå och fortfarande över förväntad FG. Utan förväntad FG går en
+        avstannad jäsning inte att skilja från en färdig, så då returneras False.
+        """
+        if expected_fg_plato is None or not self.is_plateau(stall_hours):
+            return False
+        return self.smoothed_plato > expected_fg_plato + TERMINAL_MARGIN_PLATO
+
+
+@dataclass
+class RecipeTarget:
+    name: str
+    target_og_plato: float
+    expected_fg_plato: float
+
+    @classmethod
+    def from_recipe(cls, recipe: Dict[str, Any]) -> "RecipeTarget":
+        og = float(recipe["target_og_plato"])
+        aa = FermentationSimulator.recipe_attenuation(recipe)
+        return cls(recipe["name"], og, og * (1.0 - aa))
+
+
+class SensorLogIngestor:
+    """
+    Läser sensorloggar chunkvis och uppdaterar ett tillstånd per jäskärl.
+    """
+
+    def __init__(self, window: int = DEFAULT_WINDOW, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.window = window
+        self.chunk_size = chunk_size
+        self.fermentors: Dict[str, FermentorState] = {}
+        self._og_brix: Dict[str, float] = {}
+
+    def ingest(self, readings: Iterable[Reading]) -> int:
+        total = 0
+        readings = iter(readings)
+        while True:
+            chunk = list(islice(readings, self.chunk_size))
+            if not chunk:
+                break
+            for r, plato in zip(chunk, to_plato(chunk, self._og_brix)):
+                state = self.fermentors.get(r.fermentor)
+                if state is None:
+                    state = FermentorState(r.fermentor, self.window)
+                    self.fermentors[r.fermentor] = state
+                state.add(r.time_h, plato, r.temp_c)
+            total += len(chunk)
+            logger.debug("Ingested %d readings", total)
+        return total
+
+
+def print_fermentors(ingestor: SensorLogIngestor, targets: Dict[str, RecipeTarget], stall_hours: float):
+    table = Table(title="Fermentors", show_lines=True)
+    table.add_column("Fermentor", style="bold")
+    table.add_column("Readings", justify="right")
+    table.add_column("Hours", justify="right")
+    table.add_column("OG", justify="right")
+    table.add_column("Now", justify="right")
+    table.add_column("AA", justify="right")
+    table.add_column("Temp", justify="right")
+    table.add_column("Recipe")
+    table.add_column("Target OG", justify="right")
+    table.add_column("Expected FG", justify="right")
+    table.add_column("Status")
+    for name in sorted(ingestor.fermentors):
+        s = ingestor.fermentors[name]
+        target = targets.get(name)
+        expected_fg = target.expected_fg_plato if target else None
+        if s.is_stalled(stall_hours, expected_fg):
+            status = "[red]stalled[/red]"
+        elif expected_fg is not None and s.smoothed_plato <= expected_fg + TERMINAL_MARGIN_PLATO:
+            status = "[green]terminal[/green]"
+        elif expected_fg is None and s.is_plateau(stall_hours):
+            status = "[yellow]plateau (no recipe)[/yellow]"
+        else:
+            status = "active"
+        row = [
+            name, str(s.readings), f"{s.hours:.1f}", f"{s.og_plato:.1f} °P", f"{s.smoothed_plato:.1f} °P",
+            f"{s.apparent_attenuation * 100:.0f} %", f"{s.temp_c:.1f} °C" if s.temp_c is not None else "-",
+        ]
+        if target:
+            diff = s.og_plato - target.target_og_plato
+            og = f"{target.target_og_plato:.1f} °P ({diff:+.1f})"
+            row += [target.name, og, f"{target.expected_fg_plato:.1f} °P", status]
+        else:
+            row += ["-", "-", "-", status]
+        table.add_row(*row)
+    console.print(table)
+
+
+def _format_for(path: str, fmt: str) -> str:
+    if fmt != "auto":
+        return fmt
+    return "jsonl" if path.endswith((".jsonl", ".ndjson")) else "csv"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Brewcalc sensorloggar från jäskärl", add_help=False, formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("-h", "--help", action="help", default=argparse.SUPPRESS, help="Visa hjälp")
+    parser.add_argument("logs", nargs="+", help="Loggfiler (CSV eller JSONL), '-' för stdin")
+    parser.add_argument("--format", choices=["auto", "csv", "jsonl"], default="auto", help="Filformat, auto väljer på filändelse")
+    parser.add_argument("--recipe", "-r", action="append", default=[], metavar="FERMENTOR=FILE", help="Koppla ett jäskärl till ett recept, kan anges flera gånger")
+    parser.add_argument("--window", type=int, default=DEFAULT_WINDOW, help="Antal avläsningar i glidande medelvärde")
+    parser.add_argument("--stall_hours", type=float, default=DEFAULT_STALL_HOURS, help="Timmar utan sänkning innan jäsningen räknas som avstannad")
+    parser.add_argument("--chunk_size", type=int, default=DEFAULT_CHUNK_SIZE, help="Antal avläsningar per chunk")
+    args = parser.parse_args()
+
+    targets = {}
+    for item in args.recipe:
+        fermentor, sep, path = item.partition("=")
+        if not sep:
+            parser.error(f"--recipe förväntar FERMENTOR=FILE: {item}")
+        targets[fermentor] = RecipeTarget.from_recipe(RecipeLoader(path).data)
+
+    ingestor = SensorLogIngestor(args.window, args.chunk_size)
+    for path in args.logs:
+        if path == "-":
+            count = ingestor.ingest(iter_readings(sys.stdin, "csv" if args.format == "auto" else args.format))
+        else:
+            with open(path, "r", encoding="utf-8", newline="") as f:
+                count = ingestor.ingest(iter_readings(f, _format_for(path, args.format)))
+        logger.info("Read %d readings from %s", count, path)
+
+    print_fermentors(ingestor, targets, args.stall_hours)
+    stalled = [n for n, s in ingestor.fermentors.items()
+               if s.is_stalled(args.stall_hours, targets[n].expected_fg_plato if n in targets else None)]
+    sys.exit(1 if stalled else 0)
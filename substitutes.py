@@ -0,0 +1,198 @@
+import heapq
+import logging
+import argparse
+import math
+import copy
+from dataclasses import dataclass
+from typing import Any, Dict
+
+from rich.console import Console
+from rich.table import Table
+
+import system_profile as sp
+from hops_db import HOPS_DB, get_hop
+from malts_db import MALTS_DB, get_malt
+from recipe_loader import RecipeLoader
+from planner import plan_recipe
+
+# Module logger
+logger = logging.getLogger(__name__)
+
+console = Console()
+
+# Attribut och skala (en enhet i skalan räknas som avstånd 1.0)
+HOP_ATTRIBUTES: Dict[str, float] = {
+    "alpha_acid": 0.01,
+}
+MALT_ATTRIBUTES: Dict[str, float] = {
+    "extract_percent": 0.02,
+    "log_color_ebc": 0.25,   # färg jämförs logaritmiskt, 3 och 6 EBC skiljer mer än 1100 och 1150
+}
+
+
+@dataclass
+class _Node:
+    point: tuple[float, ...]
+    name: str
+    axis: int
+    left: "_Node | None"
+    right: "_Node | None"
+
+
+class KDTree:
+    """
+    Enkelt KD-träd för närmaste-granne-sökning över numeriska attribut.
+    """
+
+    def __init__(self, items: list[tuple[str, tuple[float, ...]]]):
+        self.size = len(items)
+        self.root = self._build(list(items), 0)
+
+    def _build(self, items: list[tuple[str, tuple[float, ...]]], depth: int) -> _Node | None:
+        if not items:
+            return None
+        axis = depth % len(items[0][1])
+        items.sort(key=lambda item: item[1][axis])
+        mid = len(items) // 2
+        name, point = items[mid]
+        return _Node(point, name, axis, self._build(items[:mid], depth + 1), self._build(items[mid + 1:], depth + 1))
+
+    def nearest(self, point: tuple[float, ...], k: int, exclude: set[str] | None = None) -> list[tuple[str, float]]:
+        """
+        Returnerar de k närmaste (namn, avstånd), närmast först.
+        """
+        exclude = exclude or set()
+        heap: list[tuple[float, str]] = []  # max-heap via negativt avstånd
+
+        def visit(node: _Node | None):
+            if node is None:
+                return
+            if node.name not in exclude:
+                dist = math.dist(point, node.point)
+                if len(heap) < k:
+                    heapq.heappush(heap, (-dist, node.name))
+                elif dist < -heap[0][0]:
+                    heapq.heapreplace(heap, (-dist, node.name))
+            diff = point[node.axis] - node.point[node.axis]
+            near, far = (node.left, node.right) if diff < 0 else (node.right, node.left)
+            visit(near)
+            if len(heap) < k or abs(diff) < -heap[0][0]:
+                visit(far)
+
+        visit(self.root)
+        return [(name, -neg) for neg, name in sorted(heap, reverse=True)]
+
+
+def _hop_point(info: Dict[str, Any]) -> tuple[float, ...]:
+    return tuple(float(info.get(attr, 0.0)) / scale for attr, scale in HOP_ATTRIBUTES.items())
+
+
+def _malt_point(info: Dict[str, Any]) -> tuple[float, ...]:
+    values = dict(info, log_color_ebc=math.log1p(info["color_ebc"]))
+    return tuple(float(values.get(attr, 0.0)) / scale for attr, scale in MALT_ATTRIBUTES.items())
+
+
+class SubstitutionIndex:
+    """
+    Index över humle- och maltkatalogen för att hitta ersättare.
+    """
+
+    def __init__(self, hops: Dict[str, Dict] | None = None, malts: Dict[str, Dict] | None = None):
+        self.hops = HOPS_DB if hops is None else hops
+        self.malts = MALTS_DB if malts is None else malts
+        self.hop_tree = KDTree([(name, _hop_point(info)) for name, info in self.hops.items()])
+        self.malt_tree = KDTree([(name, _malt_point(info)) for name, info in self.malts.items()])
+
+    def nearest_hops(self, name: str, k: int = 3) -> list[tuple[str, float]]:
+        info = self.hops.get(name) or get_hop(name)
+        return self.hop_tree.nearest(_hop_point(info), k, exclude={name})
+
+    def nearest_malts(self, name: str, k: int = 3) -> list[tuple[str, float]]:
+        info = self.malts.get(name) or get_malt(name)
+        return self.malt_tree.nearest(_malt_point(info), k, exclude={name})
+
+
+def substitute_hop(recipe: Dict[str, Any], old: str, new: str) -> Dict[str, Any]:
+    """
+    Byter humlesort i receptet. Vikterna räknas om av planeringen
+    utifrån receptets IBU-andelar, så target_ibu hålls.
+    """
+    recipe = copy.deepcopy(recipe)
+    for key in ("boil_hops", "dry_hops"):
+        for hop in recipe.get(key) or []:
+            if hop["name"] == old:
+                hop["name"] = new
+    return recipe
+
+
+def substitute_malt(recipe: Dict[str, Any], old: str, new: str, malts: Dict[str, Dict] | None = None) -> Dict[str, Any]:
+    """
+    Byter maltsort i receptet och justerar andelen så att färgbidraget (andel * EBC)
+    blir detsamma. Skillnaden i andel tas från/läggs på receptets största malt.
+    """
+    malts = MALTS_DB if malts is None else malts
+    old_ebc = malts[old]["color_ebc"] if old in malts else get_malt(old)["color_ebc"]
+    new_ebc = malts[new]["color_ebc"] if new in malts else get_malt(new)["color_ebc"]
+
+    recipe = copy.deepcopy(recipe)
+    for key in ("mash_fermentables", "fermentor_fermentables"):
+        fermentables = recipe.get(key) or []
+        for f in fermentables:
+            if f["name"] != old:
+                continue
+            old_percent = f["percent"]
+            new_percent = old_percent * old_ebc / new_ebc if new_ebc > 0 else old_percent
+            base = max((b for b in fermentables if b is not f), key=lambda b: b["percent"], default=None)
+            if base is None or base["percent"] + old_percent - new_percent < 0:
+                new_percent = old_percent
+            else:
+                base["percent"] += old_percent - new_percent
+            f["name"] = new
+            f["percent"] = new_percent
+    return recipe
+
+
+def print_substitutes(title: str, candidates: list[tuple[str, float, Dict[str, Any]]]):
+    table = Table(title=title, show_lines=True)
+    table.add_column("Substitute", style="bold")
+    table.add_column("Distance", justify="right")
+    table.add_column("Grain [kg]", justify="right")
+    table.add_column("Hops [g]", justify="right")
+    table.add_column("EBC", justify="right")
+    for name, dist, result in candidates:
+        table.add_row(name, f"{dist:.2f}", f"{result['total_grain_kg']:.2f}", f"{result['hops_g']:.1f}", f"{result['ebc']:.1f}")
+    console.print(table)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Brewcalc ersättare för humle och malt", add_help=False, formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("-h", "--help", action="help", default=argparse.SUPPRESS, help="Visa hjälp")
+    parser.add_argument("--recipe", "-r", required=True, help="Sökväg till receptfil (YAML) som ska användas")
+    parser.add_argument("--system", "-s", choices=list(sp.SYSTEM_PROFILES), default="Braumeister20Short", help="Systemprofil att använda")
+    parser.add_argument("--hop", help="Humlesort som saknas")
+    parser.add_argument("--malt", help="Maltsort som saknas")
+    parser.add_argument("-k", type=int, default=3, help="Antal förslag")
+    args = parser.parse_args()
+
+    if not args.hop and not args.malt:
+        parser.error("Ange --hop eller --malt")
+
+    recipe = RecipeLoader(args.recipe).data
+    system = sp.get_system_profile(args.system)
+    index = SubstitutionIndex()
+
+    def summarize(r: Dict[str, Any]) -> Dict[str, float]:
+        plan = plan_recipe(r, system)
+        return {"total_grain_kg": plan.total_grain_kg, "hops_g": sum(h["weight"] for h in plan.hops_additions), "ebc": plan.color["ebc"]}
+
+    original = summarize(recipe)
+    if args.hop:
+        rows = [("(original)", 0.0, original)]
+        for name, dist in index.nearest_hops(args.hop, args.k):
+            rows.append((name, dist, summarize(substitute_hop(recipe, args.hop, name))))
+        print_substitutes(f"Substitutes for {args.hop}", rows)
+    if args.malt:
+        rows = [("(original)", 0.0, original)]
+        for name, dist in index.nearest_malts(args.malt, args.k):
+            rows.append((name, dist, summarize(substitute_malt(recipe, args.malt, name))))
+        print_substitutes(f"Substitutes for {args.malt}", rows)
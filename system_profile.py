@@ -1,97 +1,163 @@
-from dataclasses import dataclass
+import logging
+import math
+import os
+from dataclasses import MISSING, dataclass, field, fields
 
+import yaml
 
-@dataclass
-class Braumeister20:
+# Module logger
+logger = logging.getLogger(__name__)
+
+DEFAULT_REGISTRY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "systems.yaml")
+
+
+@dataclass(frozen=True, slots=True)
+class PhysicalConstants:
+    """
+    Fysiska konstanter som kan återanvändas i olika moduler.
+    """
+    # Modulkonstant: volym (L) absorberad per kg malt
+    grain_obsortion_l_kg: float = 0.8
+    minutes_per_h: float = 60.0
+    mash_efficiency: float = 0.72
+    boiler_diameter_mm: float = 386          # diameter på kokkärl
+    system_weight_kg: float = 14.6           # vikt på systemet (kg), används för att beräkna energibehov
+
+
+# Delad instans, använd denna i stället för att skapa PhysicalConstants() i inre loopar
+PHYSICAL_CONSTANTS = PhysicalConstants()
+
+
+@dataclass(frozen=True, slots=True)
+class SystemProfile:
     """
-    Systemprofil för Braumeister 20L med kort maltpipa.
-    Alla värden är empiriska / typiska och kan justeras.
+    Systemprofil för ett bryggverk, laddas från registret (systems.yaml).
+    Profilen är fryst; härledda värden räknas ut en gång när den skapas.
     """
-    min_mash_volume_l: float = 10.0       # praktisk minsta vätskemängd i kärlet
-    max_grain_per_mash_kg: float = 5.0    # max malt i kort maltpipa
-    boil_off_l_per_hour: float = 3.0      # kokförlust per timme
-    trub_loss_l: float = 1.2              # kon + humle + dödutrymme
-    mash_efficiency: float = 0.8
-    boiler_diameter_mm: float = 348          # diameter på kokkärl
-    system_weight_kg: float = 15.0                # vikt på systemet (kg), används för att beräkna energibehov
+    name: str
+    min_mash_volume_l: float          # praktisk minsta vätskemängd i kärlet
+    max_grain_per_mash_kg: float      # max malt i maltpipan
+    boil_off_l_per_hour: float        # kokförlust per timme
+    trub_loss_l: float                # kon + humle + dödutrymme
+    mash_efficiency: float
+    boiler_diameter_mm: float         # diameter på kokkärl
+    system_weight_kg: float           # vikt på systemet (kg), används för att beräkna energibehov
+    max_volume_l: float               # max vätskemängd i kärlet vid mäskning
+    cooling_tau_min: float            # tidskonstant för fri avsvalning efter kok (humlevila)
+    chiller_tau_min: float            # tidskonstant med kylspiral
+    description: str = ""
+
+    # Härledda värden
+    area_mm2: float = field(init=False)
+    mm_per_l: float = field(init=False)
+    absorption_l_per_kg: float = field(init=False)
+
+    def __post_init__(self):
+        radius_mm = self.boiler_diameter_mm / 2
+        area_mm2 = 3.1416 * (radius_mm ** 2)
+        object.__setattr__(self, "area_mm2", area_mm2)
+        object.__setattr__(self, "mm_per_l", 1_000_000 / area_mm2)  # 1 liter = 1 000 000 mm³
+        object.__setattr__(self, "absorption_l_per_kg", PHYSICAL_CONSTANTS.grain_obsortion_l_kg)
 
     def get_volume_in_mm(self, volume_l: float) -> float:
         """
-        Returnerar höjd i mm per liter vätska i kokkärlet.
+        Returnerar höjd i mm för en volym vätska i kokkärlet.
         Används för att beräkna vätskestånd vid mäskning och kok.
         """
-        radius_mm = self.boiler_diameter_mm / 2
-        area_mm2 = 3.1416 * (radius_mm ** 2)
-        mm_per_liter = 1_000_000 / area_mm2  # 1 liter = 1 000 000 mm³
-
-        return mm_per_liter * volume_l
+        return self.mm_per_l * volume_l
 
-
-    def get_volume_l(self, into_mm: int) -> float:
+    def get_volume_l(self, into_mm: float) -> float:
         """
         Returnerar volym i liter baserat på höjd i mm i kokkärlet.
         """
-        radius_mm = self.boiler_diameter_mm / 2
-        area_mm2 = 3.1416 * (radius_mm ** 2)
-        volume_mm3 = area_mm2 * into_mm
-        volume_l = volume_mm3 / 1_000_000  # 1 liter = 1 000 000 mm³
-        return volume_l
+        return self.area_mm2 * into_mm / 1_000_000
 
     def get_num_mashes(self, total_grain_kg: float) -> int:
         """
         Returnerar antal mashar baserat på maltmängd och max malt per mash.
         """
-        from math import ceil
-        return ceil(total_grain_kg / self.max_grain_per_mash_kg)
-
-
-@dataclass
-class Braumeister20Short(Braumeister20):
+        return math.ceil(total_grain_kg / self.max_grain_per_mash_kg)
+
+
+# Fält som anges i registret (allt utom namn och härledda värden)
+_PROFILE_FIELDS = {f.name: f for f in fields(SystemProfile) if f.init and f.name != "name"}
+# Geometri, kapacitet, verkningsgrad och tidskonstanter måste vara > 0 (de delas med
+# eller skalar allt annat); förluster och övriga fält får vara 0.
+_POSITIVE_FIELDS = frozenset({
+    "max_grain_per_mash_kg", "mash_efficiency", "boiler_diameter_mm", "max_volume_l",
+    "cooling_tau_min", "chiller_tau_min",
+})
+
+
+def _resolve(name: str, raw: dict, resolved: dict, stack: tuple = ()) -> dict:
+    if name in resolved:
+        return resolved[name]
+    if name in stack:
+        raise ValueError(f"Systemprofil '{name}' ärver från sig själv ({' -> '.join(stack + (name,))})")
+    if name not in raw:
+        raise ValueError(f"Systemprofil '{stack[-1]}' ärver från '{name}' som inte finns")
+    entry = dict(raw[name] or {})
+    parent = entry.pop("inherits", None)
+    values = dict(_resolve(parent, raw, resolved, stack + (name,))) if parent else {}
+    values.pop("description", None)
+    values.update(entry)
+    resolved[name] = values
+    return values
+
+
+def _build_profile(name: str, values: dict) -> SystemProfile:
+    unknown = set(values) - set(_PROFILE_FIELDS)
+    if unknown:
+        raise ValueError(f"Systemprofil '{name}': okända fält {', '.join(sorted(unknown))}")
+    missing = [f for f, spec in _PROFILE_FIELDS.items() if spec.default is MISSING and f not in values]
+    if missing:
+        raise ValueError(f"Systemprofil '{name}': saknar {', '.join(missing)}")
+    kwargs = {}
+    for key, value in values.items():
+        if key == "description":
+            kwargs[key] = str(value)
+            continue
+        try:
+            kwargs[key] = float(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"Systemprofil '{name}': {key} måste vara ett tal, fick {value!r}") from None
+        if key in _POSITIVE_FIELDS and kwargs[key] <= 0:
+            raise ValueError(f"Systemprofil '{name}': {key} måste vara större än 0")
+        if kwargs[key] < 0:
+            raise ValueError(f"Systemprofil '{name}': {key} får inte vara negativt")
+    return SystemProfile(name=name, **kwargs)
+
+
+def load_registry(*paths: str) -> dict[str, SystemProfile]:
     """
-    Systemprofil för Braumeister 20L med normal (stor) maltpipa.
-    Samma fält som `Braumeister20Short` men med högre `max_grain_per_mash_kg`.
+    Läser och validerar systemprofiler från en eller flera YAML/JSON-filer.
+    Senare filer kan lägga till profiler, skriva över eller ärva från tidigare.
     """
-    # Ärver fält och metoder från Braumeister20Short, bara överskriv max_grain_per_mash_kg
-    max_grain_per_mash_kg: float = 2.6
+    raw: dict = {}
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            data = yaml.safe_load(f) or {}
+        raw.update(data.get("systems") or {})
+    resolved: dict = {}
+    profiles = {name: _build_profile(name, _resolve(name, raw, resolved)) for name in raw}
+    logger.debug("Loaded %d system profiles from %s", len(profiles), ", ".join(paths))
+    return profiles
 
 
-@dataclass
-class GrainfatherG30(Braumeister20):
-    """
-    Systemprofil för Braumeister 20L med normal (stor) maltpipa.
-    Samma fält som `Braumeister20Short` men med högre `max_grain_per_mash_kg`.
-    """
-    # Ärver fält och metoder från Braumeister20Short, bara överskriv max_grain_per_mash_kg
-    max_grain_per_mash_kg: float = 5.0
-    boil_off_l_per_hour: float = 2.0      # kokförlust per timme
-    trub_loss_l: float = 0.8
+def _registry_paths() -> list[str]:
+    paths = [DEFAULT_REGISTRY_PATH]
+    extra = os.environ.get("BREWCALC_SYSTEMS")
+    if extra:
+        paths += [p for p in extra.split(os.pathsep) if p]
+    return paths
 
 
-SYSTEM_PROFILES = {
-    "Braumeister20": Braumeister20,
-    "Braumeister20Short": Braumeister20Short,
-    "GrainfatherG30": GrainfatherG30,
-}
+SYSTEM_PROFILES: dict[str, SystemProfile] = load_registry(*_registry_paths())
 
 
-def get_system_profile(name: str):
-    """Returnerar en instans av systemprofil baserat på namn."""
+def get_system_profile(name: str) -> SystemProfile:
+    """Returnerar systemprofil baserat på namn."""
     try:
-        return SYSTEM_PROFILES[name]()
+        return SYSTEM_PROFILES[name]
     except KeyError as exc:
         raise ValueError(f"Systemprofil '{name}' finns inte") from exc
-
-
-@dataclass
-class PhysicalConstants:
-    """
-    Fysiska konstanter som kan återanvändas i olika moduler.
-    """
-    # Modulkonstant: volym (L) absorberad per kg malt
-    grain_obsortion_l_kg: float = 0.8
-    minutes_per_h: float = 60.0
-    mash_efficiency: float = 0.72
-    boiler_diameter_mm: float = 386          # diameter på kokkärl
-    system_weight_kg: float = 14.6           # vikt på systemet (kg), används för att beräkna energibehov
-
-
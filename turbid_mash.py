@@ -1,17 +1,22 @@
 
-from system_profile import Braumeister20Short, PhysicalConstants
+import os
+from functools import lru_cache
+from system_profile import SystemProfile
 from dataclasses import dataclass
 from pydantic import TypeAdapter
 import yaml
 
+DEFAULT_LIBRARY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mash_schedules.yaml")
+DEFAULT_SCHEDULE = "turbid"
+
 @dataclass(frozen=True)
 class TurbidStep:
     target_temp_c: float
     time_min: float
-    percent_water: float  # Procent av total vattenmängd som tillsätts i detta steg
+    percent_water: float  # Procent av total vattenmängd som tillsätts i detta steg, 0 = bara uppvärmning
 
 class TurbidMashStep(TurbidStep):
-    water_l: float = 0.0     
+    water_l: float = 0.0
     water_temp_c: float = 0.0
 
     def __init__(self, target_temp_c: float, time_min: float, water_temp_c: float, water_l: float):
@@ -19,53 +24,129 @@ class TurbidMashStep(TurbidStep):
         self.water_l = water_l
         self.water_temp_c = water_temp_c
 
+
+_STEPS_ADAPTER = TypeAdapter(list[TurbidStep])
+
+
+@dataclass(frozen=True, slots=True)
+class MashSchedule:
+    """
+    Ett validerat mäskschema. Stegen lagras också som tupler per fält
+    så att beräkningen inte behöver slå upp attribut per steg.
+    """
+    name: str
+    description: str
+    steps: tuple[TurbidStep, ...]
+    target_temps_c: tuple[float, ...]
+    times_min: tuple[float, ...]
+    fractions: tuple[float, ...]      # percent_water / 100
+    total_time_min: float
+
+    @classmethod
+    def compile(cls, name: str, description: str, steps: list[TurbidStep]) -> "MashSchedule":
+        if not steps:
+            raise ValueError(f"Mäskschema '{name}' saknar steg")
+        return cls(
+            name=name,
+            description=description,
+            steps=tuple(steps),
+            target_temps_c=tuple(s.target_temp_c for s in steps),
+            times_min=tuple(s.time_min for s in steps),
+            fractions=tuple(s.percent_water / 100.0 for s in steps),
+            total_time_min=sum(s.time_min for s in steps),
+        )
+
+
+def load_schedules(*paths: str) -> dict[str, MashSchedule]:
+    """
+    Läser och validerar mäskscheman från en eller flera YAML-filer.
+    Senare filer kan lägga till eller skriva över scheman.
+    """
+    schedules = {}
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            data = yaml.safe_load(f) or {}
+        for name, entry in (data.get("schedules") or {}).items():
+            steps = _STEPS_ADAPTER.validate_python(entry["steps"])
+            schedules[name] = MashSchedule.compile(name, entry.get("description", ""), steps)
+    return schedules
+
+
+@lru_cache(maxsize=None)
+def schedule_library() -> dict[str, MashSchedule]:
+    """
+    Alla mäskscheman, lästa en gång per process. Filen hittas relativt
+    modulen; extra bibliotek anges med BREWCALC_MASH_SCHEDULES.
+    """
+    paths = [DEFAULT_LIBRARY_PATH]
+    extra = os.environ.get("BREWCALC_MASH_SCHEDULES")
+    if extra:
+        paths += [p for p in extra.split(os.pathsep) if p]
+    return load_schedules(*paths)
+
+
+def get_mash_schedule(name: str | None = None) -> MashSchedule:
+    name = name or DEFAULT_SCHEDULE
+    try:
+        return schedule_library()[name]
+    except KeyError:
+        raise ValueError(f"Mäskschema saknas i biblioteket: {name}") from None
+
+
 class TurbidMashCalculator:
     WATER_SPECIFIC_HEAT = 4.18
     MALT_SPECIFIC_HEAT = 1.7
     STAINLESS_HEAT = 0.5
 
-    def __init__(self, system: Braumeister20Short):
+    def __init__(self, system: SystemProfile, schedule: str | None = None):
         self.sys = system
+        self.schedule = get_mash_schedule(schedule)
+        self.steps: tuple[TurbidStep, ...] = self.schedule.steps
+
+    def calculate(self, total_grain_kg, mash_in_l, ambient_temp_c) -> list[TurbidMashStep]:
+        return self.calculate_batch([total_grain_kg], [mash_in_l], ambient_temp_c)[0]
 
-        # Läs YAML-filen
-        with open("turbid_steps.yaml", "r", encoding="utf-8") as f:
-            data = yaml.safe_load(f)
+    def calculate_batch(self, grain_kgs: list[float], mash_in_ls: list[float],
+                        ambient_temp_c: float) -> list[list[TurbidMashStep]]:
+        """
+        Räknar schemat för många (maltmängd, mäskvolym) på en gång.
+        Värmekapaciteten för systemet är densamma för alla.
+        """
+        schedule = self.schedule
+        steps = tuple(zip(schedule.target_temps_c, schedule.times_min, schedule.fractions))
+        water_heat = self.WATER_SPECIFIC_HEAT
+        malt_heat = self.MALT_SPECIFIC_HEAT
+        system_heat = self.sys.system_weight_kg * self.STAINLESS_HEAT
 
-        # Bygg list[TurbidStep] automatiskt
-        adapter = TypeAdapter(list[TurbidStep])
-        steps = adapter.validate_python(data["steps"])
-        self.steps: list[TurbidStep] = steps
+        results = []
+        for total_grain_kg, mash_in_l in zip(grain_kgs, mash_in_ls):
+            inital_temp_c = ambient_temp_c
+            total_water_l = 0.0
+            grain_heat = total_grain_kg * malt_heat
+            result = []
+            for target_temp_c, time_min, fraction in steps:
+                if fraction < 0:
+                    # When removing water use current mash vloume and not total mash_in volume
+                    water_to_add_l = fraction * total_water_l
+                    water_temp_needed = target_temp_c
+                elif fraction == 0:
+                    # Heat-only step: the mash is heated directly, no infusion
+                    water_to_add_l = 0.0
+                    water_temp_needed = target_temp_c
+                    inital_temp_c = target_temp_c
+                else:
+                    # When adding water, use the total mash_in_l
+                    water_to_add_l = fraction * mash_in_l
+                    temp_diff_c = target_temp_c - inital_temp_c
+                    inital_temp_c = target_temp_c
+                    energy_needed_malt_kj = temp_diff_c * (grain_heat + total_water_l * water_heat + system_heat)
+                    water_temp_needed = (energy_needed_malt_kj / (water_to_add_l * water_heat)) + inital_temp_c
+                total_water_l = water_to_add_l + total_water_l
 
-    def calculate(self, total_grain_kg, mash_in_l, ambient_temp_c) -> list[TurbidMashStep]:
-        inital_temp_c = ambient_temp_c
-        total_water_l = 0.0
-        water_to_add_l = 0.0
-        result = []
-        for step in self.steps:
-            if step.percent_water < 0:
-                # When removing water use current mash vloume and not total mash_in volume
-                water_to_add_l = (step.percent_water / 100.0) * total_water_l
-                energy_needed_malt_kj = 0.0
-                temp_diff_c = 0.0
-                water_temp_needed = step.target_temp_c
-            else:
-                # When adding water, use the total mash_in_l
-                water_to_add_l = (step.percent_water / 100.0) * mash_in_l
-              
-                temp_diff_c = step.target_temp_c - inital_temp_c
-                inital_temp_c = step.target_temp_c
-                energy_needed_malt_kj = temp_diff_c * (total_grain_kg * self.MALT_SPECIFIC_HEAT +
-                                                    total_water_l * self.WATER_SPECIFIC_HEAT +
-                                                    self.sys.system_weight_kg * self.STAINLESS_HEAT)  
-                water_temp_needed = (energy_needed_malt_kj / (water_to_add_l * self.WATER_SPECIFIC_HEAT)) + inital_temp_c
-            total_water_l = water_to_add_l + total_water_l
-
-                
-            result.append(TurbidMashStep(
-                target_temp_c=step.target_temp_c,      
-                time_min=step.time_min,
-                water_temp_c=water_temp_needed,
-                water_l=water_to_add_l))
-
-        
-        return result
\ No newline at end of file
+                result.append(TurbidMashStep(
+                    target_temp_c=target_temp_c,
+                    time_min=time_min,
+                    water_temp_c=water_temp_needed,
+                    water_l=water_to_add_l))
+            results.append(result)
+        return results
@@ -0,0 +1,318 @@
+import logging
+import argparse
+import os
+import sys
+from collections import defaultdict
+from dataclasses import dataclass, field, fields
+from functools import lru_cache
+from typing import Dict
+
+import yaml
+from rich.console import Console
+from rich.table import Table
+
+from mash_ph import WaterProfile
+
+# Module logger
+logger = logging.getLogger(__name__)
+
+DEFAULT_LIBRARY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "water_profiles.yaml")
+DEFAULT_SOURCE = "distilled"
+
+# Ett fel på 10 ppm väger lika för alla joner med lägre mål än så,
+# annars vägs felet mot målvärdet (relativt fel)
+MIN_ION_SCALE_PPM = 10.0
+NNLS_TOLERANCE = 1e-10
+
+# Molmassor (g/mol)
+_ION_MASS = {"calcium": 40.078, "magnesium": 24.305, "sodium": 22.990,
+             "sulfate": 96.06, "chloride": 35.453, "bicarbonate": 61.017}
+
+# Salter: molmassa inklusive kristallvatten och joner per formelenhet
+_SALT_FORMULAS = {
+    "Gypsum (CaSO4·2H2O)": (172.17, {"calcium": 1, "sulfate": 1}),
+    "Calcium chloride (CaCl2·2H2O)": (147.01, {"calcium": 1, "chloride": 2}),
+    "Epsom salt (MgSO4·7H2O)": (246.47, {"magnesium": 1, "sulfate": 1}),
+    "Magnesium chloride (MgCl2·6H2O)": (203.30, {"magnesium": 1, "chloride": 2}),
+    "Table salt (NaCl)": (58.44, {"sodium": 1, "chloride": 1}),
+    "Baking soda (NaHCO3)": (84.007, {"sodium": 1, "bicarbonate": 1}),
+}
+
+# ppm av varje jon per g salt och liter vatten
+SALTS: Dict[str, Dict[str, float]] = {
+    salt: {ion: 1000.0 * count * _ION_MASS[ion] / molar_mass for ion, count in ions.items()}
+    for salt, (molar_mass, ions) in _SALT_FORMULAS.items()
+}
+
+
+@dataclass(frozen=True, slots=True)
+class IonProfile:
+    """
+    Vattnets joner i ppm (mg/L).
+    """
+    calcium: float = 0.0
+    magnesium: float = 0.0
+    sodium: float = 0.0
+    sulfate: float = 0.0
+    chloride: float = 0.0
+    bicarbonate: float = 0.0
+    name: str = ""
+    description: str = ""
+
+    def ions(self) -> Dict[str, float]:
+        return {ion: getattr(self, ion) for ion in IONS}
+
+    def to_water_profile(self) -> WaterProfile:
+        """
+        Profilen som mash_ph använder: alkalinitet som CaCO3 (50/61 av HCO3).
+        """
+        return WaterProfile(alkalinity_ppm_caco3=self.bicarbonate * 50.0 / 61.017,
+                            calcium_ppm=self.calcium, magnesium_ppm=self.magnesium)
+
+
+IONS = tuple(f.name for f in fields(IonProfile) if f.type in (float, "float"))
+
+
+def load_profiles(*paths: str) -> dict[str, IonProfile]:
+    """
+    Läser vattenprofiler från en eller flera YAML-filer.
+    Senare filer kan lägga till eller skriva över profiler.
+    """
+    profiles = {}
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            data = yaml.safe_load(f) or {}
+        for name, entry in (data.get("profiles") or {}).items():
+            unknown = set(entry) - set(IONS) - {"description"}
+            if unknown:
+                raise ValueError(f"Vattenprofil '{name}' i {path} har okända fält: {', '.join(sorted(unknown))}")
+            values = {ion: float(entry.get(ion, 0.0)) for ion in IONS}
+            if any(v < 0 for v in values.values()):
+                raise ValueError(f"Vattenprofil '{name}' i {path} har negativa jonhalter")
+            profiles[name] = IonProfile(**values, name=name, description=entry.get("description", ""))
+    return profiles
+
+
+@lru_cache(maxsize=None)
+def profile_library() -> dict[str, IonProfile]:
+    """
+    Alla vattenprofiler, lästa en gång per process. Extra filer anges med BREWCALC_WATER_PROFILES.
+    """
+    paths = [DEFAULT_LIBRARY_PATH]
+    extra = os.environ.get("BREWCALC_WATER_PROFILES")
+    if extra:
+        paths += [p for p in extra.split(os.pathsep) if p]
+    return load_profiles(*paths)
+
+
+def get_water_profile(name: str | None = None) -> IonProfile:
+    name = name or DEFAULT_SOURCE
+    try:
+        return profile_library()[name]
+    except KeyError:
+        raise ValueError(f"Vattenprofil saknas i biblioteket: {name}") from None
+
+
+def _solve_normal(ata: list[list[float]], atb: list[float]) -> list[float]:
+    """
+    Löser ett litet symmetriskt system med Gausseliminering och pivotering.
+    """
+    n = len(atb)
+    m = [row[:] + [atb[i]] for i, row in enumerate(ata)]
+    for col in range(n):
+        pivot = max(range(col, n), key=lambda r: abs(m[r][col]))
+        if abs(m[pivot][col]) < 1e-12:
+            raise ValueError("Salterna är linjärt beroende")
+        m[col], m[pivot] = m[pivot], m[col]
+        for r in range(col + 1, n):
+            factor = m[r][col] / m[col][col]
+            if factor:
+                for c in range(col, n + 1):
+                    m[r][c] -= factor * m[col][c]
+    x = [0.0] * n
+    for r in range(n - 1, -1, -1):
+        x[r] = (m[r][n] - sum(m[r][c] * x[c] for c in range(r + 1, n))) / m[r][r]
+    return x
+
+
+def nnls(a: list[list[float]], b: list[float], max_iter: int | None = None) -> list[float]:
+    """
+    Minsta kvadrat med x >= 0 (Lawson-Hanson). `a` är m x n som lista med rader.
+    Systemen här är små (sex joner, några salter), så delproblemen löses med normalekvationer.
+    """
+    rows, n = len(a), len(a[0])
+    max_iter = max_iter or 3 * n
+    ata = [[sum(a[k][i] * a[k][j] for k in range(rows)) for j in range(n)] for i in range(n)]
+    atb = [sum(a[k][i] * b[k] for k in range(rows)) for i in range(n)]
+    x = [0.0] * n
+    passive: list[int] = []
+
+    def gradient() -> list[float]:
+        return [atb[i] - sum(ata[i][j] * x[j] for j in range(n)) for i in range(n)]
+
+    for _ in range(max_iter):
+        w = gradient()
+        candidates = [i for i in range(n) if i not in passive and w[i] > NNLS_TOLERANCE]
+        if not candidates:
+            break
+        passive.append(max(candidates, key=lambda i: w[i]))
+        while True:
+            sub = _solve_normal([[ata[i][j] for j in passive] for i in passive], [atb[i] for i in passive])
+            z = [0.0] * n
+            for i, v in zip(passive, sub):
+                z[i] = v
+            if all(z[i] > NNLS_TOLERANCE for i in passive):
+                x = z
+                break
+            # Gå mot z tills en variabel når noll och släpp den
+            steps = [x[i] / (x[i] - z[i]) for i in passive if z[i] <= NNLS_TOLERANCE and x[i] > z[i]]
+            alpha = min(steps) if steps else 0.0
+            x = [xi + alpha * (zi - xi) for xi, zi in zip(x, z)]
+            passive = [i for i in passive if x[i] > NNLS_TOLERANCE]
+            for i in range(n):
+                if i not in passive:
+                    x[i] = 0.0
+            if not passive:
+                break
+    return x
+
+
+@dataclass
+class WaterTreatment:
+    """
+    Salttillsatser som för källvattnet så nära målprofilen som möjligt.
+    Tillsatserna anges i g/L och fördelas på mäsk- och lakvattnet efter volym.
+    """
+    source: IonProfile
+    target: IonProfile
+    salts_g_per_l: Dict[str, float]
+    mash_l: float = 0.0
+    sparge_l: float = 0.0
+    result: IonProfile = field(default_factory=IonProfile)
+
+    @property
+    def mash_salts_g(self) -> Dict[str, float]:
+        return {salt: g * self.mash_l for salt, g in self.salts_g_per_l.items()}
+
+    @property
+    def sparge_salts_g(self) -> Dict[str, float]:
+        return {salt: g * self.sparge_l for salt, g in self.salts_g_per_l.items()}
+
+    def for_volumes(self, mash_l: float, sparge_l: float = 0.0) -> "WaterTreatment":
+        return WaterTreatment(self.source, self.target, self.salts_g_per_l, mash_l, sparge_l, self.result)
+
+
+def _solve_concentrations(source: IonProfile, target: IonProfile, salts: tuple[str, ...]) -> WaterTreatment:
+    a, b = [], []
+    for ion in IONS:
+        scale = max(getattr(target, ion), MIN_ION_SCALE_PPM)
+        a.append([SALTS[salt].get(ion, 0.0) / scale for salt in salts])
+        b.append((getattr(target, ion) - getattr(source, ion)) / scale)
+    x = nnls(a, b)
+    salts_g_per_l = {salt: g for salt, g in zip(salts, x) if g > 0.0}
+    result = {ion: getattr(source, ion) + sum(SALTS[s].get(ion, 0.0) * g for s, g in salts_g_per_l.items())
+              for ion in IONS}
+    logger.debug("Water %s -> %s: %s", source.name, target.name,
+                 ", ".join(f"{s} {g * 1000:.0f} mg/L" for s, g in salts_g_per_l.items()))
+    return WaterTreatment(source, target, salts_g_per_l, result=IonProfile(**result, name=f"{source.name} treated"))
+
+
+def solve_many(sources: list[IonProfile], targets: list[IonProfile], mash_ls: list[float],
+               sparge_ls: list[float] | None = None, salts: tuple[str, ...] | None = None) -> list[WaterTreatment]:
+    """
+    Salttillsatser för många batcher i ett anrop. Koncentrationerna beror bara
+    på källa och mål, så varje unikt par löses en gång och skalas sedan per batch.
+    """
+    salts = tuple(salts or SALTS)
+    sparge_ls = sparge_ls or [0.0] * len(sources)
+    solved: Dict[tuple[IonProfile, IonProfile], WaterTreatment] = {}
+    treatments = []
+    for source, target, mash_l, sparge_l in zip(sources, targets, mash_ls, sparge_ls):
+        base = solved.get((source, target))
+        if base is None:
+            base = solved[(source, target)] = _solve_concentrations(source, target, salts)
+        treatments.append(base.for_volumes(mash_l, sparge_l))
+    return treatments
+
+
+def solve(source: IonProfile, target: IonProfile, mash_l: float, sparge_l: float = 0.0,
+          salts: tuple[str, ...] | None = None) -> WaterTreatment:
+    return solve_many([source], [target], [mash_l], [sparge_l], salts)[0]
+
+
+def print_treatment(treatment: WaterTreatment, console: Console | None = None):
+    console = console or Console()
+    table = Table(title=f"Water salts: {treatment.source.name} -> {treatment.target.name}", show_lines=True)
+    table.add_column("Salt", style="bold")
+    table.add_column("Mash", justify="right")
+    if treatment.sparge_l > 0:
+        table.add_column("Sparge", justify="right")
+    mash, sparge = treatment.mash_salts_g, treatment.sparge_salts_g
+    for salt in treatment.salts_g_per_l:
+        row = [salt, f"{mash[salt]:.1f} g"]
+        if treatment.sparge_l > 0:
+            row.append(f"{sparge[salt]:.1f} g")
+        table.add_row(*row)
+    console.print(table)
+
+    ions = Table(title=f"Water ions (ppm), {treatment.mash_l:.1f} L mash + {treatment.sparge_l:.1f} L sparge", show_lines=True)
+    ions.add_column("Ion", style="bold")
+    ions.add_column("Source", justify="right")
+    ions.add_column("Target", justify="right")
+    ions.add_column("Treated", justify="right")
+    for ion in IONS:
+        ions.add_row(ion.capitalize(), f"{getattr(treatment.source, ion):.0f}",
+                     f"{getattr(treatment.target, ion):.0f}", f"{getattr(treatment.result, ion):.0f}")
+    console.print(ions)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Brewcalc vattenbehandling", add_help=False, formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("-h", "--help", action="help", default=argparse.SUPPRESS, help="Visa hjälp")
+    parser.add_argument("--source", default=DEFAULT_SOURCE, help="Källvatten (profil i water_profiles.yaml)")
+    parser.add_argument("--target", "-t", help="Målprofil; utan --plan krävs den")
+    parser.add_argument("--mash_l", type=float, default=0.0, help="Mäskvatten (L)")
+    parser.add_argument("--sparge_l", type=float, default=0.0, help="Lakvatten (L)")
+    parser.add_argument("--plan", "-p", help="YAML-fil med (recipe, system, count); mål från receptens water_profile")
+    parser.add_argument("--no_cache", action="store_true", help="Använd inte resultatcachen")
+    parser.add_argument("--list", action="store_true", help="Lista vattenprofilerna")
+    args = parser.parse_args()
+    console = Console()
+
+    try:
+        if args.list:
+            for name, profile in profile_library().items():
+                print(f"{name}: {profile.description}")
+            sys.exit(0)
+        source = get_water_profile(args.source)
+        if args.plan:
+            # demand -> recipe -> water_treatment, importeras därför först här
+            from demand import iter_plans, load_plan_entries
+            from result_cache import open_cache
+
+            cache = open_cache(args.no_cache)
+            batches = [(plan, count) for plan, count in iter_plans(load_plan_entries(args.plan), cache)
+                       if plan.recipe.get("water_profile") or args.target]
+            if cache is not None:
+                cache.close()
+            treatments = solve_many(
+                [source] * len(batches),
+                [get_water_profile(args.target or plan.recipe["water_profile"]) for plan, _ in batches],
+                [plan.volumes.get_total_pre_boil() for plan, _ in batches])
+            totals: Dict[str, float] = defaultdict(float)
+            for (plan, count), treatment in zip(batches, treatments):
+                for salt, grams in treatment.mash_salts_g.items():
+                    totals[salt] += grams * count
+            table = Table(title=f"Salt demand, {sum(c for _, c in batches)} batch(es) on {source.name} water", show_lines=True)
+            table.add_column("Salt", style="bold")
+            table.add_column("Total", justify="right")
+            for salt, grams in sorted(totals.items()):
+                table.add_row(salt, f"{grams:.1f} g")
+            console.print(table)
+        else:
+            if not args.target:
+                parser.error("--target krävs utan --plan")
+            print_treatment(solve(source, get_water_profile(args.target), args.mash_l, args.sparge_l), console)
+    except ValueError as exc:
+        print(exc, file=sys.stderr)
+        sys.exit(1)